@@ -9,13 +9,29 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from io import BytesIO
-import re
-from datetime import datetime
+import logging
+import os
+from datetime import datetime, timedelta
+
+from engine.cache import IssuerCache, PortfolioCache, file_hash, issuer_table_hash
+from engine.delta import DeltaControl
+from engine.grid import RatioGrid
+from engine.history import HistoryStore
+from engine.issuers import (IsinIndex, IssuerGroups, default_issuer_table, issuer_sources,
+                            read_isin_referential, read_issuer_groups)
+from engine.loader import ACTIF_NET_VALUES, apply_nav
+from engine.nav import NavStore
+from engine import perf
+from engine.perf import Profiler
+from engine.pipeline import REPORT_TOP_ISSUERS, StagedControl
+from engine.report import build_report_sheets, compute_kpis, summarize_breaches, write_report
+from engine.whatif import ORDER_COLUMNS, ExposureState
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
 st.set_page_config(
     page_title="Contrôle Émetteurs OPCVM",
     page_icon="🏦",
@@ -490,98 +506,54 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =============================================================================
-# FONCTION DE NETTOYAGE ULTRA ROBUSTE
+# FONCTION DE CHARGEMENT
 # =============================================================================
 
-def clean_number(value):
-    """Convertit ANY valeur en nombre flottant de façon sécurisée"""
-    if value is None:
-        return 0.0
-    if pd.isna(value):
-        return 0.0
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        value = value.strip()
-        value = value.replace(' ', '')
-        value = value.replace(',', '')
-        value = value.replace(' ', '')
-        value = value.replace('\xa0', '')
-        value = value.replace('\t', '')
-        value = value.replace('\n', '')
-        if value == '' or value == '-' or value == 'nan':
-            return 0.0
-        try:
-            return float(value)
-        except ValueError:
-            value = re.sub(r'[^\d.-]', '', value)
-            try:
-                return float(value) if value else 0.0
-            except:
-                return 0.0
-    return 0.0
+@st.cache_resource
+def get_portfolio_cache():
+    """Positions déjà chargées, en Parquet dans .cache/ (survit aux redémarrages)"""
+    return PortfolioCache(os.path.join(CACHE_DIR, 'portfolios'))
 
-# =============================================================================
-# FONCTION DE CHARGEMENT
-# =============================================================================
+@st.cache_resource
+def get_delta_control():
+    """Onglets du dernier classeur chargé : seuls les onglets modifiés sont relus"""
+    return DeltaControl()
 
 @st.cache_data
 def load_portfolio(file):
     """Charge le fichier Excel avec correction des noms de fonds"""
     try:
-        xl = pd.ExcelFile(file)
-        all_data = []
-        actif_net_dict = {}
-        
-        fonds_mapping = {
-            'Action': 'CFP',
-            'Diversifie': 'TIJ',
-            'OMLT': 'PRV',
-            'OCT': 'CLB',
-            'Monetaire': 'CCS'
-        }
-        
-        actif_net_values = {
-            'CFP': 276403573.05,
-            'CCS': 356674412.16,
-            'TIJ': 478502756.69,
-            'CLB': 1704711189.03,
-            'PRV': 708721589.76
-        }
-        
-        for sheet_name in xl.sheet_names:
-            df = pd.read_excel(file, sheet_name=sheet_name, header=None)
-            fonds_name = fonds_mapping.get(sheet_name, sheet_name)
-            actif_net = actif_net_values.get(fonds_name, 0)
-            
-            df_data = df.iloc[1:].copy()
-            df_data = df_data.dropna(how='all')
-            
-            if len(df_data) > 0 and len(df_data.columns) >= 9:
-                df_data.columns = ['Code_ISIN', 'Type', 'Description', 'Quantite', 
-                                  'Prix_revient', 'Valo_j', 'Prix_revient_global',
-                                  'Valo_globale', 'Plus_moins_value'] + [f'Col{i}' for i in range(10, len(df_data.columns)+1)]
-                
-                if 'Valo_globale' in df_data.columns:
-                    df_clean = df_data[['Type', 'Description', 'Valo_globale']].copy()
-                    df_clean['Valo_globale'] = df_clean['Valo_globale'].apply(clean_number)
-                    df_clean = df_clean[df_clean['Valo_globale'] > 0]
-                    
-                    if len(df_clean) > 0:
-                        df_clean['Fonds'] = fonds_name
-                        df_clean['Actif_Net'] = actif_net
-                        all_data.append(df_clean)
-                        actif_net_dict[fonds_name] = actif_net
-        
-        if all_data:
-            return pd.concat(all_data, ignore_index=True), actif_net_dict
-        else:
-            return None, None
-            
+        return get_portfolio_cache().load(file, get_delta_control().load)
     except Exception as e:
         st.error(f"Erreur: {str(e)}")
         return None, None
 
+@st.cache_resource
+def get_nav_store():
+    """Actifs nets par fonds et date de valorisation (SQLite dans .cache/)"""
+    return NavStore(os.path.join(CACHE_DIR, 'nav.sqlite'))
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_excel_report(analysis_key, _export_dict):
+    """Rapport Excel (bytes) d'une analyse, mis en cache par clé d'analyse"""
+    return write_report(_export_dict).getvalue()
+
+@st.cache_resource
+def get_perf_logger():
+    """Mesures de performance en JSON, une ligne par étape, sur la sortie d'erreur"""
+    logger = logging.getLogger('engine.perf')
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+@st.cache_resource
+def get_history_store():
+    """Historique des contrôles (SQLite dans .cache/)"""
+    return HistoryStore(os.path.join(CACHE_DIR, 'historique.sqlite'))
+
 # =============================================================================
 # TABLE DES ÉMETTEURS
 # =============================================================================
@@ -589,189 +561,22 @@ def load_portfolio(file):
 @st.cache_data
 def create_default_issuer_table():
     """Table de correspondance émetteurs"""
-    data = {
-        'mot_cle': [
-            'ATW', 'ATTIJARI', 'OBLATW', 'CD ATW',
-            'ARADEI', 'OBLARADEI',
-            'BCP', 'OBLBCP',
-            'IAM', 'ITISSALAT',
-            'BOA', 'BANK OF AFRICA',
-            'CDM', 'CIH', 'MUTANDIS',
-            'LBV', 'LABEL VIE',
-            'COSUMAR', 'CSR',
-            'ONCF', 'OBLONCF',
-            'CAM', 'OBLCAM',
-            'RCI', 'BSFRCI',
-            'BDT', 'CFG', 'IRGAM',
-            'PRS', 'INSTICASH', 'TWIN'
-        ],
-        'emetteur': [
-            'ATW', 'ATW', 'ATW', 'ATW',
-            'ARADEI', 'ARADEI',
-            'BCP', 'BCP',
-            'IAM', 'IAM',
-            'BOA', 'BOA',
-            'CDM', 'CIH', 'MUTANDIS',
-            'LBV', 'LBV',
-            'COSUMAR', 'COSUMAR',
-            'ONCF', 'ONCF',
-            'CAM', 'CAM',
-            'RCI', 'RCI',
-            'État marocain', 'CFG', 'IRGAM',
-            'CFG', 'CFG', 'TWIN'
-        ],
-        'type': [
-            'privé', 'privé', 'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'privé', 'privé',
-            'public', 'privé', 'privé',
-            'privé', 'privé', 'privé'
-        ]
-    }
-    return pd.DataFrame(data)
+    return default_issuer_table()
 
-# =============================================================================
-# IDENTIFICATION DES ÉMETTEURS
-# =============================================================================
-
-def identify_issuer(description, issuer_table):
-    """Identifie l'émetteur à partir de la description"""
-    if pd.isna(description):
-        return 'Inconnu', 'inconnu'
-    
-    desc = str(description).upper()
-    
-    if 'BDT' in desc:
-        return 'État marocain', 'public'
-    
-    for _, row in issuer_table.iterrows():
-        mot_cle = str(row['mot_cle']).upper()
-        if mot_cle in desc:
-            return row['emetteur'], row['type']
-    
-    return 'Autre', 'privé'
-
-def add_issuers(df, issuer_table):
-    """Ajoute les colonnes émetteur et type"""
-    if df is None or len(df) == 0:
-        return df
-    
-    result = df.copy()
-    issuers = result['Description'].apply(
-        lambda x: identify_issuer(x, issuer_table)
-    )
-    
-    result['Emetteur'] = [i[0] for i in issuers]
-    result['Type_Emetteur'] = [i[1] for i in issuers]
-    
-    return result
-
-# =============================================================================
-# CALCUL DES RATIOS
-# =============================================================================
-
-def calculate_issuer_ratios(df, actif_net_dict, params):
-    """Calcule les ratios par fonds et émetteur"""
-    if df is None or len(df) == 0 or not actif_net_dict:
-        return pd.DataFrame()
-    
-    results = []
-    
-    for fonds in df['Fonds'].unique():
-        actif_net = actif_net_dict.get(fonds, 0)
-        
-        if actif_net <= 0:
-            continue
-        
-        fonds_data = df[df['Fonds'] == fonds]
-        
-        grouped = fonds_data.groupby('Emetteur').agg({
-            'Valo_globale': 'sum',
-            'Type_Emetteur': 'first'
-        }).reset_index()
-        
-        for _, row in grouped.iterrows():
-            total = row['Valo_globale']
-            ratio = total / actif_net
-            
-            if row['Emetteur'] == 'État marocain' or row['Type_Emetteur'] == 'public':
-                plafond = params.get('plafond_etat', 1.0)
-            else:
-                emetteur_data = fonds_data[fonds_data['Emetteur'] == row['Emetteur']]
-                is_action = any('ACTION' in str(t).upper() for t in emetteur_data['Type'])
-                
-                if is_action and row['Emetteur'] in params.get('actions_eligibles_15pct', []):
-                    plafond = params.get('plafond_action_eligible', 0.15)
-                else:
-                    plafond = params.get('plafond_standard', 0.10)
-            
-            conformite = '✅' if ratio <= plafond + 0.0001 else '❌'
-            ecart = (ratio - plafond) * 100
-            
-            results.append({
-                'Fonds': fonds,
-                'Emetteur': row['Emetteur'],
-                'Type': row['Type_Emetteur'],
-                'Montant_MAD': total,
-                'Actif_Net_MAD': actif_net,
-                'Ratio': ratio,
-                'Ratio_%': f"{ratio:.2%}",
-                'Plafond': plafond,
-                'Plafond_%': f"{plafond:.0%}",
-                'Conformite': conformite,
-                'Ecart_%': ecart
-            })
-    
-    return pd.DataFrame(results)
+@st.cache_resource(max_entries=4)
+def build_isin_index(referential):
+    """Référentiel ISIN indexé une fois par contenu importé"""
+    return IsinIndex(referential)
 
-# =============================================================================
-# RÈGLE DES 45%
-# =============================================================================
+@st.cache_resource(max_entries=4)
+def build_issuer_groups(hierarchy):
+    """Hiérarchie des émetteurs aplatie une fois par contenu importé"""
+    return IssuerGroups(hierarchy)
 
-def check_45_percent_rule(ratios_df, portfolio_df, actif_net_dict, seuil=0.45):
-    """Vérifie la règle des 45% pour les actions"""
-    if ratios_df is None or len(ratios_df) == 0 or 'Fonds' not in ratios_df.columns:
-        return pd.DataFrame()
-    
-    results = []
-    
-    for fonds in ratios_df['Fonds'].unique():
-        actif_net = actif_net_dict.get(fonds, 0)
-        
-        if actif_net <= 0:
-            continue
-        
-        fonds_ratios = ratios_df[ratios_df['Fonds'] == fonds]
-        
-        emetteurs_sup_10 = fonds_ratios[
-            (fonds_ratios['Ratio'] > 0.10) & 
-            (fonds_ratios['Emetteur'] != 'État marocain')
-        ]
-        
-        total_sup_10 = emetteurs_sup_10['Montant_MAD'].sum()
-        ratio_45 = total_sup_10 / actif_net if actif_net > 0 else 0
-        
-        results.append({
-            'Fonds': fonds,
-            'Total_>10%_MAD': total_sup_10,
-            'Actif_Net_MAD': actif_net,
-            'Ratio_45%': ratio_45,
-            'Ratio_%': f"{ratio_45:.2%}",
-            'Seuil': seuil,
-            'Seuil_%': f"{seuil:.0%}",
-            'Conformite': '✅' if ratio_45 <= seuil + 0.0001 else '❌',
-            'Nb_Emetteurs': len(emetteurs_sup_10)
-        })
-    
-    return pd.DataFrame(results)
+@st.cache_resource
+def get_issuer_cache():
+    """Cache émetteurs partagé par les sessions (persisté dans .cache/)"""
+    return IssuerCache(path=os.path.join(CACHE_DIR, 'issuers'))
 
 # =============================================================================
 # PAGE D'ACCUEIL
@@ -846,6 +651,7 @@ with st.sidebar:
     plafond_etat = st.number_input("État (%)", 0, 100, 100, help="Plafond émetteurs publics") / 100
     plafond_action = st.number_input("Actions éligibles (%)", 0, 100, 15, help="Actions cotées éligibles") / 100
     plafond_std = st.number_input("Standard (%)", 0, 100, 10, help="Plafond standard") / 100
+    plafond_groupe = st.number_input("Groupe (%)", 0, 100, 20, help="Plafond par groupe d'émetteurs (hiérarchie importée)") / 100
     
     st.markdown("---")
     
@@ -857,21 +663,53 @@ with st.sidebar:
     
     st.markdown("#### 🎯 Règle 45%")
     seuil_45 = st.number_input("Seuil (%)", 0, 100, 45, help="Concentration max >10%") / 100
+    seuil_emetteur_45 = st.number_input("Émetteurs au-delà de (%)", 0, 100, 10, help="Ratio à partir duquel un émetteur compte dans la règle") / 100
     
     st.markdown("---")
     
     st.markdown("#### 📋 Table Émetteurs")
     issuer_file = st.file_uploader("CSV (optionnel)", type=['csv'])
     issuer_table = pd.read_csv(issuer_file) if issuer_file else create_default_issuer_table()
+    isin_file = st.file_uploader("Référentiel ISIN (optionnel)", type=['csv', 'xlsx'],
+                                 help="Colonnes isin, emetteur, type : consulté avant les mots-clés")
+    isin_index = build_isin_index(read_isin_referential(isin_file)) if isin_file else None
+    groups_file = st.file_uploader("Groupes d'émetteurs (optionnel)", type=['csv', 'xlsx'],
+                                   help="Colonnes emetteur, parent : ratios agrégés par tête de groupe")
+    try:
+        issuer_groups = build_issuer_groups(read_issuer_groups(groups_file)) if groups_file else None
+    except (KeyError, ValueError) as e:
+        st.error(f"Hiérarchie des émetteurs invalide : {e}")
+        issuer_groups = None
     
     st.markdown("---")
     
     st.markdown("#### 📅 Date")
     control_date = st.date_input("Date du contrôle", datetime.now())
     
+    st.markdown("#### 💰 Actifs Nets")
+    nav_file = st.file_uploader("Fonds / Date / Actif net (CSV ou Excel)", type=['csv', 'xlsx'])
+    if nav_file and st.session_state.get('nav_imported') != (nav_file.name, nav_file.size):
+        try:
+            nb_nav = get_nav_store().import_file(nav_file)
+            st.session_state.nav_imported = (nav_file.name, nav_file.size)
+            st.success(f"✓ {nb_nav} actifs nets importés")
+        except Exception as e:
+            st.error(f"Import actifs nets : {str(e)}")
+    
     st.markdown("---")
     
     calculate = st.button("🚀 LANCER L'ANALYSE", type="primary", use_container_width=True)
+    
+    st.markdown("---")
+    
+    perf_on = st.toggle("⏱️ Mesures de performance", value=perf.ENABLED, disabled=not perf.ENABLED,
+                        help="Durée, lignes et mémoire par étape (journal JSON 'engine.perf')")
+    perf_panel = st.container()
+
+# Étapes de ce rerun ; désactivé, chaque point de mesure est un contexte vide
+if perf_on:
+    get_perf_logger()
+profiler = Profiler(enabled=perf_on)
 
 # =============================================================================
 # CHARGEMENT FICHIER
@@ -890,7 +728,17 @@ with col1:
 
 if uploaded_file:
     with st.spinner("⏳ Chargement en cours..."):
-        portfolio, actif_net_dict = load_portfolio(uploaded_file)
+        with profiler.stage('chargement') as measured:
+            portfolio, actif_net_dict = load_portfolio(uploaded_file)
+            measured.rows = 0 if portfolio is None else len(portfolio)
+        if portfolio is not None:
+            with profiler.stage('actifs_nets', rows=len(portfolio)):
+                nav = get_nav_store().lookup(portfolio['Fonds'].unique(), control_date, fallback=ACTIF_NET_VALUES)
+                portfolio, actif_net_dict = apply_nav(portfolio, nav)
+            sans_actif = [fonds for fonds, actif in actif_net_dict.items() if actif <= 0]
+            if sans_actif:
+                st.warning(f"⚠️ Aucun actif net au {control_date.strftime('%d/%m/%Y')} pour : "
+                           f"{', '.join(sans_actif)} (fonds exclus du contrôle)")
         
         if portfolio is not None and actif_net_dict:
             
@@ -921,114 +769,192 @@ if uploaded_file:
             st.markdown("---")
             
             # CALCUL
+            params = {
+                'plafond_etat': plafond_etat,
+                'plafond_action_eligible': plafond_action,
+                'plafond_standard': plafond_std,
+                'actions_eligibles_15pct': actions_list,
+                'seuil_45': seuil_45,
+                'seuil_emetteur_45': seuil_emetteur_45,
+                'plafond_groupe': plafond_groupe,
+            }
+            # positions seules : les actifs nets n'entrent que dans les clés des agrégats et plafonds
+            portfolio_key = file_hash(uploaded_file)
+            analysis_key = (portfolio_key, tuple(actif_net_dict.items()), issuer_table_hash(issuer_table),
+                            None if isin_index is None else isin_index.fingerprint,
+                            None if issuer_groups is None else issuer_groups.fingerprint, control_date,
+                            tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+            
+            # Résultats conservés en session : un rerun (téléchargement, widget) ne recalcule rien
+            results = st.session_state.get('results')
             if calculate:
                 with st.spinner("🔍 Analyse réglementaire en cours..."):
                     
-                    portfolio = add_issuers(portfolio, issuer_table)
-                    
-                    params = {
-                        'plafond_etat': plafond_etat,
-                        'plafond_action_eligible': plafond_action,
-                        'plafond_standard': plafond_std,
-                        'actions_eligibles_15pct': actions_list
+                    # Étapes déjà calculées pour ce classeur réutilisées (seuls les plafonds changent)
+                    if 'staged_control' not in st.session_state:
+                        st.session_state.staged_control = StagedControl(issuer_cache=get_issuer_cache())
+                    with profiler.stage('analyse', rows=len(portfolio)):
+                        portfolio, ratios_df, rule_45_df = st.session_state.staged_control.run(
+                            portfolio_key, portfolio, actif_net_dict, issuer_table, params,
+                            isin_index=isin_index, groups=issuer_groups
+                        )
+                    results = {
+                        'key': analysis_key,
+                        'ratios': ratios_df,
+                        'rule_45': rule_45_df,
+                        'kpis': compute_kpis(ratios_df) if len(ratios_df) > 0 else None,
+                        'sources': issuer_sources(portfolio),
+                        'groups': st.session_state.staged_control.group_ratios,
+                        'exposure': st.session_state.staged_control.exposure,
                     }
+                    st.session_state.results = results
+                    if len(ratios_df) > 0:
+                        with profiler.stage('historique', rows=len(ratios_df)):
+                            get_history_store().record(control_date, ratios_df, rule_45_df)
+            elif results is not None and results['key'] != analysis_key:
+                st.info("ℹ️ Données ou paramètres modifiés depuis la dernière analyse : relancez l'analyse")
+                results = None
+            
+            if results is not None:
+                ratios_df = results['ratios']
+                rule_45_df = results['rule_45']
+                kpis = results['kpis']
+                if isin_index is not None and results['sources']:
+                    st.caption("Émetteurs résolus : " + ', '.join(
+                        f"{source} {share:.1%}" for source, share in results['sources'].items()))
+                
+                if len(ratios_df) == 0:
+                    st.error("❌ Aucun ratio calculé")
+                    st.stop()
+                
+                if 'Fonds' not in ratios_df.columns:
+                    st.error("❌ Erreur structure")
+                    st.stop()
+                
+                # INDICATEURS
+                total_conformes = kpis['conformes']
+                total_non_conformes = kpis['non_conformes']
+                taux_conformite = kpis['taux_conformite']
+                nb_etat = kpis['nb_etat']
+                nb_prive = kpis['nb_prive']
+                
+                st.markdown('<div class="section-header"><h2><span class="section-icon">📊</span>Tableau de Bord</h2></div>', unsafe_allow_html=True)
+                
+                kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+                
+                with kpi1:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <h4>Total Ratios</h4>
+                        <div class="value">{len(ratios_df)}</div>
+                        <div class="subvalue">Contrôles</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                with kpi2:
+                    st.markdown(f"""
+                    <div class="metric-card metric-success">
+                        <h4>✓ Conformes</h4>
+                        <div class="value">{total_conformes}</div>
+                        <div class="subvalue">{taux_conformite:.1f}%</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                with kpi3:
+                    st.markdown(f"""
+                    <div class="metric-card metric-danger">
+                        <h4>✗ Alertes</h4>
+                        <div class="value">{total_non_conformes}</div>
+                        <div class="subvalue">Non-conformes</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                with kpi4:
+                    st.markdown(f"""
+                    <div class="metric-card metric-info">
+                        <h4>🏛️ Public</h4>
+                        <div class="value">{nb_etat}</div>
+                        <div class="subvalue">Positions État</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                with kpi5:
+                    st.markdown(f"""
+                    <div class="metric-card metric-warning">
+                        <h4>🏢 Privé</h4>
+                        <div class="value">{nb_prive}</div>
+                        <div class="subvalue">Positions privées</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                st.markdown("")
+                st.markdown("---")
+                
+                # ONGLETS
+                tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
+                    "📊 Vue Complète", 
+                    "⚠️ Non-Conformités", 
+                    "🎯 Règle 45%",
+                    "🏢 Groupes",
+                    "🏛️ Société de Gestion",
+                    "📤 Export",
+                    "📈 Historique",
+                    "🧪 Simulation"
+                ])
+                
+                with tab1:
+                    st.markdown('<div class="section-header"><h2>Ratios par Émetteur</h2></div>', unsafe_allow_html=True)
                     
-                    ratios_df = calculate_issuer_ratios(portfolio, actif_net_dict, params)
-                    rule_45_df = check_45_percent_rule(ratios_df, portfolio, actif_net_dict, seuil_45)
-                    
-                    if len(ratios_df) == 0:
-                        st.error("❌ Aucun ratio calculé")
-                        st.stop()
-                    
-                    if 'Fonds' not in ratios_df.columns:
-                        st.error("❌ Erreur structure")
-                        st.stop()
-                    
-                    # INDICATEURS
-                    total_conformes = len(ratios_df[ratios_df['Conformite'] == '✅'])
-                    total_non_conformes = len(ratios_df[ratios_df['Conformite'] == '❌'])
-                    taux_conformite = total_conformes / len(ratios_df) * 100 if len(ratios_df) > 0 else 0
-                    
-                    st.markdown('<div class="section-header"><h2><span class="section-icon">📊</span>Tableau de Bord</h2></div>', unsafe_allow_html=True)
-                    
-                    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+                    display_cols = ['Fonds', 'Emetteur', 'Montant_MAD', 'Ratio', 
+                                   'Plafond', 'Conformite', 'Ecart_%']
                     
-                    with kpi1:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h4>Total Ratios</h4>
-                            <div class="value">{len(ratios_df)}</div>
-                            <div class="subvalue">Contrôles</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    # Index construit une fois par analyse ; filtres et page calculés côté serveur
+                    if 'grid' not in results:
+                        with profiler.stage('index_vue_complete', rows=len(ratios_df)):
+                            results['grid'] = RatioGrid(ratios_df)
+                    grid = results['grid']
                     
-                    with kpi2:
-                        st.markdown(f"""
-                        <div class="metric-card metric-success">
-                            <h4>✓ Conformes</h4>
-                            <div class="value">{total_conformes}</div>
-                            <div class="subvalue">{taux_conformite:.1f}%</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    f1, f2, f3 = st.columns([2, 2, 1])
+                    with f1:
+                        filtre_fonds = st.multiselect("Fonds", grid.options('Fonds'))
+                    with f2:
+                        filtre_emetteurs = st.multiselect("Émetteurs", grid.options('Emetteur'))
+                    with f3:
+                        filtre_conformite = st.multiselect("Conformité", grid.options('Conformite'))
                     
-                    with kpi3:
-                        st.markdown(f"""
-                        <div class="metric-card metric-danger">
-                            <h4>✗ Alertes</h4>
-                            <div class="value">{total_non_conformes}</div>
-                            <div class="subvalue">Non-conformes</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    with profiler.stage('filtres_vue_complete') as measured:
+                        rows = grid.rows(Fonds=filtre_fonds, Emetteur=filtre_emetteurs,
+                                         Conformite=filtre_conformite)
+                        measured.rows = len(rows)
                     
-                    with kpi4:
-                        nb_etat = len(ratios_df[ratios_df['Emetteur'] == 'État marocain'])
-                        st.markdown(f"""
-                        <div class="metric-card metric-info">
-                            <h4>🏛️ Public</h4>
-                            <div class="value">{nb_etat}</div>
-                            <div class="subvalue">Positions État</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    p1, p2 = st.columns([1, 3])
+                    with p1:
+                        page_size = st.selectbox("Lignes par page", [50, 100, 500, 1000], index=1)
+                    nb_pages = max(1, -(-len(rows) // page_size))
+                    with p2:
+                        # Clé liée au nombre de pages : retour à la page 1 quand les filtres changent
+                        page = st.number_input(f"Page (sur {nb_pages})", min_value=1,
+                                               max_value=nb_pages, value=1, key=f"page_{nb_pages}")
                     
-                    with kpi5:
-                        nb_prive = len(ratios_df[ratios_df['Type'] == 'privé'])
-                        st.markdown(f"""
-                        <div class="metric-card metric-warning">
-                            <h4>🏢 Privé</h4>
-                            <div class="value">{nb_prive}</div>
-                            <div class="subvalue">Positions privées</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    st.dataframe(
+                        grid.page(rows, page - 1, page_size)[display_cols],
+                        use_container_width=True,
+                        height=500,
+                        hide_index=True,
+                        column_config={
+                            'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                            'Ratio': st.column_config.NumberColumn("Ratio", format="percent"),
+                            'Plafond': st.column_config.NumberColumn("Plafond", format="percent"),
+                            'Ecart_%': st.column_config.NumberColumn("Écart", format="%.2f%%"),
+                        }
+                    )
+                    st.caption(f"{len(rows):,} lignes sur {len(ratios_df):,}".replace(',', ' '))
                     
+                    # Graphique
                     st.markdown("")
-                    st.markdown("---")
-                    
-                    # ONGLETS
-                    tab1, tab2, tab3, tab4 = st.tabs([
-                        "📊 Vue Complète", 
-                        "⚠️ Non-Conformités", 
-                        "🎯 Règle 45%",
-                        "📤 Export"
-                    ])
+                    st.markdown("##### 📈 Répartition")
                     
-                    with tab1:
-                        st.markdown('<div class="section-header"><h2>Ratios par Émetteur</h2></div>', unsafe_allow_html=True)
-                        
-                        display_cols = ['Fonds', 'Emetteur', 'Montant_MAD', 'Ratio_%', 
-                                       'Plafond_%', 'Conformite', 'Ecart_%']
-                        
-                        df_show = ratios_df[display_cols].copy()
-                        df_show['Montant_MAD'] = df_show['Montant_MAD'].apply(
-                            lambda x: f"{x:,.0f}".replace(',', ' ')
-                        )
-                        df_show['Ecart_%'] = df_show['Ecart_%'].apply(lambda x: f"{x:.2f}%")
-                        
-                        st.dataframe(df_show, use_container_width=True, height=500)
-                        
-                        # Graphique
-                        st.markdown("")
-                        st.markdown("##### 📈 Répartition")
-                        
+                    with profiler.stage('graphique_repartition'):
                         conf_counts = ratios_df['Conformite'].value_counts()
                         fig = go.Figure(data=[go.Pie(
                             labels=['Conformes ✓', 'Non-conformes ✗'],
@@ -1045,162 +971,371 @@ if uploaded_file:
                             font=dict(family="Poppins", size=14)
                         )
                         st.plotly_chart(fig, use_container_width=True)
+                
+                with tab2:
+                    st.markdown('<div class="section-header"><h2>Alertes Réglementaires</h2></div>', unsafe_allow_html=True)
                     
-                    with tab2:
-                        st.markdown('<div class="section-header"><h2>Alertes Réglementaires</h2></div>', unsafe_allow_html=True)
-                        
-                        non_conformes = ratios_df[ratios_df['Conformite'] == '❌']
-                        
-                        if len(non_conformes) > 0:
-                            st.error(f"🚨 **{len(non_conformes)} non-conformité(s)** détectée(s)")
-                            
-                            alert_cols = ['Fonds', 'Emetteur', 'Ratio_%', 'Plafond_%', 'Ecart_%']
-                            df_alert = non_conformes[alert_cols].copy()
-                            
-                            st.dataframe(df_alert, use_container_width=True)
-                            
-                            st.markdown("")
-                            st.markdown("##### 📊 Détails des Dépassements")
-                            
-                            for _, row in non_conformes.iterrows():
-                                with st.expander(f"🔴 {row['Fonds']} - {row['Emetteur']} | Écart: {row['Ecart_%']:.2f}%"):
-                                    col1, col2, col3 = st.columns(3)
-                                    with col1:
-                                        st.metric("Montant", f"{row['Montant_MAD']:,.0f} MAD".replace(',', ' '))
-                                    with col2:
-                                        st.metric("Ratio", row['Ratio_%'])
-                                    with col3:
-                                        st.metric("Plafond", row['Plafond_%'])
-                        else:
-                            st.success("✅ **Conformité totale** - Tous les ratios respectent les limites CDVM")
-                            st.balloons()
+                    non_conformes = ratios_df[ratios_df['Conformite'] == '❌']
                     
-                    with tab3:
-                        st.markdown('<div class="section-header"><h2>Règle de Concentration 45%</h2></div>', unsafe_allow_html=True)
-                        st.info("📖 **Règle CDVM**: La somme des émetteurs >10% ne peut dépasser 45% de l'actif net")
+                    if len(non_conformes) > 0:
+                        st.error(f"🚨 **{len(non_conformes)} non-conformité(s)** détectée(s)")
                         
-                        if len(rule_45_df) > 0:
-                            st.dataframe(rule_45_df, use_container_width=True)
-                            
-                            st.markdown("")
-                            conformes_45 = len(rule_45_df[rule_45_df['Conformite'] == '✅'])
-                            non_conformes_45 = len(rule_45_df[rule_45_df['Conformite'] == '❌'])
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("✅ Conformes", conformes_45)
-                            with col2:
-                                st.metric("❌ Non-conformes", non_conformes_45)
-                        else:
-                            st.warning("⚠️ Aucune donnée")
-                    
-                    with tab4:
-                        st.markdown('<div class="section-header"><h2>Export & Rapports</h2></div>', unsafe_allow_html=True)
+                        # Vue agrégée + détail du seul groupe choisi : nombre de widgets fixe
+                        vue = st.radio("Regrouper par", ['Fonds', 'Emetteur'], horizontal=True)
+                        with profiler.stage('synthese_depassements') as measured:
+                            summary = summarize_breaches(ratios_df, by=vue)
+                            measured.rows = len(summary)
+                        st.dataframe(
+                            summary,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                                'Ecart_max_%': st.column_config.NumberColumn("Écart max", format="%.2f%%"),
+                            }
+                        )
                         
-                        export_dict = {
-                            'Ratios': ratios_df,
-                            'Regle_45': rule_45_df
-                        }
+                        st.markdown("")
+                        st.markdown("##### 📊 Détails des Dépassements")
                         
-                        if len(non_conformes) > 0:
-                            export_dict['Alertes'] = non_conformes
+                        choix = st.selectbox(f"{vue} à détailler", summary[vue])
+                        detail = non_conformes[non_conformes[vue] == choix].sort_values(
+                            'Ecart_%', ascending=False, kind='stable'
+                        )
                         
-                        summary_data = {
-                            'Indicateur': [
-                                'Date du contrôle',
-                                'Ratios analysés',
-                                'Conformes',
-                                'Non-conformes',
-                                'Taux conformité',
-                                'Positions État',
-                                'Positions privées',
-                                'Fonds'
-                            ],
-                            'Valeur': [
-                                control_date.strftime('%d/%m/%Y'),
-                                len(ratios_df),
-                                total_conformes,
-                                total_non_conformes,
-                                f"{taux_conformite:.1f}%",
-                                nb_etat,
-                                nb_prive,
-                                len(actif_net_dict)
-                            ]
-                        }
-                        export_dict['Synthese'] = pd.DataFrame(summary_data)
+                        pire = detail.iloc[0]
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Montant", f"{pire['Montant_MAD']:,.0f} MAD".replace(',', ' '))
+                        with col2:
+                            st.metric("Ratio", pire['Ratio_%'])
+                        with col3:
+                            st.metric("Plafond", pire['Plafond_%'])
+                        st.caption(f"🔴 Pire écart : {pire['Fonds']} - {pire['Emetteur']} | Écart: {pire['Ecart_%']:.2f}%")
                         
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            for sheet_name, df in export_dict.items():
-                                df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+                        alert_cols = ['Fonds', 'Emetteur', 'Montant_MAD', 'Ratio', 'Plafond', 'Ecart_%']
+                        st.dataframe(
+                            detail[alert_cols],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                                'Ratio': st.column_config.NumberColumn("Ratio", format="percent"),
+                                'Plafond': st.column_config.NumberColumn("Plafond", format="percent"),
+                                'Ecart_%': st.column_config.NumberColumn("Écart", format="%.2f%%"),
+                            }
+                        )
+                    else:
+                        st.success("✅ **Conformité totale** - Tous les ratios respectent les limites CDVM")
+                        if calculate:
+                            st.balloons()
+                    
+                with tab3:
+                    st.markdown('<div class="section-header"><h2>Règle de Concentration 45%</h2></div>', unsafe_allow_html=True)
+                    st.info("📖 **Règle CDVM**: La somme des émetteurs >10% ne peut dépasser 45% de l'actif net")
+                    
+                    if len(rule_45_df) > 0:
+                        st.dataframe(rule_45_df, use_container_width=True)
                         
-                        output.seek(0)
+                        st.markdown("")
+                        conformes_45 = len(rule_45_df[rule_45_df['Conformite'] == '✅'])
+                        non_conformes_45 = len(rule_45_df[rule_45_df['Conformite'] == '❌'])
                         
                         col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric("✅ Conformes", conformes_45)
+                        with col2:
+                            st.metric("❌ Non-conformes", non_conformes_45)
+                    else:
+                        st.warning("⚠️ Aucune donnée")
+                
+                with tab4:
+                    st.markdown('<div class="section-header"><h2>Ratios par Groupe d\'Émetteurs</h2></div>', unsafe_allow_html=True)
+                    
+                    group_ratios = results.get('groups')
+                    if group_ratios is None:
+                        st.info("ℹ️ Chargez une hiérarchie d'émetteurs (barre latérale) pour agréger "
+                                "les expositions par groupe")
+                    else:
+                        st.info(f"📖 Expositions de chaque fonds sommées par tête de groupe, "
+                                f"plafond groupe {params['plafond_groupe']:.0%}")
+                        show_single = st.checkbox("Inclure les groupes d'un seul émetteur", value=False)
+                        shown = group_ratios if show_single else group_ratios[group_ratios['Nb_Emetteurs'] > 1]
+                        shown = shown.sort_values('Ecart_%', ascending=False, kind='stable')
                         
+                        col1, col2, col3 = st.columns(3)
                         with col1:
+                            st.metric("Couples fonds / groupe", len(shown))
+                        with col2:
+                            st.metric("✅ Conformes", int((shown['Conformite'] == '✅').sum()))
+                        with col3:
+                            st.metric("❌ Non-conformes", int((shown['Conformite'] == '❌').sum()))
+                        
+                        st.dataframe(
+                            shown[['Fonds', 'Groupe', 'Nb_Emetteurs', 'Montant_MAD', 'Ratio', 'Plafond',
+                                   'Conformite', 'Ecart_%']],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                                'Ratio': st.column_config.NumberColumn("Ratio", format="percent"),
+                                'Plafond': st.column_config.NumberColumn("Plafond", format="percent"),
+                                'Ecart_%': st.column_config.NumberColumn("Écart", format="%.2f%%"),
+                            }
+                        )
+                
+                with tab5:
+                    st.markdown('<div class="section-header"><h2>Vue Société de Gestion</h2></div>', unsafe_allow_html=True)
+                    st.info("📖 Expositions de tous les OPCVM additionnées par émetteur : exposition totale, "
+                            "fonds exposés et ratio le plus élevé")
+                    
+                    exposure = results.get('exposure')
+                    if exposure is None:
+                        st.warning("⚠️ Aucune donnée")
+                    else:
+                        st.caption(f"{exposure.shape[1]} émetteurs détenus par {exposure.shape[0]} fonds, "
+                                   f"encours total {exposure.actif_net.sum():,.0f} MAD".replace(',', ' '))
+                        top_issuers = exposure.top_issuers(20)
+                        st.dataframe(
+                            top_issuers[['Emetteur', 'Montant_MAD', 'Part_Encours', 'Nb_Fonds',
+                                         'Ratio_Max', 'Fonds_Ratio_Max']],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                'Montant_MAD': st.column_config.NumberColumn("Exposition totale (MAD)", format="localized"),
+                                'Part_Encours': st.column_config.NumberColumn("Part de l'encours", format="percent"),
+                                'Nb_Fonds': st.column_config.NumberColumn("Fonds exposés"),
+                                'Ratio_Max': st.column_config.NumberColumn("Ratio max", format="percent"),
+                                'Fonds_Ratio_Max': st.column_config.TextColumn("Fonds du ratio max"),
+                            }
+                        )
+                        emetteur_societe = st.selectbox("Exposition par fonds à l'émetteur",
+                                                        top_issuers['Emetteur'].tolist(), key='emetteur_societe')
+                        if emetteur_societe is not None:
+                            st.dataframe(
+                                exposure.issuer_exposure(emetteur_societe).sort_values('Ratio', ascending=False),
+                                use_container_width=True,
+                                hide_index=True,
+                                column_config={
+                                    'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                                    'Actif_Net_MAD': st.column_config.NumberColumn("Actif net (MAD)", format="localized"),
+                                    'Ratio': st.column_config.NumberColumn("Ratio", format="percent"),
+                                }
+                            )
+                
+                with tab6:
+                    st.markdown('<div class="section-header"><h2>Export & Rapports</h2></div>', unsafe_allow_html=True)
+                    
+                    with profiler.stage('onglets_rapport', rows=len(ratios_df)):
+                        export_dict = build_report_sheets(ratios_df, rule_45_df, actif_net_dict,
+                                                          control_date, kpis, group_ratios=results.get('groups'),
+                                                          top_issuers=None if results.get('exposure') is None
+                                                          else results['exposure'].top_issuers(REPORT_TOP_ISSUERS))
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        # Rapport écrit seulement à la demande, puis resservi depuis le cache
+                        if st.button("⚙️ Générer le Rapport Excel", use_container_width=True):
+                            with st.spinner("📝 Écriture du rapport..."), profiler.stage('export'):
+                                results['report'] = build_excel_report(results['key'], export_dict)
+                        if 'report' in results:
                             st.download_button(
                                 label="📥 Télécharger Rapport Excel",
-                                data=output,
+                                data=results['report'],
                                 file_name=f"controle_opcvm_{control_date.strftime('%Y%m%d')}.xlsx",
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                 use_container_width=True
                             )
+                    
+                    with col2:
+                        if len(non_conformes) > 0:
+                            csv = non_conformes.to_csv(index=False)
+                            st.download_button(
+                                label="📥 Télécharger Alertes CSV",
+                                data=csv,
+                                file_name=f"alertes_{control_date.strftime('%Y%m%d')}.csv",
+                                mime="text/csv",
+                                use_container_width=True
+                            )
+                    
+                    st.markdown("")
+                    st.info(f"""
+                    **📋 Contenu du rapport**: {len(export_dict)} onglets
+                    - Ratios_Complet ({len(ratios_df)} lignes)
+                    - Regle_45 ({len(rule_45_df)} lignes)
+                    {f"- Alertes ({len(non_conformes)} lignes)" if len(non_conformes) > 0 else ""}
+                    {f"- Groupes ({len(export_dict['Groupes'])} lignes)" if 'Groupes' in export_dict else ""}
+                    {f"- Societe ({len(export_dict['Societe'])} émetteurs)" if 'Societe' in export_dict else ""}
+                    - Synthèse
+                    """)
+                
+                with tab7:
+                    st.markdown('<div class="section-header"><h2>Historique des Ratios</h2></div>', unsafe_allow_html=True)
+                    
+                    history = get_history_store()
+                    hist_funds = history.funds()
+                    
+                    if hist_funds:
+                        h1, h2, h3 = st.columns([2, 2, 1])
+                        with h1:
+                            hist_fonds = st.selectbox("Fonds", hist_funds, key='hist_fonds')
+                        with h2:
+                            hist_emetteur = st.selectbox("Émetteur", history.issuers(hist_fonds), key='hist_emetteur')
+                        with h3:
+                            nb_jours = st.number_input("Période (jours)", min_value=7, max_value=3650, value=365, step=7)
+                        debut = control_date - timedelta(days=int(nb_jours))
                         
-                        with col2:
-                            if len(non_conformes) > 0:
-                                csv = non_conformes.to_csv(index=False)
-                                st.download_button(
-                                    label="📥 Télécharger Alertes CSV",
-                                    data=csv,
-                                    file_name=f"alertes_{control_date.strftime('%Y%m%d')}.csv",
-                                    mime="text/csv",
-                                    use_container_width=True
-                                )
+                        with profiler.stage('graphiques_historique'):
+                            series = history.series(hist_fonds, hist_emetteur, start=debut, end=control_date)
+                            fig = go.Figure()
+                            fig.add_trace(go.Scatter(
+                                x=series['date_controle'], y=series['ratio'] * 100,
+                                mode='lines+markers', name='Ratio', line=dict(color='#3b82f6')
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=series['date_controle'], y=series['plafond'] * 100,
+                                mode='lines', name='Plafond', line=dict(color='#ef4444', dash='dash')
+                            ))
+                            fig.update_layout(
+                                height=400,
+                                yaxis_title="% de l'actif net",
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                font=dict(family="Poppins", size=14)
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
                         
-                        st.markdown("")
-                        st.info(f"""
-                        **📋 Contenu du rapport**: {len(export_dict)} onglets
-                        - Ratios_Complet ({len(ratios_df)} lignes)
-                        - Regle_45 ({len(rule_45_df)} lignes)
-                        {f"- Alertes ({len(non_conformes)} lignes)" if len(non_conformes) > 0 else ""}
-                        - Synthèse
-                        """)
+                            st.markdown("##### 🎯 Règle 45% du fonds")
+                            rule_series = history.rule_45_series(hist_fonds, start=debut, end=control_date)
+                            fig = go.Figure()
+                            fig.add_trace(go.Scatter(
+                                x=rule_series['date_controle'], y=rule_series['ratio'] * 100,
+                                mode='lines+markers', name='Émetteurs au-delà du seuil', line=dict(color='#8b5cf6')
+                            ))
+                            fig.add_trace(go.Scatter(
+                                x=rule_series['date_controle'], y=rule_series['seuil'] * 100,
+                                mode='lines', name='Seuil', line=dict(color='#ef4444', dash='dash')
+                            ))
+                            fig.update_layout(
+                                height=350,
+                                yaxis_title="% de l'actif net",
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                font=dict(family="Poppins", size=14)
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
+                        st.caption(f"{len(history.runs())} contrôle(s) enregistré(s) sur {len(history.dates())} date(s) ; "
+                                   "chaque date affiche son dernier contrôle")
+                    else:
+                        st.info("ℹ️ Aucun contrôle enregistré pour l'instant")
+                
+                with tab8:
+                    st.markdown('<div class="section-header"><h2>Simulation Pré-Trade</h2></div>', unsafe_allow_html=True)
+                    st.info("📖 Effet d'un ordre sur le plafond de l'émetteur et sur la règle des 45%, avant exécution")
                     
-                    # SYNTHÈSE
-                    st.markdown("---")
-                    st.markdown('<div class="section-header"><h2><span class="section-icon">📋</span>Rapport de Synthèse</h2></div>', unsafe_allow_html=True)
+                    # État des expositions construit une fois par analyse ; chaque ordre est évalué en O(1)
+                    if 'whatif' not in results:
+                        with profiler.stage('etat_expositions', rows=len(ratios_df)):
+                            results['whatif'] = ExposureState(ratios_df, actif_net_dict, params)
+                    exposure_state = results['whatif']
                     
-                    col1, col2 = st.columns(2)
+                    with st.form('pre_trade'):
+                        o1, o2, o3, o4 = st.columns([2, 2, 2, 1])
+                        with o1:
+                            fonds_ordre = st.selectbox("Fonds", list(exposure_state.actif_net))
+                        with o2:
+                            emetteur_ordre = st.selectbox("Émetteur", sorted(ratios_df['Emetteur'].unique()))
+                            nouvel_emetteur = st.text_input("ou nouvel émetteur")
+                        with o3:
+                            montant_ordre = st.number_input("Montant (MAD, négatif = vente)", value=0.0,
+                                                            step=1_000_000.0, format="%.0f")
+                        with o4:
+                            action_ordre = st.checkbox("Actions")
+                        submitted = st.form_submit_button("🔎 Vérifier l'ordre", type="primary")
                     
-                    with col1:
-                        st.markdown("##### ✅ Points Positifs")
-                        st.success(f"""
-                        - ✓ **{total_conformes}** ratios conformes sur **{len(ratios_df)}**
-                        - ✓ Taux de conformité: **{taux_conformite:.1f}%**
-                        - ✓ **{len(rule_45_df[rule_45_df['Conformite'] == '✅'])}** fonds OK règle 45%
-                        - ✓ **{len(actif_net_dict)}** fonds analysés
-                        """)
-                    
-                    with col2:
-                        if total_non_conformes > 0:
-                            st.markdown("##### ⚠️ Actions Requises")
-                            emetteurs = ', '.join(non_conformes['Emetteur'].unique()[:5])
-                            st.warning(f"""
-                            - ⚠ **{total_non_conformes}** dépassements
-                            - ⚠ Émetteurs: **{emetteurs}**
-                            - ⚠ Régularisation nécessaire
-                            - ⚠ Suivi renforcé
-                            """)
+                    if submitted:
+                        check = exposure_state.check(fonds_ordre, nouvel_emetteur.strip() or emetteur_ordre,
+                                                     montant_ordre, action_ordre)
+                        m1, m2, m3 = st.columns(3)
+                        with m1:
+                            st.metric("Ratio émetteur", f"{check['Ratio_apres']:.2%}",
+                                      f"{(check['Ratio_apres'] - check['Ratio_avant']) * 100:+.2f} pts",
+                                      delta_color="inverse")
+                        with m2:
+                            st.metric("Plafond", f"{check['Plafond']:.0%}")
+                        with m3:
+                            st.metric("Règle 45%", f"{check['Ratio_45_apres']:.2%}",
+                                      f"{(check['Ratio_45_apres'] - check['Ratio_45_avant']) * 100:+.2f} pts",
+                                      delta_color="inverse")
+                        if check['Conforme_plafond'] and check['Conforme_45']:
+                            st.success("✅ Ordre conforme")
                         else:
-                            st.markdown("##### ✅ Conformité Totale")
-                            st.success("""
-                            - ✓ Aucun dépassement
-                            - ✓ Conformité CDVM 100%
-                            - ✓ Portfolio régulier
-                            - ✓ Seuils respectés
-                            """)
+                            motifs = [m for m, ok in (("plafond émetteur", check['Conforme_plafond']),
+                                                      ("règle des 45%", check['Conforme_45'])) if not ok]
+                            st.error(f"❌ Ordre non conforme : {', '.join(motifs)}")
                     
+                    st.markdown("")
+                    st.markdown("##### 📑 Lot d'ordres")
+                    orders_file = st.file_uploader(f"CSV : {', '.join(ORDER_COLUMNS)} (optionnelle)", type=['csv'])
+                    if orders_file:
+                        orders = pd.read_csv(orders_file)
+                        missing = [c for c in ORDER_COLUMNS[:3] if c not in orders.columns]
+                        if missing:
+                            st.error(f"❌ Colonnes manquantes : {', '.join(missing)}")
+                        else:
+                            with profiler.stage('simulation_lot', rows=len(orders)):
+                                checked = exposure_state.check_batch(orders)
+                            rejetes = checked[~(checked['Conforme_plafond'] & checked['Conforme_45'])]
+                            st.metric("❌ Ordres non conformes", f"{len(rejetes)} / {len(checked)}")
+                            st.dataframe(
+                                checked,
+                                use_container_width=True,
+                                hide_index=True,
+                                column_config={
+                                    'Montant_MAD': st.column_config.NumberColumn("Montant (MAD)", format="localized"),
+                                    'Ratio_avant': st.column_config.NumberColumn(format="percent"),
+                                    'Ratio_apres': st.column_config.NumberColumn(format="percent"),
+                                    'Plafond': st.column_config.NumberColumn(format="percent"),
+                                    'Ratio_45_avant': st.column_config.NumberColumn(format="percent"),
+                                    'Ratio_45_apres': st.column_config.NumberColumn(format="percent"),
+                                }
+                            )
+                
+                # SYNTHÈSE
+                st.markdown("---")
+                st.markdown('<div class="section-header"><h2><span class="section-icon">📋</span>Rapport de Synthèse</h2></div>', unsafe_allow_html=True)
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.markdown("##### ✅ Points Positifs")
+                    st.success(f"""
+                    - ✓ **{total_conformes}** ratios conformes sur **{len(ratios_df)}**
+                    - ✓ Taux de conformité: **{taux_conformite:.1f}%**
+                    - ✓ **{len(rule_45_df[rule_45_df['Conformite'] == '✅'])}** fonds OK règle 45%
+                    - ✓ **{len(actif_net_dict)}** fonds analysés
+                    """)
+                
+                with col2:
+                    if total_non_conformes > 0:
+                        st.markdown("##### ⚠️ Actions Requises")
+                        emetteurs = ', '.join(non_conformes['Emetteur'].unique()[:5])
+                        st.warning(f"""
+                        - ⚠ **{total_non_conformes}** dépassements
+                        - ⚠ Émetteurs: **{emetteurs}**
+                        - ⚠ Régularisation nécessaire
+                        - ⚠ Suivi renforcé
+                        """)
+                    else:
+                        st.markdown("##### ✅ Conformité Totale")
+                        st.success("""
+                        - ✓ Aucun dépassement
+                        - ✓ Conformité CDVM 100%
+                        - ✓ Portfolio régulier
+                        - ✓ Seuils respectés
+                        """)
+                
         else:
             st.error("❌ Échec du chargement")
 else:
@@ -1251,6 +1386,26 @@ else:
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Panneau performance : étapes de ce rerun (sous-étapes du moteur en retrait)
+if profiler.records:
+    with perf_panel:
+        with st.expander("⏱️ Performance", expanded=False):
+            perf_df = pd.DataFrame(profiler.summary())
+            perf_df['etape'] = ['\u2003' * niveau + etape for niveau, etape in zip(perf_df['niveau'], perf_df['etape'])]
+            st.dataframe(
+                perf_df.drop(columns='niveau'),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'etape': st.column_config.TextColumn("Étape"),
+                    'appels': st.column_config.NumberColumn("Appels"),
+                    'secondes': st.column_config.NumberColumn("Durée (s)", format="%.3f"),
+                    'lignes': st.column_config.NumberColumn("Lignes", format="localized"),
+                    'memoire_mo': st.column_config.NumberColumn("Mémoire (Mo)", format="%+.1f"),
+                }
+            )
+            st.caption(f"Total : {sum(profiler.timings.values()):.2f}s")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,112 @@
+"""
+Benchmark onglet Non-Conformités : un expander par dépassement (historique) vs vue agrégée
+
+Rend les deux versions de l'onglet avec streamlit.testing (AppTest) pour
+10, 100 et 1 000 dépassements, et compte les éléments produits.
+
+Usage : python -m benchmarks.bench_breaches [--breaches 10 100 1000]
+"""
+
+import argparse
+import importlib.util
+import sys
+import time
+
+
+def legacy_view(n_breaches):
+    """Onglet d'origine : un expander et trois métriques par dépassement"""
+    import streamlit as st
+    from benchmarks.bench_breaches import breaches
+
+    ratios_df = breaches(n_breaches)
+    non_conformes = ratios_df[ratios_df['Conformite'] == '❌']
+    st.dataframe(non_conformes[['Fonds', 'Emetteur', 'Ratio_%', 'Plafond_%', 'Ecart_%']].copy())
+    for _, row in non_conformes.iterrows():
+        with st.expander(f"🔴 {row['Fonds']} - {row['Emetteur']} | Écart: {row['Ecart_%']:.2f}%"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Montant", f"{row['Montant_MAD']:,.0f} MAD".replace(',', ' '))
+            with col2:
+                st.metric("Ratio", row['Ratio_%'])
+            with col3:
+                st.metric("Plafond", row['Plafond_%'])
+
+
+def drilldown_view(n_breaches):
+    """Onglet actuel (même structure que app.py) : synthèse puis détail du groupe choisi"""
+    import streamlit as st
+    from benchmarks.bench_breaches import breaches
+    from engine.report import summarize_breaches
+
+    ratios_df = breaches(n_breaches)
+    non_conformes = ratios_df[ratios_df['Conformite'] == '❌']
+    vue = st.radio("Regrouper par", ['Fonds', 'Emetteur'], horizontal=True)
+    summary = summarize_breaches(ratios_df, by=vue)
+    st.dataframe(summary, hide_index=True)
+    choix = st.selectbox(f"{vue} à détailler", summary[vue])
+    detail = non_conformes[non_conformes[vue] == choix].sort_values('Ecart_%', ascending=False)
+    pire = detail.iloc[0]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Montant", f"{pire['Montant_MAD']:,.0f} MAD".replace(',', ' '))
+    with col2:
+        st.metric("Ratio", pire['Ratio_%'])
+    with col3:
+        st.metric("Plafond", pire['Plafond_%'])
+    st.dataframe(detail[['Fonds', 'Emetteur', 'Montant_MAD', 'Ratio', 'Plafond', 'Ecart_%']], hide_index=True)
+
+
+def breaches(n_breaches, n_funds=20, seed=0):
+    """Ratios synthétiques dont n_breaches non conformes"""
+    import numpy as np
+    import pandas as pd
+
+    from engine.ratios import RATIO_COLUMNS, apply_ceilings
+
+    rng = np.random.default_rng(seed)
+    n = n_breaches * 4
+    actif_net = rng.uniform(1e8, 1e9, n)
+    ratio = np.where(np.arange(n) < n_breaches, rng.uniform(0.11, 0.3, n), rng.uniform(0, 0.09, n))
+    exposures = pd.DataFrame({
+        'Fonds': [f"F{i % n_funds:03d}" for i in range(n)],
+        'Emetteur': [f"E{i:05d}" for i in range(n)],
+        'Type': 'privé',
+        'Montant_MAD': ratio * actif_net,
+        'Actif_Net_MAD': actif_net,
+        'Is_Action': False,
+    })
+    return apply_ceilings(exposures, {})[RATIO_COLUMNS]
+
+
+def render(view, n_breaches):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_function(view, args=(n_breaches,), default_timeout=600)
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return elapsed, len(app.expander) + len(app.metric) + len(app.dataframe) + len(app.selectbox) + len(app.radio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--breaches', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('streamlit') is None:
+        print("streamlit requis pour ce benchmark (pip install streamlit)", file=sys.stderr)
+        return 2
+
+    render(drilldown_view, 1)  # premier rendu : imports et initialisation de streamlit
+    for n in args.breaches:
+        t_legacy, w_legacy = render(legacy_view, n)
+        t_drill, w_drill = render(drilldown_view, n)
+        print(f"{n:>5} dépassements | historique : {t_legacy:.2f}s, {w_legacy} éléments"
+              f" | agrégé : {t_drill:.2f}s, {w_drill} éléments")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
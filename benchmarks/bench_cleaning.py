@@ -0,0 +1,90 @@
+"""
+Benchmark nettoyage des montants : clean_number cellule par cellule vs clean_numeric_series
+
+Vérifie d'abord l'égalité stricte des deux versions sur un corpus aléatoire
+(formats dépositaires, bruit, valeurs non numériques), puis mesure le gain.
+
+Usage : python -m benchmarks.bench_cleaning [--rows 1000000] [--seed 0]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine.cleaning import clean_number, clean_numeric_series
+
+_NOISE = [' ', '\xa0', ' ', ' ', '\t', '\n', ',', '.', '-', '+', 'e', 'E',
+          'MAD', 'x', '_', '%', '(', ')']
+
+
+def random_value(rng):
+    """Une valeur de cellule telle qu'on peut la trouver dans un extract"""
+    kind = rng.random()
+    if kind < 0.35:
+        amount = rng.uniform(-1e9, 1e10)
+        text = f"{amount:,.{rng.randint(0, 4)}f}"
+        return text.replace(',', rng.choice([' ', '\xa0', ',', ' ']))
+    if kind < 0.50:
+        return rng.uniform(-1e9, 1e10)
+    if kind < 0.60:
+        return rng.randint(-10**9, 10**9)
+    if kind < 0.65:
+        return rng.choice([None, np.nan, '', '-', 'nan', 'NaN', ' - ', 'inf', 'null', True])
+    size = rng.randint(0, 12)
+    return ''.join(rng.choice('0123456789' * 3 + ''.join(_NOISE)) for _ in range(size))
+
+
+def corpus(n, seed):
+    rng = random.Random(seed)
+    return pd.Series([random_value(rng) for _ in range(n)], dtype=object)
+
+
+def check_identical(series):
+    expected = series.apply(clean_number).to_numpy(dtype=float)
+    got = clean_numeric_series(series).to_numpy()
+    same = (expected == got) | (np.isnan(expected) & np.isnan(got))
+    if not same.all():
+        bad = series[~same].head(10)
+        raise AssertionError(f"Écarts avec clean_number : {list(bad)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for seed in range(args.seed, args.seed + 20):
+        mixed = corpus(5_000, seed)
+        check_identical(mixed)
+        check_identical(mixed[mixed.map(lambda v: isinstance(v, str))])
+    print("Égalité avec clean_number : OK (20 corpus aléatoires)")
+
+    rng = np.random.default_rng(args.seed)
+    values = rng.uniform(0, 1e8, args.rows)
+    columns = {
+        'texte formaté': pd.Series(values).map(
+            lambda v: f"{v:,.2f}".replace(',', '\xa0')
+        ).astype(object),
+        'cellules numériques': pd.Series(values, dtype=object),
+    }
+    columns['texte formaté'][::50] = '-'
+
+    for label, column in columns.items():
+        start = time.perf_counter()
+        legacy = column.apply(clean_number)
+        t_legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = clean_numeric_series(column)
+        t_vector = time.perf_counter() - start
+
+        assert np.array_equal(legacy.to_numpy(), vectorized.to_numpy())
+        print(f"{label} ({args.rows:,} lignes) : clean_number {t_legacy:.2f}s, "
+              f"clean_numeric_series {t_vector:.2f}s (x{t_legacy / t_vector:.1f})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark contrôle différentiel : contrôle complet vs relance après modification de quelques fonds
+
+Écrit un classeur de --funds onglets, le contrôle une première fois, puis
+modifie les valorisations de --changed onglets et compare la relance
+complète à la relance différentielle (résultats identiques exigés).
+
+Usage : python -m benchmarks.bench_delta [--funds 300] [--lines 100] [--changed 3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+
+from engine.delta import DeltaControl
+from engine.pipeline import run_control
+
+
+def write_book(path, n_funds, n_lines, changed=()):
+    """Classeur FOND.xlsx ; les onglets de `changed` ont des valorisations majorées de 5%"""
+    wb = Workbook(write_only=True)
+    for s in range(n_funds):
+        ws = wb.create_sheet(f'F{s:03d}')
+        ws.append(['ISIN', 'Type', 'Description', 'Quantité', 'Prix revient',
+                   'Valo J', 'Prix revient global', 'Valo globale', '+/- value'])
+        bump = 1.05 if s in changed else 1.0
+        for i in range(n_lines):
+            ws.append([f'MA{i:010d}', 'ACTION' if i % 3 else 'OBLIGATION', f'ATW {i}' if i % 2 else f'BCP {i}',
+                       10, 100.0, 101.0, 1000.0, round((1000 + s * 7 + i) * bump, 2), 10.0])
+    wb.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=300)
+    parser.add_argument('--lines', type=int, default=100)
+    parser.add_argument('--changed', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'FOND.xlsx')
+        nav = {f'F{s:03d}': 5e6 for s in range(args.funds)}
+        write_book(path, args.funds, args.lines)
+        delta = DeltaControl(path=os.path.join(tmp, 'delta'))
+
+        class Nav:
+            def lookup(self, funds, control_date, fallback=None):
+                return {fonds: nav.get(fonds, 0) for fonds in funds}
+
+        start = time.perf_counter()
+        run_control(path, nav_store=Nav(), delta=delta)
+        print(f"{args.funds} fonds x {args.lines} lignes")
+        print(f"  premier contrôle            : {time.perf_counter() - start:.2f}s")
+
+        write_book(path, args.funds, args.lines, changed=range(args.changed))
+
+        start = time.perf_counter()
+        full = run_control(path, nav_store=Nav())
+        print(f"  relance complète            : {time.perf_counter() - start:.2f}s")
+
+        # état relu depuis le disque, comme une nouvelle exécution du batch
+        delta = DeltaControl(path=os.path.join(tmp, 'delta'))
+        start = time.perf_counter()
+        result = run_control(path, nav_store=Nav(), delta=delta)
+        print(f"  relance différentielle      : {time.perf_counter() - start:.2f}s "
+              f"({len(result['delta']['fonds_recalcules'])} fonds recalculés, "
+              f"{len(result['delta']['fonds_reutilises'])} réutilisés)")
+
+        pd.testing.assert_frame_equal(result['ratios'], full['ratios'])
+        pd.testing.assert_frame_equal(result['rule_45'], full['rule_45'])
+        print("Égalité avec le contrôle complet : OK")
+
+
+if __name__ == '__main__':
+    main()
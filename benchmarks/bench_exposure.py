@@ -0,0 +1,131 @@
+"""
+Benchmark matrice fonds x émetteurs : vues société de gestion en CSR vs regroupements pandas
+
+Vérifie sur des positions synthétiques (benchmarks.synthetic) que la
+matrice redonne exactement les ratios de calculate_issuer_ratios, et que
+les totaux par émetteur et le classement inter-fonds égalent un
+regroupement pandas des ratios. Construit ensuite directement des
+expositions agrégées à l'échelle d'une société de gestion (--scale-funds
+fonds, --scale-issuers émetteurs, --holdings lignes par fonds, émetteurs
+tirés selon une loi de Zipf) et mesure construction, mémoire, totaux,
+classement et colonne d'un émetteur.
+
+Usage : python -m benchmarks.bench_exposure [--scale-funds 3000] [--scale-issuers 30000] [--holdings 300]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import positions_frame
+from engine.exposure import ExposureMatrix, scipy_available
+from engine.issuers import IssuerMatcher, add_issuers
+from engine.loader import compact_positions
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_issuer_ratios
+
+
+def check_equality(n_funds, n_lines, n_issuers):
+    positions, table, nav = positions_frame(n_funds, n_lines, n_issuers)
+    labeled = add_issuers(compact_positions(positions), IssuerMatcher(table))
+    ratios = calculate_issuer_ratios(labeled, nav, DEFAULT_PARAMS)
+    matrix = ExposureMatrix.from_positions(labeled, nav)
+
+    # ratios (Fonds, Emetteur) dans l'ordre du calcul : fonds d'apparition, émetteurs triés
+    assert matrix.nnz == len(ratios)
+    assert list(matrix.funds.take(matrix._rows())) == list(ratios['Fonds'])
+    assert list(matrix.issuers.take(matrix.indices)) == list(ratios['Emetteur'])
+    assert np.array_equal(matrix.ratios(), ratios['Ratio'].to_numpy())
+    print("Ratios de la matrice identiques à calculate_issuer_ratios : OK")
+
+    totals = ratios.groupby('Emetteur')['Montant_MAD'].sum()
+    assert np.allclose(matrix.issuer_totals(), totals.reindex(matrix.issuers).to_numpy())
+    fund_totals = ratios.groupby('Fonds', sort=False)['Montant_MAD'].sum()
+    assert np.allclose(matrix.fund_totals(), fund_totals.reindex(matrix.funds).to_numpy())
+    top = matrix.top_issuers(20)
+    expected = totals.sort_values(ascending=False, kind='stable').head(20)
+    assert list(top['Emetteur']) == list(expected.index)
+    worst = ratios.loc[ratios.groupby('Emetteur')['Ratio'].idxmax()].set_index('Emetteur')
+    assert np.array_equal(top['Ratio_Max'].to_numpy(), worst.loc[top['Emetteur'], 'Ratio'].to_numpy())
+    assert list(top['Fonds_Ratio_Max']) == list(worst.loc[top['Emetteur'], 'Fonds'])
+    print("Totaux par émetteur et classement identiques au regroupement pandas : OK")
+
+    if scipy_available():
+        sparse = matrix.to_scipy()
+        assert np.allclose(np.asarray(sparse.sum(axis=0)).ravel(), matrix.issuer_totals())
+        print("Export scipy.sparse : OK")
+
+
+def scale_exposures(n_funds, n_issuers, holdings, seed=0):
+    """Expositions agrégées (Fonds, Emetteur, Montant_MAD, Actif_Net_MAD), émetteurs selon Zipf"""
+    rng = np.random.default_rng(seed)
+    funds = np.repeat(np.arange(n_funds), holdings)
+    issuers = (rng.zipf(1.3, len(funds)) - 1) % n_issuers
+    pairs = np.unique(funds.astype(np.int64) * n_issuers + issuers)
+    amounts = rng.lognormal(15, 1.5, len(pairs))
+    nav = rng.lognormal(20, 1, n_funds)
+    return pd.DataFrame({
+        'Fonds': pd.Index([f'F{i:05d}' for i in range(n_funds)]).take(pairs // n_issuers),
+        'Emetteur': pd.Index([f'E{i:06d}' for i in range(n_issuers)]).take(pairs % n_issuers),
+        'Montant_MAD': amounts,
+        'Actif_Net_MAD': nav[pairs // n_issuers],
+    })
+
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=500)
+    parser.add_argument('--issuers', type=int, default=2000)
+    parser.add_argument('--scale-funds', type=int, default=3000)
+    parser.add_argument('--scale-issuers', type=int, default=30_000)
+    parser.add_argument('--holdings', type=int, default=300)
+    args = parser.parse_args()
+
+    check_equality(args.funds, args.lines, args.issuers)
+
+    exposures = scale_exposures(args.scale_funds, args.scale_issuers, args.holdings)
+    matrix, t_build = measure(lambda: ExposureMatrix.from_ratios(exposures))
+    dense_mb = matrix.shape[0] * matrix.shape[1] * 8 / 1e6
+    print(f"{matrix.shape[0]:,} fonds x {matrix.shape[1]:,} émetteurs, {matrix.nnz:,} couples détenus : "
+          f"{matrix.nbytes / 1e6:.1f} Mo en CSR (dense : {dense_mb:,.0f} Mo)")
+    print(f"  construction                    : {t_build * 1000:.0f}ms")
+
+    rows = []
+    _, t_pandas = measure(lambda: exposures.groupby('Emetteur')['Montant_MAD'].sum())
+    _, t_matrix = measure(matrix.issuer_totals)
+    rows.append(('totaux par émetteur', t_pandas, t_matrix))
+    _, t_pandas = measure(lambda: exposures['Montant_MAD'] / exposures['Actif_Net_MAD'])
+    _, t_matrix = measure(matrix.ratios)
+    rows.append(('ratios', t_pandas, t_matrix))
+
+    def pandas_top():
+        ratio = exposures['Montant_MAD'] / exposures['Actif_Net_MAD']
+        by_issuer = exposures.assign(Ratio=ratio).groupby('Emetteur')
+        table = pd.DataFrame({'Montant_MAD': by_issuer['Montant_MAD'].sum(),
+                              'Nb_Fonds': by_issuer.size(), 'Ratio_Max': by_issuer['Ratio'].max()})
+        return table.nlargest(20, 'Montant_MAD')
+    _, t_pandas = measure(pandas_top)
+    top, t_matrix = measure(lambda: matrix.top_issuers(20))
+    rows.append(('classement inter-fonds', t_pandas, t_matrix))
+
+    emetteur = top['Emetteur'].iloc[0]
+    _, t_pandas = measure(lambda: exposures[exposures['Emetteur'] == emetteur])
+    column, t_matrix = measure(lambda: matrix.issuer_exposure(emetteur))
+    rows.append((f'colonne {emetteur} ({len(column)} fonds)', t_pandas, t_matrix))
+
+    print(f"  {'opération':<30} {'pandas (ms)':>12} {'matrice (ms)':>13}")
+    for label, t_pandas, t_matrix in rows:
+        print(f"  {label:<30} {t_pandas * 1000:>12.1f} {t_matrix * 1000:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark groupes d'émetteurs : aplatissement de la hiérarchie et ratios par groupe
+
+Construit une hiérarchie aléatoire de --entities entités sur --depth
+niveaux de détention (têtes de groupe, holdings intermédiaires, puis les
+émetteurs des positions synthétiques), vérifie que l'index aplati donne
+la même tête de groupe qu'une remontée parent par parent, et que les
+ratios par groupe égalent un regroupement direct des positions par tête
+de groupe. Mesure la construction de l'index et le surcoût des groupes
+par rapport aux seuls ratios émetteurs.
+
+Usage : python -m benchmarks.bench_groups [--entities 20000] [--depth 6] [--lines 200000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import positions_frame
+from engine.issuers import IssuerGroups, IssuerMatcher, add_issuers
+from engine.loader import compact_positions
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_group_ratios, calculate_issuer_ratios
+
+
+def random_hierarchy(issuers, n_entities, depth, seed=0):
+    """(emetteur, parent) : holdings répartis sur depth - 1 niveaux, émetteurs au dernier"""
+    rng = np.random.default_rng(seed)
+    n_holdings = max(depth - 1, n_entities - len(issuers))
+    levels = np.sort(rng.integers(0, depth - 1, n_holdings))
+    levels[:depth - 1] = np.arange(depth - 1)
+    holdings = np.array([f'HOLDING{i:06d}' for i in range(n_holdings)], dtype=object)
+    parents = np.empty(n_holdings, dtype=object)
+    for level in range(1, depth - 1):
+        above = holdings[levels == level - 1]
+        members = levels == level
+        parents[members] = above[rng.integers(0, len(above), members.sum())]
+    # un tiers des émetteurs reste indépendant
+    attached = rng.random(len(issuers)) < 2 / 3
+    issuer_parents = np.where(attached, holdings[rng.integers(0, n_holdings, len(issuers))], None)
+    hierarchy = pd.DataFrame({
+        'emetteur': np.concatenate([holdings, np.asarray(issuers, dtype=object)]),
+        'parent': np.concatenate([parents, issuer_parents]),
+    })
+    return hierarchy.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def walk_up(hierarchy):
+    """Référence : remontée parent par parent pour chaque entité"""
+    parent = dict(zip(hierarchy['emetteur'], hierarchy['parent']))
+    heads = {}
+    for entity in parent:
+        node = entity
+        while isinstance(parent.get(node), str):
+            node = parent[node]
+        heads[entity] = node
+    return heads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entities', type=int, default=20_000)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--lines', type=int, default=200_000)
+    parser.add_argument('--funds', type=int, default=200)
+    parser.add_argument('--issuers', type=int, default=2000)
+    args = parser.parse_args()
+
+    positions, table, nav = positions_frame(args.funds, args.lines // args.funds, args.issuers)
+    labeled = add_issuers(compact_positions(positions), IssuerMatcher(table))
+    issuers = labeled['Emetteur'].cat.categories.to_numpy(dtype=object)
+    hierarchy = random_hierarchy(issuers, args.entities, args.depth)
+
+    start = time.perf_counter()
+    groups = IssuerGroups(hierarchy)
+    t_index = time.perf_counter() - start
+
+    start = time.perf_counter()
+    heads = walk_up(hierarchy)
+    t_walk = time.perf_counter() - start
+    entities = hierarchy['emetteur'].to_numpy(dtype=object)
+    assert list(groups.group_of(entities)) == [heads[e] for e in entities]
+    print("Têtes de groupe identiques à la remontée parent par parent : OK")
+
+    start = time.perf_counter()
+    ratios = calculate_issuer_ratios(labeled, nav, DEFAULT_PARAMS)
+    t_ratios = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grouped = calculate_issuer_ratios(labeled, nav, DEFAULT_PARAMS, groups=groups)
+    group_ratios = calculate_group_ratios(grouped, DEFAULT_PARAMS)
+    t_groups = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(grouped.drop(columns='Groupe'), ratios)
+    expected = pd.DataFrame({
+        'Fonds': labeled['Fonds'].astype(object),
+        'Groupe': [heads.get(e, e) for e in labeled['Emetteur'].astype(object)],
+        'Montant_MAD': labeled['Valo_globale'],
+    }).groupby(['Fonds', 'Groupe'])['Montant_MAD'].sum()
+    actual = group_ratios.set_index(['Fonds', 'Groupe'])['Montant_MAD'].sort_index()
+    assert np.allclose(actual.to_numpy(), expected.sort_index().to_numpy())
+    assert (actual.index == expected.sort_index().index).all()
+    print("Montants par groupe identiques au regroupement direct des positions : OK")
+
+    multi = group_ratios[group_ratios['Nb_Emetteurs'] > 1]
+    print(f"{len(groups):,} entités sur {args.depth} niveaux, {len(labeled):,} positions, "
+          f"{len(ratios):,} ratios émetteurs -> {len(group_ratios):,} ratios groupes "
+          f"({len(multi):,} de plusieurs émetteurs)")
+    print(f"  index aplati (sauts de pointeurs) : {t_index * 1000:.0f}ms")
+    print(f"  remontée parent par parent        : {t_walk * 1000:.0f}ms")
+    print(f"  ratios émetteurs                  : {t_ratios * 1000:.0f}ms")
+    print(f"  ratios émetteurs + groupes        : {t_groups * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
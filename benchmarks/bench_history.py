@@ -0,0 +1,76 @@
+"""
+Benchmark historique des ratios : écriture quotidienne et requêtes série / transversale
+
+Remplit une base temporaire avec --days contrôles de --funds fonds x --issuers
+émetteurs, puis mesure une série (un couple sur 250 jours) et une vue
+transversale (tous les ratios d'une date). La série couvre au plus les
+--days jours enregistrés.
+
+Usage : python -m benchmarks.bench_history [--funds 100] [--issuers 40] [--days 750]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_breaches import breaches
+from engine.history import HistoryStore
+from engine.ratios import check_45_percent_rule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=100)
+    parser.add_argument('--issuers', type=int, default=40)
+    parser.add_argument('--days', type=int, default=750)
+    args = parser.parse_args()
+
+    ratios = breaches(args.funds * args.issuers // 4, n_funds=args.funds)
+    nav = dict(zip(ratios['Fonds'], ratios['Actif_Net_MAD']))
+    rule_45 = check_45_percent_rule(ratios, None, nav)
+    days = pd.bdate_range(end='2026-09-30', periods=args.days)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'historique.sqlite'))
+        start = time.perf_counter()
+        for day in days:
+            store.record(day, ratios, rule_45)
+        t_write = time.perf_counter() - start
+        size = os.path.getsize(store.path)
+        print(f"{args.days} contrôles de {len(ratios):,} ratios ({args.days * len(ratios):,} lignes, "
+              f"{size / 2**20:,.0f} Mo) : {t_write / args.days * 1000:.1f}ms par contrôle")
+
+        rng = np.random.default_rng(0)
+        pairs = ratios[['Fonds', 'Emetteur']].to_numpy()[rng.integers(0, len(ratios), 20)]
+        window = min(250, len(days))
+        timings = []
+        for fonds, emetteur in pairs:
+            start = time.perf_counter()
+            series = store.series(fonds, emetteur, start=days[-window])
+            timings.append(time.perf_counter() - start)
+        assert len(series) == window
+        print(f"  série {window} jours  : {np.median(timings) * 1000:.1f}ms (médiane)")
+
+        timings = []
+        for day in days[rng.integers(0, len(days), 20)]:
+            start = time.perf_counter()
+            section = store.cross_section(day)
+            timings.append(time.perf_counter() - start)
+        assert len(section) == len(ratios)
+        print(f"  vue transversale : {np.median(timings) * 1000:.1f}ms (médiane)")
+
+        # contrôle relancé à une date déjà enregistrée : ajouté, le précédent reste lisible
+        store.record(days[-1], ratios, rule_45)
+        runs = store.runs(days[-1])
+        assert len(runs) == 2
+        assert len(store.cross_section(days[-1])) == len(ratios)
+        assert len(store.cross_section(days[-1], run=int(runs['run'].iloc[-1]))) == len(ratios)
+        print("  contrôle relancé : ajouté sans remplacer le précédent : OK")
+
+
+if __name__ == '__main__':
+    main()
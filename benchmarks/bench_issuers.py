@@ -0,0 +1,106 @@
+"""
+Benchmark identification des émetteurs : identify_issuer (iterrows) vs IssuerMatcher
+
+Mesure aussi le cache persistant (IssuerCache) : un contrôle qui n'ajoute
+que quelques descriptions nouvelles ne doit écrire que celles-ci.
+
+Usage : python -m benchmarks.bench_issuers [--positions 100000] [--keywords 5000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from engine.cache import IssuerCache
+from engine.issuers import IssuerMatcher, default_issuer_table, identify_issuer
+
+
+def issuer_table(n_keywords, rng):
+    """Table par défaut complétée de mots-clés synthétiques (dont préfixes communs)"""
+    base = default_issuer_table()
+    extra = n_keywords - len(base)
+    mots = [f"{rng.choice(['OBL', 'CD ', 'BSF', ''])}E{i:05d}" for i in range(extra)]
+    synth = pd.DataFrame({
+        'mot_cle': mots,
+        'emetteur': [f"E{i // 3:05d}" for i in range(extra)],
+        'type': ['privé'] * extra,
+    })
+    return pd.concat([base, synth], ignore_index=True)
+
+
+def descriptions(n, table, rng):
+    mots = list(table['mot_cle'])
+    result = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.05:
+            result.append(None)
+        elif kind < 0.15:
+            result.append(f"TITRE DIVERS {i}")
+        else:
+            result.append(f"{rng.choice(mots)} {rng.uniform(2, 6):.2f}% {2025 + i % 10} L{i}")
+    return pd.Series(result, dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--positions', type=int, default=100_000)
+    parser.add_argument('--keywords', type=int, default=5_000)
+    parser.add_argument('--sample', type=int, default=50,
+                        help="positions traitées par l'ancienne méthode (extrapolée)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table = issuer_table(args.keywords, rng)
+    desc = descriptions(args.positions, table, rng)
+
+    start = time.perf_counter()
+    matcher = IssuerMatcher(table)
+    t_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emetteurs, types = matcher.label(desc)
+    t_label = time.perf_counter() - start
+
+    sample = desc.sample(min(args.sample, len(desc)), random_state=args.seed)
+    start = time.perf_counter()
+    legacy = [identify_issuer(d, table) for d in sample]
+    t_legacy = (time.perf_counter() - start) * len(desc) / len(sample)
+
+    got = list(zip(emetteurs[sample.index], types[sample.index]))
+    assert got == legacy, "IssuerMatcher diverge de identify_issuer"
+
+    print(f"{args.positions:,} positions x {len(table):,} mots-clés")
+    print(f"  compilation automate : {t_build:.2f}s")
+    print(f"  IssuerMatcher.label  : {t_label:.2f}s")
+    print(f"  identify_issuer      : {t_legacy:.0f}s (extrapolé sur {len(sample)} positions)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = IssuerCache(path=tmp)
+        start = time.perf_counter()
+        cache.label(desc, table)
+        t_first = time.perf_counter() - start
+        new = pd.concat([desc.head(1000), pd.Series([f"NOUVEAU TITRE {i}" for i in range(10)])],
+                        ignore_index=True)
+        start = time.perf_counter()
+        cache.label(new, table)
+        t_increment = time.perf_counter() - start
+
+        reloaded = IssuerCache(path=tmp)
+        assert [list(a) for a in reloaded.label(new, table)] == [list(a) for a in matcher.label(new)]
+        assert reloaded.stats()['misses'] == 0
+        (journal,) = os.listdir(tmp)
+        with open(os.path.join(tmp, journal), encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+        print(f"  cache persistant     : {t_first:.2f}s au premier contrôle, "
+              f"{t_increment * 1000:.0f}ms pour 10 descriptions nouvelles "
+              f"({cache.stats()['entries']:,} entrées, journal de {lines:,} lignes, relu sans recalcul)")
+
+
+if __name__ == '__main__':
+    main()
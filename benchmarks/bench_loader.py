@@ -0,0 +1,67 @@
+"""
+Benchmark chargement classeur : lecture par onglet (historique) vs handle unique
+
+Usage : python -m benchmarks.bench_loader [--sheets 5 50 200] [--lines 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from openpyxl import Workbook
+
+from engine.loader import available_engine, iter_sheets
+
+
+def write_workbook(path, n_sheets, n_lines):
+    """Écrit un classeur de test au format FOND.xlsx"""
+    wb = Workbook(write_only=True)
+    for s in range(n_sheets):
+        ws = wb.create_sheet(f'F{s:03d}')
+        ws.append(['ISIN', 'Type', 'Description', 'Quantité', 'Prix revient',
+                   'Valo J', 'Prix revient global', 'Valo globale', '+/- value'])
+        for i in range(n_lines):
+            ws.append([f'MA{i:010d}', 'ACTION', f'ATW {i}', 10, 100.0,
+                       101.0, 1000.0, f'{1000 + i:,}.00'.replace(',', '\xa0'), 10.0])
+    wb.save(path)
+
+
+def legacy_sheets(file):
+    """Reproduit l'ancienne lecture : pd.read_excel relancé pour chaque onglet"""
+    xl = pd.ExcelFile(file)
+    for sheet_name in xl.sheet_names:
+        yield sheet_name, pd.read_excel(file, sheet_name=sheet_name, header=None)
+
+
+def measure(reader, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_rows = sum(len(df) for _, df in reader(path))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sheets', type=int, nargs='+', default=[5, 50, 200])
+    parser.add_argument('--lines', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Lecture : projetée (.xlsx), repli pandas {available_engine()}")
+    print(f"{'onglets':>8} {'lecteur':>10} {'temps (s)':>10} {'pic (Mo)':>10} {'lignes':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_sheets in args.sheets:
+            path = os.path.join(tmp, f'fond_{n_sheets}.xlsx')
+            write_workbook(path, n_sheets, args.lines)
+            for label, reader in (('historique', legacy_sheets), ('unique', iter_sheets)):
+                elapsed, peak, n_rows = measure(reader, path)
+                print(f"{n_sheets:>8} {label:>10} {elapsed:>10.2f} {peak / 1e6:>10.1f} {n_rows:>8}")
+
+
+if __name__ == '__main__':
+    main()
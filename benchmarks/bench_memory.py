@@ -0,0 +1,84 @@
+"""
+Benchmark mémoire des positions : octets par position avant et après compactage
+
+Construit --lines positions nettoyées (benchmarks.synthetic, sans passer
+par Excel), puis compare trois représentations : texte en objets Python
+(pandas < 3), texte str de pandas 3 (ancienne disposition, avec l'actif
+net recopié sur chaque ligne et la copie complète faite par add_issuers)
+et la disposition compacte du chargeur (catégories, actif net par fonds,
+étiquettes ajoutées sans copie). Vérifie que les ratios sont identiques.
+
+Usage : python -m benchmarks.bench_memory [--lines 1000000] [--funds 200] [--issuers 2000]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import positions_frame
+from engine.issuers import IssuerMatcher, add_issuers
+from engine.loader import compact_positions
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_issuer_ratios
+
+TEXT_COLUMNS = ['Code_ISIN', 'Type', 'Description', 'Fonds']
+
+
+def legacy_layout(positions, actif_net_dict, text_dtype):
+    """Ancienne disposition : texte non compacté et actif net sur chaque ligne"""
+    legacy = positions.astype({col: text_dtype for col in TEXT_COLUMNS})
+    legacy['Actif_Net'] = legacy['Fonds'].map(actif_net_dict)
+    return legacy
+
+
+def legacy_add_issuers(df, matcher):
+    """Ancien add_issuers : copie complète des positions, étiquettes en tableaux d'objets"""
+    result = df.copy()
+    result['Emetteur'], result['Type_Emetteur'] = matcher.label(result['Description'])
+    return result
+
+
+def nbytes(df):
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--funds', type=int, default=200)
+    parser.add_argument('--issuers', type=int, default=2000)
+    args = parser.parse_args()
+
+    positions, table, actif_net_dict = positions_frame(args.funds, args.lines // args.funds, args.issuers)
+    matcher = IssuerMatcher(table)
+    n = len(positions)
+
+    rows = []
+    for label, text_dtype in (('objets Python', object), ('str pandas 3', 'str')):
+        loaded = legacy_layout(positions, actif_net_dict, text_dtype)
+        labeled = legacy_add_issuers(loaded, matcher)
+        # positions chargées et étiquetées coexistent (session, contrôle par étapes)
+        rows.append((label, nbytes(loaded), nbytes(labeled), nbytes(loaded) + nbytes(labeled)))
+        expected = calculate_issuer_ratios(labeled, actif_net_dict, DEFAULT_PARAMS)
+        del loaded, labeled
+
+    loaded = compact_positions(positions)
+    labeled = add_issuers(loaded, matcher)
+    assert np.shares_memory(loaded['Valo_globale'].to_numpy(), labeled['Valo_globale'].to_numpy()), \
+        "add_issuers a copié les positions"
+    rows.append(('compact', nbytes(loaded), nbytes(labeled), nbytes(labeled)))
+
+    ratios = calculate_issuer_ratios(labeled, actif_net_dict, DEFAULT_PARAMS)
+    pd.testing.assert_frame_equal(ratios, expected)
+    print("Égalité des ratios avec l'ancienne disposition : OK")
+
+    print(f"{n:,} positions, {args.funds} fonds, {args.issuers} émetteurs (octets par position)")
+    print(f"{'disposition':<15} {'chargées':>10} {'étiquetées':>11} {'ensemble':>10} {'total (Mo)':>11}")
+    for label, loaded_bytes, labeled_bytes, together in rows:
+        print(f"{label:<15} {loaded_bytes / n:>10.0f} {labeled_bytes / n:>11.0f} "
+              f"{together / n:>10.0f} {together / 2**20:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark chargement parallèle : read_portfolios avec 1, 2, 4 et 8 processus
+
+Usage : python -m benchmarks.bench_parallel [--files 4] [--sheets 16] [--lines 2000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_loader import write_workbook
+from engine.loader import read_portfolio, read_portfolios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--sheets', type=int, default=16)
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f'depositaire_{i}.xlsx')
+            write_workbook(path, args.sheets, args.lines)
+            files.append(path)
+
+        sequential = [read_portfolio(f) for f in files]
+        expected = pd.concat([df for df, _ in sequential], ignore_index=True)
+
+        print(f"{args.files} classeurs x {args.sheets} onglets x {args.lines} lignes "
+              f"({os.cpu_count()} coeurs)")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            portfolio, _ = read_portfolios(files, workers=workers)
+            elapsed = time.perf_counter() - start
+            pd.testing.assert_frame_equal(portfolio, expected)
+            baseline = baseline or elapsed
+            print(f"  {workers} processus : {elapsed:.2f}s (x{baseline / elapsed:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark lecture projetée : classeur entier via pandas vs colonnes utiles seulement
+
+Écrit un classeur synthétique large (--extra-columns colonnes sans rôle
+après les 9 colonnes de position), le lit avec l'ancien chargeur
+(pandas.read_excel de toutes les cellules, colonnes positionnelles) puis
+avec iter_sheets (en-tête détecté sur les premières lignes, seules les
+colonnes utiles décodées) et vérifie que les positions nettoyées sont
+identiques. Vérifie aussi qu'une variante « autre dépositaire » (lignes
+de titre, intitulés renommés, colonnes réordonnées, onglet de notes)
+donne les mêmes positions et que l'onglet de notes est écarté.
+
+Usage : python -m benchmarks.bench_projection [--funds 10] [--lines 2000] [--extra-columns 30]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+
+from benchmarks.synthetic import write_fond_workbook
+from engine.cleaning import clean_numeric_series
+from engine.loader import NUMERIC_COLUMNS, POSITION_COLUMNS, clean_sheet, iter_sheets
+
+TEXT_COLUMNS = ['Code_ISIN', 'Type', 'Description']
+
+# Intitulés d'un autre dépositaire, dans un autre ordre
+VARIANT_HEADER = {
+    'Valo_globale': 'Valorisation', 'Description': 'Libellé valeur', 'Type': 'Catégorie',
+    'Quantite': 'Qté', 'Valo_j': 'Cours', 'Prix_revient': 'PRU',
+    'Prix_revient_global': 'Coût global', 'Plus_moins_value': 'PMV', 'Code_ISIN': 'Code ISIN',
+}
+
+
+def legacy_positions(path):
+    """Ancien chargeur : toutes les cellules lues, 9 premières colonnes par position"""
+    positions = {}
+    with pd.ExcelFile(path) as xl:
+        for sheet_name in xl.sheet_names:
+            df = xl.parse(sheet_name, header=None)
+            df_data = df.iloc[1:].dropna(how='all')
+            if len(df_data) == 0 or len(df_data.columns) < 9:
+                continue
+            df_data.columns = POSITION_COLUMNS + [f'Col{i}' for i in range(10, len(df_data.columns) + 1)]
+            df_clean = df_data[POSITION_COLUMNS]
+            for col in NUMERIC_COLUMNS:
+                df_clean[col] = clean_numeric_series(df_clean[col])
+            positions[sheet_name] = df_clean[df_clean['Valo_globale'] > 0]
+    return positions
+
+
+def projected_positions(path):
+    positions = {}
+    for sheet_name, df in iter_sheets(path):
+        _, df_clean = clean_sheet(sheet_name, df)
+        if df_clean is not None:
+            positions[sheet_name] = df_clean
+    return positions
+
+
+def write_variant(path, positions, extra_columns):
+    """Mêmes positions avec la mise en page d'un autre dépositaire"""
+    wb = Workbook(write_only=True)
+    roles = list(VARIANT_HEADER)
+    for sheet_name, df in positions.items():
+        ws = wb.create_sheet(sheet_name)
+        ws.append([f'Inventaire du portefeuille {sheet_name}'])
+        ws.append([])
+        ws.append([f'Zone {i + 1}' for i in range(extra_columns // 2)] + [VARIANT_HEADER[r] for r in roles]
+                  + [f'Zone {i + 1}' for i in range(extra_columns // 2, extra_columns)])
+        for row in df[roles].itertuples(index=False):
+            ws.append(['z'] * (extra_columns // 2) + list(row) + ['z'] * (extra_columns - extra_columns // 2))
+    notes = wb.create_sheet('Notes')
+    for i in range(1000):
+        notes.append([f'note {i}', i, 'commentaire'])
+    wb.save(path)
+
+
+def same_positions(expected, actual):
+    assert list(expected) == list(actual), f"onglets différents : {list(expected)} / {list(actual)}"
+    for sheet_name, df in expected.items():
+        pd.testing.assert_frame_equal(
+            df.reset_index(drop=True).astype({col: object for col in TEXT_COLUMNS}),
+            actual[sheet_name].reset_index(drop=True).astype({col: object for col in TEXT_COLUMNS}),
+            check_dtype=False,
+        )
+
+
+def timed(reader, path):
+    start = time.perf_counter()
+    result = reader(path)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=10)
+    parser.add_argument('--lines', type=int, default=2000)
+    parser.add_argument('--extra-columns', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for extra in sorted({0, args.extra_columns}):
+            path = os.path.join(tmp, f'fond_{extra}.xlsx')
+            write_fond_workbook(path, args.funds, args.lines, extra_columns=extra)
+            expected, t_legacy = timed(legacy_positions, path)
+            actual, t_projected = timed(projected_positions, path)
+            same_positions(expected, actual)
+            rows.append((9 + extra, t_legacy, t_projected))
+        print("Égalité des positions avec l'ancien chargeur : OK")
+
+        variant = os.path.join(tmp, 'variante.xlsx')
+        write_variant(variant, expected, args.extra_columns)
+        same_positions(expected, projected_positions(variant))
+        print("Variante dépositaire (titres, intitulés renommés, colonnes réordonnées) : OK, onglet Notes écarté")
+
+    n = args.funds * args.lines
+    print(f"{args.funds} onglets x {args.lines} lignes ({n:,} lignes)")
+    print(f"{'colonnes':>8} {'historique (s)':>15} {'projetée (s)':>13} {'gain':>6}")
+    for width, t_legacy, t_projected in rows:
+        print(f"{width:>8} {t_legacy:>15.2f} {t_projected:>13.2f} {t_legacy / t_projected:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
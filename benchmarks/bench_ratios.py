@@ -0,0 +1,74 @@
+"""
+Benchmark calcul des ratios : boucles par fonds/émetteur (historique) vs moteur vectorisé
+
+L'ancienne implémentation (legacy_issuer_ratios, dans tests/test_ratios.py
+où pytest vérifie l'égalité des deux) sert de référence de temps.
+
+Usage : python -m benchmarks.bench_ratios [--funds 500] [--issuers 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine.ratios import calculate_issuer_ratios
+from tests.test_ratios import legacy_issuer_ratios
+
+PARAMS = {
+    'plafond_etat': 1.0,
+    'plafond_action_eligible': 0.15,
+    'plafond_standard': 0.10,
+    'actions_eligibles_15pct': ['E0000', 'E0001', 'E0002', 'E0003'],
+}
+
+
+def positions(n_funds, n_issuers, lines_per_issuer, seed):
+    """Portefeuille synthétique déjà enrichi des émetteurs"""
+    rng = np.random.default_rng(seed)
+    n = n_funds * n_issuers * lines_per_issuer
+    fonds = np.repeat([f"F{i:04d}" for i in range(n_funds)], n_issuers * lines_per_issuer)
+    emetteur_id = rng.integers(0, n_issuers, n)
+    emetteurs = np.array([f"E{i:04d}" for i in range(n_issuers)] + ['État marocain'], dtype=object)
+    emetteur_id[rng.random(n) < 0.05] = n_issuers
+    df = pd.DataFrame({
+        'Type': rng.choice(np.array(['ACTION', 'OBLIGATION', 'TCN', np.nan], dtype=object), n),
+        'Description': 'X',
+        'Valo_globale': rng.lognormal(14, 2, n),
+        'Fonds': fonds,
+        'Emetteur': emetteurs[emetteur_id],
+        'Type_Emetteur': np.where(emetteur_id == n_issuers, 'public', 'privé'),
+    })
+    nav = df.groupby('Fonds')['Valo_globale'].sum() * rng.uniform(0.8, 3.0, n_funds)
+    actif_net_dict = nav.to_dict()
+    actif_net_dict['F0000'] = 0
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True), actif_net_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=500)
+    parser.add_argument('--issuers', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=2, help="lignes par émetteur et par fonds")
+    parser.add_argument('--legacy-funds', type=int, default=3,
+                        help="fonds traités par l'ancienne méthode (extrapolée)")
+    args = parser.parse_args()
+
+    df, nav = positions(args.funds, args.issuers, args.lines, seed=0)
+    start = time.perf_counter()
+    ratios = calculate_issuer_ratios(df, nav, PARAMS)
+    t_vector = time.perf_counter() - start
+
+    subset = df[df['Fonds'].isin([f"F{i:04d}" for i in range(1, args.legacy_funds + 1)])]
+    start = time.perf_counter()
+    legacy_issuer_ratios(subset, nav, PARAMS)
+    t_legacy = (time.perf_counter() - start) * (args.funds - 1) / args.legacy_funds
+
+    print(f"{args.funds} fonds x {args.issuers} émetteurs ({len(df):,} positions, {len(ratios):,} ratios)")
+    print(f"  vectorisé : {t_vector:.2f}s")
+    print(f"  historique : {t_legacy:.0f}s (extrapolé sur {args.legacy_funds} fonds)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark rapport Excel : pandas.ExcelWriter (historique) vs écriture seule en flux
+
+Mesure durée et pic mémoire (RSS, dans un processus dédié par méthode)
+pour un onglet Ratios de N lignes.
+
+Usage : python -m benchmarks.bench_report [--rows 200000] [--skip-legacy]
+"""
+
+import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from engine.ratios import RATIO_COLUMNS, format_pct
+from engine.report import write_report
+
+
+def ratios_sheet(n, seed=0):
+    """Onglet Ratios synthétique de n lignes"""
+    rng = np.random.default_rng(seed)
+    ratio = rng.uniform(0, 0.2, n)
+    plafond = rng.choice([0.10, 0.15, 1.0], n)
+    return pd.DataFrame({
+        'Fonds': rng.choice([f"F{i:04d}" for i in range(500)], n),
+        'Emetteur': rng.choice([f"E{i:05d}" for i in range(5000)], n),
+        'Type': rng.choice(['privé', 'public'], n),
+        'Montant_MAD': rng.lognormal(14, 2, n),
+        'Actif_Net_MAD': rng.lognormal(18, 1, n),
+        'Ratio': ratio,
+        'Ratio_%': format_pct(ratio, 2),
+        'Plafond': plafond,
+        'Plafond_%': format_pct(plafond, 0),
+        'Conformite': np.where(ratio <= plafond, '✅', '❌'),
+        'Ecart_%': (ratio - plafond) * 100,
+    }, columns=RATIO_COLUMNS)
+
+
+def legacy_write_report(export_dict):
+    """Implémentation d'origine (pandas.ExcelWriter / openpyxl en mémoire)"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for sheet_name, df in export_dict.items():
+            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+    output.seek(0)
+    return output
+
+
+def measure(name, rows):
+    """(durée, surcoût du pic RSS en octets, taille du fichier), mesurés dans le processus courant"""
+    export_dict = {'Ratios': ratios_sheet(rows)}
+    writer = write_report if name == 'flux' else legacy_write_report
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    output = writer(export_dict)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return elapsed, peak * 1024, output.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    sample = {'Ratios': ratios_sheet(2000, seed=1)}
+    pd.testing.assert_frame_equal(pd.read_excel(write_report(sample)),
+                                  pd.read_excel(legacy_write_report(sample)))
+    print("Contenu identique à l'implémentation d'origine : OK")
+
+    print(f"Onglet Ratios de {args.rows:,} lignes")
+    names = ['flux'] if args.skip_legacy else ['flux', 'historique']
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            elapsed, peak, size = pool.submit(measure, name, args.rows).result()
+        print(f"  {name:<10} : {elapsed:.1f}s, pic mémoire +{peak / 2**20:,.0f} Mo, fichier {size / 2**20:,.1f} Mo")
+
+
+if __name__ == '__main__':
+    main()
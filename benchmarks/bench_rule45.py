@@ -0,0 +1,41 @@
+"""
+Benchmark règle des 45% : boucle par fonds (historique) vs passe unique vectorisée
+
+L'ancienne implémentation (legacy_45_percent_rule, dans tests/test_ratios.py
+où pytest vérifie l'égalité des deux) sert de référence de temps.
+
+Usage : python -m benchmarks.bench_rule45 [--funds 2000] [--issuers 200]
+"""
+
+import argparse
+import time
+
+from benchmarks.bench_ratios import PARAMS, positions
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+from tests.test_ratios import legacy_45_percent_rule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=2000)
+    parser.add_argument('--issuers', type=int, default=200)
+    args = parser.parse_args()
+
+    df, nav = positions(args.funds, args.issuers, 1, seed=0)
+    ratios = calculate_issuer_ratios(df, nav, PARAMS)
+
+    start = time.perf_counter()
+    check_45_percent_rule(ratios, df, nav)
+    t_vector = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy_45_percent_rule(ratios, df, nav)
+    t_legacy = time.perf_counter() - start
+
+    print(f"{args.funds:,} fonds ({len(ratios):,} ratios)")
+    print(f"  vectorisé  : {t_vector:.3f}s")
+    print(f"  historique : {t_legacy:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
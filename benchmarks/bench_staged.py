@@ -0,0 +1,77 @@
+"""
+Benchmark recalcul par étapes : contrôle complet vs changement de paramètres seul
+
+Usage : python -m benchmarks.bench_staged [--funds 200] [--lines 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine.issuers import add_issuers, default_issuer_table
+from engine.pipeline import DEFAULT_PARAMS, StagedControl
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+
+
+def book(n_funds, lines, seed=0):
+    """Positions brutes (avant identification des émetteurs) et actifs nets"""
+    rng = np.random.default_rng(seed)
+    n = n_funds * lines
+    keywords = default_issuer_table()['mot_cle'].tolist() + ['DIVERS']
+    descriptions = np.array([f"{k} {i:05d}" for k in keywords for i in range(200)], dtype=object)
+    df = pd.DataFrame({
+        'Type': rng.choice(np.array(['ACTION', 'OBLIGATION', 'TCN'], dtype=object), n),
+        'Description': rng.choice(descriptions, n),
+        'Valo_globale': rng.lognormal(14, 2, n),
+        'Fonds': np.repeat([f"F{i:04d}" for i in range(n_funds)], lines),
+    })
+    nav = (df.groupby('Fonds')['Valo_globale'].sum() * 3).to_dict()
+    return df, nav
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=2000, help="positions par fonds")
+    args = parser.parse_args()
+
+    df, nav = book(args.funds, args.lines)
+    table = default_issuer_table()
+    staged = StagedControl()
+
+    start = time.perf_counter()
+    staged.run('book', df, nav, table, DEFAULT_PARAMS)
+    t_full = time.perf_counter() - start
+    print(f"{len(df):,} positions, {args.funds} fonds")
+    print(f"  contrôle complet        : {t_full:.3f}s  {staged.recomputed}")
+
+    params = {**DEFAULT_PARAMS, 'plafond_standard': 0.08, 'actions_eligibles_15pct': ['ATW', 'IAM']}
+    start = time.perf_counter()
+    labeled, ratios, rule_45 = staged.run('book', df, nav, table, params)
+    t_ceiling = time.perf_counter() - start
+    print(f"  plafonds modifiés       : {t_ceiling * 1000:.1f}ms  {staged.recomputed}")
+
+    params = {**params, 'seuil_45': 0.40}
+    start = time.perf_counter()
+    labeled, ratios, rule_45 = staged.run('book', df, nav, table, params)
+    t_rule = time.perf_counter() - start
+    print(f"  seuil 45% modifié       : {t_rule * 1000:.1f}ms  {staged.recomputed}")
+
+    nav = {fonds: value * 1.01 for fonds, value in nav.items()}
+    start = time.perf_counter()
+    labeled, ratios, rule_45 = staged.run('book', df, nav, table, params)
+    t_nav = time.perf_counter() - start
+    print(f"  actifs nets modifiés    : {t_nav * 1000:.1f}ms  {staged.recomputed}")
+    assert 'emetteurs' not in staged.recomputed
+
+    expected = calculate_issuer_ratios(add_issuers(df, table), nav, params)
+    pd.testing.assert_frame_equal(ratios, expected)
+    pd.testing.assert_frame_equal(rule_45, check_45_percent_rule(
+        expected, labeled, nav, params['seuil_45'], seuil_emetteur=params['seuil_emetteur_45']))
+    print("Égalité avec le contrôle complet : OK")
+
+
+if __name__ == '__main__':
+    main()
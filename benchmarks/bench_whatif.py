@@ -0,0 +1,96 @@
+"""
+Benchmark simulation pré-trade : état incrémental vs recalcul complet par ordre
+
+Vérifie sur un échantillon d'ordres que ExposureState donne les mêmes
+ratios et la même règle 45% qu'un recalcul complet du portefeuille
+modifié, puis mesure l'évaluation d'un lot d'ordres.
+
+Usage : python -m benchmarks.bench_whatif [--funds 300] [--issuers 200] [--orders 5000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_ratios import PARAMS, positions
+from engine.ratios import ETAT_MAROCAIN, calculate_issuer_ratios, check_45_percent_rule
+from engine.whatif import ExposureState
+
+
+def random_orders(ratios_df, n, seed=0):
+    """Ordres sur des couples existants ou nouveaux, achats et ventes"""
+    rng = np.random.default_rng(seed)
+    funds = ratios_df['Fonds'].unique()
+    issuers = np.append(ratios_df['Emetteur'].unique(), ['NOUVEAU'])
+    return pd.DataFrame({
+        'Fonds': rng.choice(funds, n),
+        'Emetteur': rng.choice(issuers, n),
+        'Montant_MAD': rng.lognormal(15, 2, n) * rng.choice([1, -0.2], n),
+        'Est_Action': rng.random(n) < 0.5,
+    })
+
+
+def full_recompute(df, nav, order):
+    """Ratio du couple et ratio 45% du fonds après ajout de l'ordre au portefeuille"""
+    line = pd.DataFrame({
+        'Type': ['ACTION' if order['Est_Action'] else 'OBLIGATION'],
+        'Description': ['X'],
+        'Valo_globale': [order['Montant_MAD']],
+        'Fonds': [order['Fonds']],
+        'Emetteur': [order['Emetteur']],
+        'Type_Emetteur': ['public' if order['Emetteur'] == ETAT_MAROCAIN else 'privé'],
+    })
+    ratios = calculate_issuer_ratios(pd.concat([df, line], ignore_index=True), nav, PARAMS)
+    rule = check_45_percent_rule(ratios, None, nav)
+    row = ratios[(ratios['Fonds'] == order['Fonds']) & (ratios['Emetteur'] == order['Emetteur'])].iloc[0]
+    return row['Ratio'], row['Plafond'], rule.set_index('Fonds').loc[order['Fonds'], 'Ratio_45%']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=300)
+    parser.add_argument('--issuers', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=5000)
+    args = parser.parse_args()
+
+    df, nav = positions(40, 30, 2, seed=3)
+    ratios = calculate_issuer_ratios(df, nav, PARAMS)
+    state = ExposureState(ratios, nav, PARAMS)
+    sample = random_orders(ratios, 50, seed=1)
+    checked = state.check_batch(sample)
+    for i, order in sample.iterrows():
+        ratio, plafond, ratio_45 = full_recompute(df, nav, order)
+        assert np.isclose(checked.loc[i, 'Ratio_apres'], ratio)
+        assert checked.loc[i, 'Plafond'] == plafond
+        assert np.isclose(checked.loc[i, 'Ratio_45_apres'], ratio_45)
+        single = state.check(order['Fonds'], order['Emetteur'], order['Montant_MAD'], order['Est_Action'])
+        assert np.isclose(single['Ratio_45_apres'], ratio_45)
+    print("Égalité avec le recalcul complet : OK")
+
+    df, nav = positions(args.funds, args.issuers, 2, seed=0)
+    ratios = calculate_issuer_ratios(df, nav, PARAMS)
+    orders = random_orders(ratios, args.orders)
+
+    start = time.perf_counter()
+    state = ExposureState(ratios, nav, PARAMS)
+    t_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state.check_batch(orders)
+    t_batch = time.perf_counter() - start
+
+    order = orders.iloc[0]
+    start = time.perf_counter()
+    full_recompute(df, nav, order)
+    t_full = time.perf_counter() - start
+
+    print(f"{len(ratios):,} couples (fonds, émetteur), {args.orders:,} ordres")
+    print(f"  construction de l'état     : {t_build * 1000:.0f}ms")
+    print(f"  lot d'ordres               : {t_batch * 1000:.0f}ms ({t_batch / args.orders * 1e6:.1f}µs par ordre)")
+    print(f"  recalcul complet, 1 ordre  : {t_full * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Suite de benchmarks de référence : chargement, émetteurs, ratios, règle 45% et export
+
+Chaque cas tourne sur un classeur synthétique (benchmarks.synthetic) de
+taille fixe par échelle ; la médiane de --repeat exécutions est comparée
+à la référence enregistrée dans benchmarks/baselines.json. Un cas plus
+lent que sa référence au-delà de --tolerance, ou dont le résultat
+(lignes, dépassements) diffère, est signalé et le code de sortie vaut 1.
+--save enregistre les mesures courantes comme nouvelle référence, avec la
+machine et la version du code (commit git) mesurées.
+
+Usage : python -m benchmarks.suite [--scale petit|moyen|grand] [--repeat 5]
+        [--tolerance 1.5] [--only chargement ratios] [--save]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_fond_workbook
+from engine.issuers import IssuerMatcher, add_issuers
+from engine.loader import apply_nav, clean_sheet, iter_sheets, read_portfolio
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+from engine.report import build_report_sheets, compute_kpis, write_report
+
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+SCALES = {
+    'petit': {'funds': 10, 'lines': 200, 'issuers': 50},
+    'moyen': {'funds': 50, 'lines': 1000, 'issuers': 500},
+    'grand': {'funds': 200, 'lines': 2500, 'issuers': 5000},
+}
+
+CONTROL_DATE = date(2026, 9, 30)
+
+
+class Context:
+    """Classeur synthétique et résultats intermédiaires partagés par les cas"""
+
+    def __init__(self, path, funds, lines, issuers):
+        self.path = path
+        self.issuer_table, self.nav = write_fond_workbook(path, funds, lines, issuers, seed=0)
+        self.raw = list(iter_sheets(path))
+        portfolio, _ = read_portfolio(path)
+        self.portfolio, self.actif_net_dict = apply_nav(portfolio, self.nav)
+        self.matcher = IssuerMatcher(self.issuer_table)
+        self.labeled = add_issuers(self.portfolio, self.matcher)
+        self.ratios = calculate_issuer_ratios(self.labeled, self.actif_net_dict, DEFAULT_PARAMS)
+        self.rule_45 = check_45_percent_rule(self.ratios, self.labeled, self.actif_net_dict)
+
+# =============================================================================
+# CAS
+# =============================================================================
+# Chaque cas renvoie un résumé de son résultat : une dérive signale un
+# changement de comportement, pas seulement de performance.
+
+def case_chargement(ctx):
+    portfolio, _ = read_portfolio(ctx.path)
+    return {'lignes': len(portfolio), 'valo': round(float(portfolio['Valo_globale'].sum()), 2)}
+
+
+def case_nettoyage(ctx):
+    cleaned = [clean_sheet(name, df) for name, df in ctx.raw]
+    return {'lignes': sum(len(df) for _, df in cleaned if df is not None)}
+
+
+def case_emetteurs(ctx):
+    labeled = add_issuers(ctx.portfolio, IssuerMatcher(ctx.issuer_table))
+    return {'lignes': len(labeled), 'autres': int((labeled['Emetteur'] == 'Autre').sum())}
+
+
+def case_ratios(ctx):
+    ratios = calculate_issuer_ratios(ctx.labeled, ctx.actif_net_dict, DEFAULT_PARAMS)
+    return {'lignes': len(ratios), 'depassements': int((ratios['Conformite'] == '❌').sum())}
+
+
+def case_regle_45(ctx):
+    rule = check_45_percent_rule(ctx.ratios, ctx.labeled, ctx.actif_net_dict)
+    return {'lignes': len(rule), 'depassements': int((rule['Conformite'] == '❌').sum())}
+
+
+def case_export(ctx):
+    sheets = build_report_sheets(ctx.ratios, ctx.rule_45, ctx.actif_net_dict, CONTROL_DATE,
+                                 compute_kpis(ctx.ratios))
+    write_report(sheets, BytesIO())
+    return {'onglets': len(sheets), 'lignes': sum(len(df) for df in sheets.values())}
+
+
+CASES = {
+    'chargement': case_chargement,
+    'nettoyage': case_nettoyage,
+    'emetteurs': case_emetteurs,
+    'ratios': case_ratios,
+    'regle_45': case_regle_45,
+    'export': case_export,
+}
+
+# =============================================================================
+# EXÉCUTION ET COMPARAISON
+# =============================================================================
+
+def run_case(case, ctx, repeat):
+    """(médiane des durées en secondes, résumé du résultat)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outcome = case(ctx)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), outcome
+
+
+def machine():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'processeur': platform.processor() or platform.machine(),
+        'coeurs': os.cpu_count(),
+    }
+
+
+def code_version():
+    """Commit git courant (suffixe '+modifié' si l'arbre de travail diffère), None hors dépôt"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '--', 'engine'],
+                               cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{head}+modifié" if dirty else head
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+    with open(BASELINES, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baselines(baselines):
+    with open(BASELINES, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=list(SCALES), default='petit')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="rapport durée / référence au-delà duquel un cas est en régression")
+    parser.add_argument('--only', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--save', action='store_true', help="enregistrer les mesures comme référence")
+    args = parser.parse_args()
+
+    size = SCALES[args.scale]
+    baselines = load_baselines()
+    reference = baselines.get(args.scale, {})
+    if reference:
+        print(f"Référence du {reference.get('date')}, code {reference.get('version') or 'inconnu'} "
+              f"(code courant : {code_version() or 'inconnu'})")
+        if reference.get('machine') != machine():
+            print(f"Attention : référence mesurée sur une autre machine ({reference.get('machine')})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ctx = Context(os.path.join(tmp, 'FOND.xlsx'), **size)
+        print(f"Échelle {args.scale} : {size['funds']} fonds x {size['lines']} lignes, "
+              f"{size['issuers']} émetteurs ({len(ctx.portfolio):,} positions, "
+              f"{len(ctx.ratios):,} ratios) préparée en {time.perf_counter() - start:.1f}s")
+
+        print(f"{'cas':<12} {'médiane':>10} {'référence':>10} {'rapport':>8}  statut")
+        measures, status = {}, 0
+        for name in args.only:
+            seconds, outcome = run_case(CASES[name], ctx, args.repeat)
+            measures[name] = {'secondes': round(seconds, 6), 'resultat': outcome}
+            base = reference.get('cas', {}).get(name)
+            if base is None:
+                label, ratio = 'nouveau', None
+            elif base['resultat'] != outcome:
+                label, ratio, status = f"RÉSULTAT DIFFÉRENT {base['resultat']}", None, 1
+            else:
+                ratio = seconds / base['secondes']
+                if ratio > args.tolerance:
+                    label, status = 'RÉGRESSION', 1
+                else:
+                    label = 'ok'
+            base_ms = '' if base is None else f"{base['secondes'] * 1000:.1f}ms"
+            ratio_txt = '' if ratio is None else f"x{ratio:.2f}"
+            print(f"{name:<12} {seconds * 1000:>8.1f}ms {base_ms:>10} {ratio_txt:>8}  {label}")
+
+    if args.save:
+        cas = {**reference.get('cas', {}), **measures}
+        baselines[args.scale] = {
+            'machine': machine(),
+            'version': code_version(),
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'repetitions': args.repeat,
+            'cas': cas,
+        }
+        save_baselines(baselines)
+        print(f"Référence {args.scale} enregistrée dans {BASELINES}")
+        return 0
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
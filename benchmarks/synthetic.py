@@ -0,0 +1,246 @@
+"""
+Générateur de classeurs FOND.xlsx synthétiques au format attendu par le chargeur
+
+Un onglet par fonds (les cinq onglets historiques, puis FONDS0005...),
+une ligne d'en-tête et au moins 9 colonnes positionnelles : ISIN, Type,
+Description, Quantité, Prix revient, Valo J, Prix revient global,
+Valo globale, +/- value (puis --extra-columns colonnes sans rôle, comme
+dans les extractions dépositaires larges). Les montants mélangent
+nombres et textes formatés (espaces, NBSP, '-') ; les descriptions
+reprennent les mots-clés d'une table émetteurs de --issuers émetteurs
+(table par défaut complétée d'émetteurs EM00000...). Tout est
+déterministe pour une graine donnée. Chaque titre (description) a son
+ISIN ; un référentiel ISIN couvrant --isin-coverage des titres est écrit
+à côté du classeur.
+
+Usage : python -m benchmarks.synthetic DOSSIER [--funds 50] [--lines 500] [--issuers 200]
+        [--extra-columns 0] [--isin-coverage 0.9] [--seed 0] [--date 2026-09-30]
+"""
+
+import argparse
+import os
+import zlib
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from engine.issuers import AUTRE, IssuerMatcher, default_issuer_table
+from engine.loader import FONDS_MAPPING, NUMERIC_COLUMNS, read_portfolio
+
+
+HEADER = ['Code ISIN', 'Type', 'Description', 'Quantité', 'Prix de revient',
+          'Valo J', 'Prix de revient global', 'Valo globale', '+/- value']
+
+TYPES = np.array(['ACTION', 'OBLIGATION', 'TCN', 'OPCVM'])
+TYPE_WEIGHTS = [0.45, 0.35, 0.12, 0.08]
+
+# Part des lignes en bons du Trésor (État marocain) et sans émetteur reconnu
+SHARE_ETAT = 0.10
+SHARE_AUTRE = 0.03
+
+
+def fund_sheets(n_funds):
+    """Noms d'onglets : les cinq onglets historiques puis FONDS0005, FONDS0006..."""
+    names = list(FONDS_MAPPING)[:n_funds]
+    return names + [f'FONDS{i:04d}' for i in range(len(names), n_funds)]
+
+
+def issuer_table(n_issuers):
+    """Table émetteurs (mot_cle, emetteur, type) de n_issuers émetteurs privés
+
+    Les premiers sont ceux de la table par défaut (tous leurs mots-clés),
+    les suivants EM00000, EM00001... avec deux mots-clés chacun (action et
+    obligation). L'État marocain (BDT) est toujours présent.
+    """
+    default = default_issuer_table()
+    private = default.loc[default['type'] == 'privé', 'emetteur'].drop_duplicates().tolist()
+    kept = set(private[:n_issuers])
+    table = default[default['emetteur'].isin(kept) | (default['type'] == 'public')]
+
+    extra = [f'EM{i:05d}' for i in range(max(0, n_issuers - len(private)))]
+    generated = pd.DataFrame({
+        'mot_cle': [k for e in extra for k in (e, f'OBL{e}')],
+        'emetteur': [e for e in extra for _ in range(2)],
+        'type': 'privé',
+    })
+    return pd.concat([table, generated], ignore_index=True)
+
+
+def _amount_cells(values, rng):
+    """Montants tels que les dépositaires les exportent : nombres ou textes formatés"""
+    kind = rng.random(len(values))
+    cells = values.astype(object)
+    text = kind >= 0.4
+    for i in np.flatnonzero(text):
+        formatted = f'{values[i]:,.2f}'
+        cells[i] = formatted.replace(',', '\xa0' if kind[i] >= 0.7 else ' ')
+    cells[(kind >= 0.97) & (values == 0)] = '-'
+    return cells
+
+
+def _descriptions(keywords, types, rng):
+    """Libellés de positions construits autour du mot-clé de l'émetteur"""
+    maturities = rng.integers(2026, 2040, len(keywords))
+    rates = rng.integers(150, 650, len(keywords)) / 100
+    descriptions = []
+    for keyword, kind, year, rate in zip(keywords, types, maturities, rates):
+        if kind == 'ACTION':
+            descriptions.append(f'ACTIONS {keyword}')
+        elif kind == 'OPCVM':
+            descriptions.append(f'PARTS OPCVM {keyword}')
+        else:
+            descriptions.append(f'{keyword} {rate:.2f}% {year}')
+    return descriptions
+
+
+def isin_code(description):
+    """ISIN synthétique stable d'un titre : 'MA' + 10 chiffres dérivés de sa description"""
+    return f'MA{zlib.crc32(description.encode()):010d}'
+
+
+def _keywords(table):
+    """Mots-clés des émetteurs privés et leur fréquence (loi de Zipf)"""
+    keywords = table.loc[table['type'] == 'privé', 'mot_cle'].to_numpy()
+    weights = 1.0 / np.arange(1, len(keywords) + 1)
+    return keywords, weights / weights.sum()
+
+
+def _fund_lines(rng, keywords, weights, n_lines):
+    """Colonnes d'un fonds : ISIN, types, descriptions et montants numériques"""
+    types = TYPES[rng.choice(len(TYPES), n_lines, p=TYPE_WEIGHTS)]
+    kind = rng.random(n_lines)
+    chosen = keywords[rng.choice(len(keywords), n_lines, p=weights)].astype(object)
+    chosen[kind < SHARE_ETAT] = 'BDT'
+    chosen[(kind >= SHARE_ETAT) & (kind < SHARE_ETAT + SHARE_AUTRE)] = 'DIVERS'
+    types[chosen == 'BDT'] = 'OBLIGATION'
+    descriptions = _descriptions(chosen, types, rng)
+
+    quantity = rng.integers(1, 50_000, n_lines).astype(float)
+    cost = np.round(rng.lognormal(5, 1.2, n_lines), 2)
+    price = np.round(cost * rng.normal(1.02, 0.08, n_lines), 2)
+    cost_total = np.round(quantity * cost, 2)
+    valo = np.round(quantity * price, 2)
+    valo[rng.random(n_lines) < 0.01] = 0.0
+    return {
+        'Code_ISIN': [isin_code(d) for d in descriptions],
+        'Type': types,
+        'Description': descriptions,
+        'Quantite': quantity,
+        'Prix_revient': cost,
+        'Valo_j': price,
+        'Prix_revient_global': cost_total,
+        'Valo_globale': valo,
+        'Plus_moins_value': np.round(valo - cost_total, 2),
+    }
+
+
+def positions_frame(n_funds=50, n_lines=500, n_issuers=200, seed=0):
+    """Positions nettoyées, sans passer par un classeur : (positions, table émetteurs, actif_net_dict)
+
+    Colonnes et types de l'ancien chargeur (texte non compacté, sans
+    Actif_Net) : point de départ des mesures mémoire à grande échelle.
+    """
+    rng = np.random.default_rng(seed)
+    table = issuer_table(n_issuers)
+    keywords, weights = _keywords(table)
+    frames, actif_net_dict = [], {}
+    for sheet in fund_sheets(n_funds):
+        fonds = FONDS_MAPPING.get(sheet, sheet)
+        lines = pd.DataFrame(_fund_lines(rng, keywords, weights, n_lines))
+        lines = lines[lines['Valo_globale'] > 0].assign(Fonds=fonds)
+        frames.append(lines)
+        actif_net_dict[fonds] = round(float(lines['Valo_globale'].sum()) * rng.uniform(1.05, 1.25), 2)
+    return pd.concat(frames, ignore_index=True), table, actif_net_dict
+
+
+def write_fond_workbook(path, n_funds=50, n_lines=500, n_issuers=200, extra_columns=0, seed=0):
+    """Écrit un classeur FOND.xlsx synthétique ; renvoie (table émetteurs, actif_net_dict)
+
+    actif_net_dict est indexé par nom de fonds tel que le chargeur le
+    produit (onglets historiques renommés via FONDS_MAPPING). L'actif net
+    d'un fonds vaut la somme de ses valorisations majorée de 5 à 25%
+    (liquidités) : la popularité des émetteurs suit une loi de Zipf, si
+    bien que certains couples dépassent leur plafond.
+    """
+    rng = np.random.default_rng(seed)
+    table = issuer_table(n_issuers)
+    keywords, weights = _keywords(table)
+
+    wb = Workbook(write_only=True)
+    actif_net_dict = {}
+    header = HEADER + [f'Divers {i + 1}' for i in range(extra_columns)]
+    for sheet in fund_sheets(n_funds):
+        ws = wb.create_sheet(sheet)
+        ws.append(header)
+
+        lines = _fund_lines(rng, keywords, weights, n_lines)
+        valo = lines['Valo_globale']
+        columns = [lines['Code_ISIN'], lines['Type'], lines['Description']]
+        columns += [_amount_cells(lines[col], rng) for col in NUMERIC_COLUMNS]
+        columns += [[f'x{i}'] * n_lines for i in range(extra_columns)]
+        for row in zip(*columns):
+            ws.append(row)
+
+        fonds = FONDS_MAPPING.get(sheet, sheet)
+        actif_net_dict[fonds] = round(float(valo[valo > 0].sum()) * rng.uniform(1.05, 1.25), 2)
+    wb.save(path)
+    return table, actif_net_dict
+
+
+def isin_referential(positions, table, coverage=0.9, seed=0):
+    """Référentiel ISIN (isin, emetteur, type) d'une part `coverage` des titres des positions
+
+    L'émetteur d'un titre est celui que les mots-clés lui attribuent ; les
+    titres sans émetteur reconnu ('Autre') n'y figurent pas.
+    """
+    titles = positions[['Code_ISIN', 'Description']].astype(object).drop_duplicates('Code_ISIN')
+    emetteurs, types = IssuerMatcher(table).label(titles['Description'])
+    referential = pd.DataFrame({'isin': titles['Code_ISIN'].to_numpy(), 'emetteur': emetteurs, 'type': types})
+    referential = referential[referential['emetteur'] != AUTRE[0]]
+    keep = np.random.default_rng(seed).random(len(referential)) < coverage
+    return referential[keep].reset_index(drop=True)
+
+
+def write_nav_csv(path, actif_net_dict, control_date):
+    """Fichier Fonds, Date, Actif net importable dans la base des actifs nets"""
+    pd.DataFrame({
+        'Fonds': list(actif_net_dict),
+        'Date': control_date.strftime('%d/%m/%Y'),
+        'Actif net': list(actif_net_dict.values()),
+    }).to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output', help="dossier où écrire FOND.xlsx, actifs_nets.csv et emetteurs.csv")
+    parser.add_argument('--funds', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=500)
+    parser.add_argument('--issuers', type=int, default=200)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--isin-coverage', type=float, default=0.9)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(), default=date.today())
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    table, actif_net_dict = write_fond_workbook(
+        os.path.join(args.output, 'FOND.xlsx'), args.funds, args.lines, args.issuers,
+        extra_columns=args.extra_columns, seed=args.seed,
+    )
+    write_nav_csv(os.path.join(args.output, 'actifs_nets.csv'), actif_net_dict, args.date)
+    table.to_csv(os.path.join(args.output, 'emetteurs.csv'), index=False)
+    positions, _ = read_portfolio(os.path.join(args.output, 'FOND.xlsx'))
+    isin_referential(positions, table, args.isin_coverage, args.seed).to_csv(
+        os.path.join(args.output, 'isins.csv'), index=False)
+    print(f"{args.funds} fonds x {args.lines} lignes, {args.issuers} émetteurs -> {args.output}")
+    print(f"  python -m engine {os.path.join(args.output, 'FOND.xlsx')} "
+          f"--issuers {os.path.join(args.output, 'emetteurs.csv')} "
+          f"--isin {os.path.join(args.output, 'isins.csv')} "
+          f"--nav-db nav.sqlite --nav-import {os.path.join(args.output, 'actifs_nets.csv')} "
+          f"--date {args.date:%Y-%m-%d}")
+
+
+if __name__ == '__main__':
+    main()
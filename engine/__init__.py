@@ -0,0 +1,91 @@
+"""
+Moteur de contrôle des ratios émetteurs OPCVM (sans dépendance Streamlit)
+CDVM Circulaire n°01-09 - Article 6
+"""
+
+from engine.cache import IssuerCache, PortfolioCache, file_hash, issuer_table_hash
+from engine.cleaning import clean_number, clean_numeric_series
+from engine.delta import DeltaControl, fund_fingerprints, sheet_fingerprints
+from engine.exposure import ExposureMatrix
+from engine.grid import RatioGrid
+from engine.history import HistoryStore
+from engine.issuers import (
+    IsinIndex,
+    IssuerGroups,
+    IssuerMatcher,
+    add_issuers,
+    default_issuer_table,
+    identify_issuer,
+    issuer_sources,
+    read_isin_referential,
+    read_issuer_groups,
+)
+from engine.loader import (
+    available_engine,
+    apply_nav,
+    detect_layout,
+    iter_sheets,
+    open_workbook,
+    read_portfolio,
+    read_portfolios,
+)
+from engine.nav import NavStore
+from engine.perf import Profiler
+from engine.pipeline import DEFAULT_PARAMS, StagedControl, run_control
+from engine.ratios import (
+    aggregate_exposures,
+    apply_ceilings,
+    assign_groups,
+    calculate_group_ratios,
+    calculate_issuer_ratios,
+    check_45_percent_rule,
+)
+from engine.report import build_report_sheets, compute_kpis, summarize_breaches, write_report
+from engine.whatif import ExposureState
+
+__all__ = [
+    'DEFAULT_PARAMS',
+    'DeltaControl',
+    'ExposureMatrix',
+    'ExposureState',
+    'HistoryStore',
+    'IsinIndex',
+    'IssuerCache',
+    'IssuerGroups',
+    'IssuerMatcher',
+    'NavStore',
+    'PortfolioCache',
+    'Profiler',
+    'RatioGrid',
+    'StagedControl',
+    'add_issuers',
+    'aggregate_exposures',
+    'apply_ceilings',
+    'apply_nav',
+    'assign_groups',
+    'available_engine',
+    'build_report_sheets',
+    'calculate_group_ratios',
+    'calculate_issuer_ratios',
+    'check_45_percent_rule',
+    'clean_number',
+    'clean_numeric_series',
+    'compute_kpis',
+    'default_issuer_table',
+    'detect_layout',
+    'file_hash',
+    'fund_fingerprints',
+    'identify_issuer',
+    'issuer_sources',
+    'issuer_table_hash',
+    'iter_sheets',
+    'open_workbook',
+    'read_isin_referential',
+    'read_issuer_groups',
+    'read_portfolio',
+    'read_portfolios',
+    'run_control',
+    'sheet_fingerprints',
+    'summarize_breaches',
+    'write_report',
+]
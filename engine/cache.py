@@ -0,0 +1,279 @@
+"""
+Caches du moteur : résultats réutilisés d'une exécution à l'autre
+"""
+
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine.issuers import INCONNU, IssuerMatcher, expand_labels, factorize_descriptions
+from engine.perf import timed
+
+
+# =============================================================================
+# CACHE DES ÉMETTEURS
+# =============================================================================
+
+def issuer_table_hash(issuer_table):
+    """Empreinte du contenu de la table émetteurs (ordre des lignes compris)"""
+    table = issuer_table[['mot_cle', 'emetteur', 'type']].astype(str)
+    hashed = pd.util.hash_pandas_object(table, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+class IssuerCache:
+    """Cache LRU description normalisée -> (émetteur, type)
+
+    Le cache est lié à l'empreinte de la table émetteurs : si la table change,
+    les entrées sont abandonnées et l'automate recompilé. Avec un répertoire
+    `path`, les entrées sont aussi conservées sur disque (un fichier par
+    empreinte), de sorte qu'un contrôle relancé sur un book inchangé ne
+    recompile ni ne parcourt aucune description. Le fichier est un journal
+    JSON Lines : chaque identification n'y ajoute que ses nouvelles entrées,
+    et il n'est réécrit en entier (compactage) que lorsqu'il dépasse le
+    double des entrées vivantes.
+    """
+
+    def __init__(self, max_entries=200_000, path=None, max_files=8):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_files = max_files
+        self.table_hash = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._matcher = None
+        self._logged = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Compteurs du cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _file(self, table_hash):
+        return os.path.join(self.path, f"issuers_{table_hash[:16]}.jsonl")
+
+    def _bind(self, issuer_table):
+        table_hash = issuer_table_hash(issuer_table)
+        if table_hash == self.table_hash:
+            return
+        self.table_hash = table_hash
+        self._matcher = None
+        self._entries = OrderedDict()
+        self._logged = 0
+        if self.path and os.path.exists(self._file(table_hash)):
+            with open(self._file(table_hash), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        key, value = json.loads(line)
+                    except ValueError:
+                        continue  # dernière ligne tronquée (écriture interrompue)
+                    self._entries[key] = tuple(value)
+                    self._entries.move_to_end(key)
+                    self._logged += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _append(self, items):
+        """Ajoute des entrées au journal ; compacte s'il dépasse le double des entrées vivantes"""
+        if not self.path or self.table_hash is None or not items:
+            return
+        if self._logged + len(items) > 2 * max(len(self._entries), 1000):
+            self.save()
+            return
+        os.makedirs(self.path, exist_ok=True)
+        target = self._file(self.table_hash)
+        created = not os.path.exists(target)
+        with open(target, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps([key, value], ensure_ascii=False) + '\n' for key, value in items)
+        self._logged += len(items)
+        if created:
+            self._prune()
+
+    def save(self):
+        """Réécrit le journal avec les seules entrées vivantes (écriture atomique)"""
+        if not self.path or self.table_hash is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        target = self._file(self.table_hash)
+        tmp = f"{target}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps([key, value], ensure_ascii=False) + '\n'
+                         for key, value in self._entries.items())
+        os.replace(tmp, target)
+        self._logged = len(self._entries)
+        self._prune()
+
+    def _prune(self):
+        """Ne garde que les max_files journaux les plus récents"""
+        files = sorted(glob.glob(os.path.join(self.path, 'issuers_*.jsonl')), key=os.path.getmtime)
+        for old in files[:-self.max_files]:
+            os.remove(old)
+
+    @timed('identification_emetteurs', rows=lambda labels: len(labels[0]))
+    def label(self, descriptions, issuer_table, categorical=False):
+        """Même résultat que IssuerMatcher(issuer_table).label(descriptions, categorical)"""
+        with self._lock:
+            self._bind(issuer_table)
+            codes, uniques = factorize_descriptions(descriptions)
+
+            emetteurs = np.empty(len(uniques) + 1, dtype=object)
+            types = np.empty(len(uniques) + 1, dtype=object)
+            emetteurs[-1], types[-1] = INCONNU
+
+            added = []
+            for i, description in enumerate(uniques):
+                key = str(description).upper()
+                found = self._entries.get(key)
+                if found is None:
+                    self.misses += 1
+                    if self._matcher is None:
+                        self._matcher = IssuerMatcher(issuer_table)
+                    found = tuple(self._matcher.match(key))
+                    self._entries[key] = found
+                    if len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                    added.append((key, found))
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                emetteurs[i], types[i] = found
+
+            self._append(added)
+
+        return expand_labels(codes, emetteurs, types, categorical)
+
+# =============================================================================
+# CACHE DES PORTEFEUILLES (PARQUET)
+# =============================================================================
+
+# À incrémenter quand le nettoyage des positions change : invalide le cache disque
+PORTFOLIO_CACHE_VERSION = 3
+
+
+def file_hash(file):
+    """Empreinte SHA-256 du contenu d'un classeur (chemin, bytes ou fichier uploadé)"""
+    digest = hashlib.sha256(f"v{PORTFOLIO_CACHE_VERSION}:".encode())
+    if isinstance(file, bytes):
+        digest.update(file)
+    elif isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    elif hasattr(file, 'getvalue'):
+        digest.update(file.getvalue())
+    else:
+        file.seek(0)
+        digest.update(file.read())
+        file.seek(0)
+    return digest.hexdigest()
+
+
+class PortfolioCache:
+    """Positions nettoyées et actifs nets stockés en Parquet, par empreinte du classeur
+
+    Un classeur déjà chargé est relu depuis le Parquet (mappé en mémoire)
+    au lieu d'être re-parsé. Les entrées les moins récemment utilisées sont
+    supprimées au-delà de max_bytes. Sans pyarrow, le cache est inactif et
+    load() se contente d'appeler le chargeur.
+    """
+
+    def __init__(self, path, max_bytes=2 * 1024 ** 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = importlib.util.find_spec('pyarrow') is not None
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Compteurs du cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'enabled': self.enabled,
+        }
+
+    def _files(self, key):
+        base = os.path.join(self.path, key[:32])
+        return f"{base}.parquet", f"{base}.json"
+
+    def get(self, key):
+        """(positions, actif_net_dict) en cache, ou None"""
+        data_file, meta_file = self._files(key)
+        if not self.enabled or not os.path.exists(meta_file):
+            return None
+        with open(meta_file, encoding='utf-8') as f:
+            actif_net_dict = json.load(f)
+        portfolio = None
+        if actif_net_dict is not None:
+            if not os.path.exists(data_file):
+                return None
+            portfolio = pd.read_parquet(data_file, memory_map=True)
+            os.utime(data_file)
+        os.utime(meta_file)
+        return portfolio, actif_net_dict
+
+    def put(self, key, portfolio, actif_net_dict):
+        """Enregistre un résultat de chargement ; ignoré si non sérialisable"""
+        if not self.enabled:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        data_file, meta_file = self._files(key)
+        if portfolio is not None:
+            try:
+                portfolio.to_parquet(f"{data_file}.tmp", index=False)
+            except (TypeError, ValueError, ImportError):
+                # colonnes de types mélangés : pas de cache pour ce classeur
+                if os.path.exists(f"{data_file}.tmp"):
+                    os.remove(f"{data_file}.tmp")
+                return
+            os.replace(f"{data_file}.tmp", data_file)
+        with open(f"{meta_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(actif_net_dict, f, ensure_ascii=False)
+        os.replace(f"{meta_file}.tmp", meta_file)
+        self._evict()
+
+    def _evict(self):
+        files = [os.path.join(self.path, name) for name in os.listdir(self.path)
+                 if name.endswith(('.parquet', '.json'))]
+        files.sort(key=os.path.getmtime, reverse=True)
+        total = 0
+        for name in files:
+            total += os.path.getsize(name)
+            if total > self.max_bytes:
+                os.remove(name)
+
+    def load(self, file, loader, **kwargs):
+        """loader(file, **kwargs) avec mise en cache du résultat"""
+        if not self.enabled:
+            return loader(file, **kwargs)
+        key = file_hash(file)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        portfolio, actif_net_dict = loader(file, **kwargs)
+        self.put(key, portfolio, actif_net_dict)
+        return portfolio, actif_net_dict
@@ -0,0 +1,138 @@
+"""
+Nettoyage des montants issus des extractions dépositaires
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+
+# =============================================================================
+# FONCTION DE NETTOYAGE ULTRA ROBUSTE
+# =============================================================================
+
+def clean_number(value):
+    """Convertit ANY valeur en nombre flottant de façon sécurisée"""
+    if value is None:
+        return 0.0
+    if pd.isna(value):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        value = value.replace(' ', '')
+        value = value.replace(',', '')
+        value = value.replace(' ', '')
+        value = value.replace('\xa0', '')
+        value = value.replace('\t', '')
+        value = value.replace('\n', '')
+        if value == '' or value == '-' or value == 'nan':
+            return 0.0
+        try:
+            return float(value)
+        except ValueError:
+            value = re.sub(r'[^\d.-]', '', value)
+            try:
+                return float(value) if value else 0.0
+            except:
+                return 0.0
+    return 0.0
+
+
+# =============================================================================
+# NETTOYAGE VECTORISÉ PAR COLONNE
+# =============================================================================
+
+_SEP = '\x00'
+_SEP_BYTES = _SEP.encode()
+_CHUNK = 8192
+_NUMBER_TYPES = {float, int, bool, type(None)}
+
+
+def _to_float(token):
+    try:
+        return float(token)
+    except ValueError:
+        return np.nan
+
+
+def _parse_tokens(tokens):
+    """float() sur chaque jeton, NaN pour ceux qui ne passent pas"""
+    result = np.empty(len(tokens))
+    for start in range(0, len(tokens), _CHUNK):
+        chunk = tokens[start:start + _CHUNK]
+        try:
+            result[start:start + len(chunk)] = np.array(chunk, dtype=float)
+        except ValueError:
+            result[start:start + len(chunk)] = [_to_float(t) for t in chunk]
+    return result
+
+
+def _clean_strings(values):
+    """Nettoie un tableau object de chaînes et le convertit en float64
+
+    Toute la colonne est jointe en un seul buffer UTF-8 : les séparateurs
+    (espace, virgule, NBSP, tabulation, saut de ligne) y sont supprimés en
+    une passe, les jetons vides ou '-' remplacés par 0, puis le buffer est
+    redécoupé et converti par float(). Les cellules que float() refuse ou
+    qui donnent NaN repassent par clean_number : le résultat est identique.
+    """
+    joined = _SEP.join(values)
+    try:
+        if joined.count(_SEP) != len(values) - 1:
+            raise ValueError(joined)
+        buffer = (_SEP + joined + _SEP).encode('utf-8')
+    except (ValueError, UnicodeEncodeError):
+        return np.array([clean_number(v) for v in values], dtype=float)
+
+    buffer = buffer.replace('\xa0'.encode('utf-8'), b'').translate(None, b' ,\t\n')
+    for token in (b'', b'-'):
+        # les jetons consécutifs partagent un séparateur : on répète la passe
+        while _SEP_BYTES + token + _SEP_BYTES in buffer:
+            buffer = buffer.replace(_SEP_BYTES + token + _SEP_BYTES, _SEP_BYTES + b'0' + _SEP_BYTES)
+
+    result = _parse_tokens(buffer[1:-1].split(_SEP_BYTES))
+    retry = np.flatnonzero(np.isnan(result))
+    if len(retry):
+        result[retry] = [clean_number(values[i]) for i in retry]
+    return result
+
+
+def _clean_scalars(values, types):
+    """Cellules non textuelles : conversion directe si ce ne sont que des nombres"""
+    if types <= _NUMBER_TYPES:
+        missing = pd.isna(values)
+        result = np.zeros(len(values))
+        result[~missing] = values[~missing].astype(float)
+        return result
+    return np.array([clean_number(v) for v in values], dtype=float)
+
+
+def clean_numeric_series(series):
+    """Version colonne de clean_number : mêmes résultats, sans appel par cellule
+
+    Les colonnes déjà numériques sont converties directement ; les chaînes
+    sont nettoyées en bloc (espaces, NBSP, séparateurs de milliers) et
+    '-' / 'nan' / vide valent 0.
+    """
+    if is_bool_dtype(series.dtype) or is_numeric_dtype(series.dtype):
+        return series.astype('float64').fillna(0.0)
+
+    values = series.to_numpy(dtype=object)
+    types = set(map(type, values))
+    if types == {str}:
+        result = _clean_strings(values)
+    elif not any(issubclass(t, str) for t in types):
+        result = _clean_scalars(values, types)
+    else:
+        is_str = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+        result = np.zeros(len(values))
+        others = values[~is_str]
+        result[~is_str] = _clean_scalars(others, set(map(type, others)))
+        if is_str.any():
+            result[is_str] = _clean_strings(values[is_str])
+
+    return pd.Series(result, index=series.index, name=series.name)
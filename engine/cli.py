@@ -0,0 +1,191 @@
+"""
+Contrôle en ligne de commande (batch, sans navigateur)
+
+Usage : python -m engine FICHIER_OU_DOSSIER [...] --output rapports/
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from engine.cache import IssuerCache, PortfolioCache
+from engine.delta import DeltaControl
+from engine.history import HistoryStore
+from engine.issuers import IsinIndex, IssuerGroups, read_isin_referential, read_issuer_groups
+from engine.nav import NavStore
+from engine.perf import Profiler
+from engine.pipeline import DEFAULT_PARAMS, run_control
+
+
+def find_workbooks(paths):
+    """Classeurs .xlsx désignés (fichiers ou contenu des dossiers), triés"""
+    workbooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            workbooks.extend(sorted(glob.glob(os.path.join(path, '*.xlsx'))))
+        else:
+            workbooks.append(path)
+    return [w for w in workbooks if not os.path.basename(w).startswith('~$')]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m engine',
+        description="Contrôle des ratios émetteurs OPCVM (CDVM n°01-09, art. 6)"
+    )
+    parser.add_argument('inputs', nargs='+', help="classeurs FOND.xlsx ou dossiers")
+    parser.add_argument('-o', '--output', default='.', help="dossier des rapports Excel")
+    parser.add_argument('--issuers', help="table émetteurs CSV (mot_cle, emetteur, type)")
+    parser.add_argument('--isin', metavar='REFERENTIEL',
+                        help="référentiel ISIN CSV/Excel (isin, emetteur, type) consulté avant les mots-clés")
+    parser.add_argument('--groups', metavar='HIERARCHIE',
+                        help="hiérarchie des émetteurs CSV/Excel (emetteur, parent) : ratios par groupe")
+    parser.add_argument('--date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help="date du contrôle (AAAA-MM-JJ), aujourd'hui par défaut")
+    parser.add_argument('--plafond-etat', type=float, default=DEFAULT_PARAMS['plafond_etat'])
+    parser.add_argument('--plafond-action', type=float, default=DEFAULT_PARAMS['plafond_action_eligible'])
+    parser.add_argument('--plafond-standard', type=float, default=DEFAULT_PARAMS['plafond_standard'])
+    parser.add_argument('--plafond-groupe', type=float, default=DEFAULT_PARAMS['plafond_groupe'])
+    parser.add_argument('--actions', default=', '.join(DEFAULT_PARAMS['actions_eligibles_15pct']),
+                        help="actions éligibles 15%%, séparées par des virgules")
+    parser.add_argument('--seuil-45', type=float, default=DEFAULT_PARAMS['seuil_45'])
+    parser.add_argument('--seuil-emetteur-45', type=float, default=DEFAULT_PARAMS['seuil_emetteur_45'])
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="processus de lecture des onglets (0 = tous les coeurs)")
+    parser.add_argument('--nav-db', help="base SQLite des actifs nets par fonds et date")
+    parser.add_argument('--nav-import', nargs='+', default=[],
+                        help="CSV/Excel (Fonds, Date, Actif net) à importer dans --nav-db")
+    parser.add_argument('--delta', metavar='DOSSIER',
+                        help="contrôle différentiel : état du run précédent conservé dans DOSSIER")
+    parser.add_argument('--history-db', help="base SQLite de l'historique des contrôles")
+    parser.add_argument('--cache-dir', help="dossier des caches persistants (émetteurs, portefeuilles)")
+    parser.add_argument('--top-emetteurs', type=int, default=5, metavar='N',
+                        help="N premiers émetteurs par exposition totale, tous fonds confondus (0 : aucun)")
+    parser.add_argument('--no-report', action='store_true', help="ne pas écrire de rapport Excel")
+    parser.add_argument('--json', action='store_true', help="une ligne JSON par classeur")
+    parser.add_argument('--perf', action='store_true',
+                        help="mesures par étape (durée, lignes, mémoire) en JSON sur la sortie d'erreur")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workbooks = find_workbooks(args.inputs)
+    if not workbooks:
+        print("Aucun classeur .xlsx trouvé", file=sys.stderr)
+        return 2
+
+    params = {
+        'plafond_etat': args.plafond_etat,
+        'plafond_action_eligible': args.plafond_action,
+        'plafond_standard': args.plafond_standard,
+        'actions_eligibles_15pct': [a.strip() for a in args.actions.split(',') if a.strip()],
+        'seuil_45': args.seuil_45,
+        'seuil_emetteur_45': args.seuil_emetteur_45,
+        'plafond_groupe': args.plafond_groupe,
+    }
+    issuer_table = pd.read_csv(args.issuers) if args.issuers else None
+    isin_index = IsinIndex(read_isin_referential(args.isin)) if args.isin else None
+    try:
+        groups = IssuerGroups(read_issuer_groups(args.groups)) if args.groups else None
+    except (KeyError, ValueError) as e:
+        print(f"{args.groups}: hiérarchie des émetteurs invalide : {e}", file=sys.stderr)
+        return 2
+    if args.cache_dir:
+        issuer_cache = IssuerCache(path=os.path.join(args.cache_dir, 'issuers'))
+        portfolio_cache = PortfolioCache(os.path.join(args.cache_dir, 'portfolios'))
+    else:
+        issuer_cache, portfolio_cache = IssuerCache(), None
+    control_date = args.date or datetime.now().date()
+    nav_store = NavStore(args.nav_db) if args.nav_db else None
+    if args.nav_import and nav_store is None:
+        print("--nav-import nécessite --nav-db", file=sys.stderr)
+        return 2
+    for nav_file in args.nav_import:
+        print(f"{nav_file}: {nav_store.import_file(nav_file)} actifs nets importés")
+    history = HistoryStore(args.history_db) if args.history_db else None
+    if args.perf:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        perf_logger = logging.getLogger('engine.perf')
+        perf_logger.addHandler(handler)
+        perf_logger.setLevel(logging.INFO)
+        perf_logger.propagate = False
+    os.makedirs(args.output, exist_ok=True)
+
+    status = 0
+    start = time.perf_counter()
+    for workbook in workbooks:
+        stem = os.path.splitext(os.path.basename(workbook))[0]
+        report = None if args.no_report else os.path.join(
+            args.output, f"controle_{stem}_{control_date.strftime('%Y%m%d')}.xlsx"
+        )
+        # un état différentiel par classeur : le run suivant du même classeur s'y compare
+        delta = DeltaControl(path=os.path.join(args.delta, stem), issuer_cache=issuer_cache) if args.delta else None
+        try:
+            result = run_control(workbook, issuer_table, params, control_date,
+                                 issuer_cache=issuer_cache, report=report,
+                                 workers=args.workers or os.cpu_count(),
+                                 portfolio_cache=portfolio_cache, nav_store=nav_store,
+                                 history=history, delta=delta, isin_index=isin_index,
+                                 groups=groups,
+                                 profiler=Profiler(context={'classeur': workbook}) if args.perf else None)
+        except Exception as e:
+            print(f"{workbook}: erreur : {e}", file=sys.stderr)
+            status = 1
+            continue
+
+        kpis = result['kpis'] or {}
+        line = {
+            'classeur': workbook,
+            'fonds': len(result['actif_net_dict'] or {}),
+            'positions': 0 if result['portfolio'] is None else len(result['portfolio']),
+            'ratios': kpis.get('total', 0),
+            'non_conformes': kpis.get('non_conformes', 0),
+            'rapport': result['report'],
+            'sources_emetteurs': result['sources'],
+            'durees_s': {k: round(v, 4) for k, v in result['timings'].items()},
+        }
+        if result['group_ratios'] is not None:
+            line['groupes_non_conformes'] = int((result['group_ratios']['Conformite'] == '❌').sum())
+        if result['exposure'] is not None and args.top_emetteurs > 0:
+            top = result['exposure'].top_issuers(args.top_emetteurs)
+            line['top_emetteurs'] = [
+                {'emetteur': row.Emetteur, 'montant_mad': round(row.Montant_MAD, 2),
+                 'part_encours': round(row.Part_Encours, 6), 'nb_fonds': int(row.Nb_Fonds)}
+                for row in top.itertuples(index=False)
+            ]
+        if 'delta' in result:
+            line.update(result['delta'])
+        if args.json:
+            print(json.dumps(line, ensure_ascii=False))
+        else:
+            stages = '  '.join(f"{k} {v:.2f}s" for k, v in result['timings'].items())
+            print(f"{workbook}: {line['fonds']} fonds, {line['positions']} positions, "
+                  f"{line['ratios']} ratios, {line['non_conformes']} non-conformes | {stages}")
+            if 'groupes_non_conformes' in line:
+                print(f"  groupes : {line['groupes_non_conformes']} non-conforme(s)")
+            if 'top_emetteurs' in line:
+                top = ', '.join(f"{e['emetteur']} {e['part_encours']:.1%}" for e in line['top_emetteurs'])
+                print(f"  premiers émetteurs (tous fonds) : {top}")
+            if isin_index is not None and result['sources']:
+                shares = ', '.join(f"{source} {share:.1%}" for source, share in result['sources'].items())
+                print(f"  émetteurs résolus : {shares}")
+            if 'delta' in result:
+                print(f"  différentiel : {len(line['fonds_recalcules'])} fonds recalculés, "
+                      f"{len(line['fonds_reutilises'])} réutilisés, "
+                      f"{len(line['onglets_relus'])} onglet(s) relu(s)")
+        if result['kpis'] is None:
+            status = status or 1
+
+    if not args.json:
+        print(f"{len(workbooks)} classeur(s) en {time.perf_counter() - start:.2f}s "
+              f"| cache émetteurs {issuer_cache.stats()}")
+    return status
@@ -0,0 +1,186 @@
+"""
+Contrôle différentiel : seuls les onglets et fonds modifiés depuis le contrôle précédent sont retraités
+"""
+
+import hashlib
+import os
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from engine.cache import file_hash, issuer_table_hash
+from engine.issuers import add_issuers
+from engine.loader import assemble_portfolio, clean_sheet, compact_positions, open_workbook
+from engine.perf import stage
+from engine.xlsx import sheet_parts, source as _source
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+
+
+# =============================================================================
+# EMPREINTES
+# =============================================================================
+
+# Parties partagées par tous les onglets : une modification invalide tout le classeur
+_SHARED_PARTS = ('xl/sharedStrings.xml', 'xl/styles.xml')
+
+
+def sheet_fingerprints(file):
+    """{onglet: empreinte} dans l'ordre du classeur, sans lire les cellules
+
+    L'empreinte d'un onglet couvre son XML brut ainsi que la table des
+    chaînes partagées et les styles (dont dépend l'interprétation des
+    cellules). Renvoie None si le fichier n'est pas un classeur .xlsx.
+    """
+    try:
+        with zipfile.ZipFile(_source(file)) as z:
+            names = set(z.namelist())
+            shared = hashlib.sha256()
+            for part in _SHARED_PARTS:
+                if part in names:
+                    shared.update(z.read(part))
+
+            fingerprints = {}
+            for name, part in sheet_parts(z).items():
+                digest = shared.copy()
+                digest.update(z.read(part))
+                fingerprints[name] = digest.hexdigest()
+            return fingerprints
+    except (zipfile.BadZipFile, KeyError):
+        return None
+
+
+def fund_fingerprints(portfolio, actif_net_dict):
+    """{fonds: empreinte de ses positions nettoyées et de son actif net}
+
+    Une seule passe de hachage vectorisée sur tout le portefeuille, puis
+    une empreinte par fonds à partir des hachages de ses lignes.
+    """
+    rows = pd.util.hash_pandas_object(portfolio, index=False).to_numpy()
+    codes, funds = pd.factorize(portfolio['Fonds'])
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(funds)))])
+    fingerprints = {}
+    for i, fonds in enumerate(funds):
+        digest = hashlib.sha256(rows[order[bounds[i]:bounds[i + 1]]].tobytes())
+        digest.update(repr(float(actif_net_dict.get(fonds, 0))).encode())
+        fingerprints[fonds] = digest.hexdigest()
+    return fingerprints
+
+# =============================================================================
+# CONTRÔLE DIFFÉRENTIEL
+# =============================================================================
+
+class DeltaControl:
+    """État du contrôle précédent, réutilisé fonds par fonds
+
+    load() ne relit que les onglets dont l'empreinte a changé ; compute()
+    ne recalcule émetteurs, ratios et règle 45% que pour les fonds dont les
+    positions, l'actif net, la table émetteurs ou les paramètres ont changé.
+    Les résultats sont identiques à un contrôle complet. Avec `path`, l'état
+    est conservé sur disque entre deux exécutions (contrôles intrajournaliers
+    lancés en batch).
+    """
+
+    def __init__(self, path=None, issuer_cache=None, engine=None):
+        self.path = path
+        self.issuer_cache = issuer_cache
+        self.engine = engine
+        self.reparsed = []
+        self.reused = []
+        self.recomputed = []
+        self._sheets = {}
+        self._funds = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(self._file()):
+            self._sheets, self._funds = pd.read_pickle(self._file())
+
+    def _file(self):
+        return os.path.join(self.path, 'delta.pkl')
+
+    def save(self):
+        """Écrit l'état sur disque (écriture atomique)"""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        pd.to_pickle((self._sheets, self._funds), f"{self._file()}.tmp")
+        os.replace(f"{self._file()}.tmp", self._file())
+
+    def summary(self):
+        """Onglets relus, fonds réutilisés et recalculés lors du dernier contrôle"""
+        return {
+            'onglets_relus': list(self.reparsed),
+            'fonds_reutilises': list(self.reused),
+            'fonds_recalcules': list(self.recomputed),
+        }
+
+    def load(self, file):
+        """Comme read_portfolio, en ne relisant que les onglets modifiés"""
+        with self._lock:
+            fingerprints = sheet_fingerprints(file)
+            if fingerprints is None:
+                # format non zippé : empreinte du fichier entier pour chaque onglet
+                with open_workbook(file, self.engine) as book:
+                    key = file_hash(file)
+                    fingerprints = {name: key for name in book.sheet_names}
+
+            changed = [name for name, fp in fingerprints.items()
+                       if self._sheets.get(name, (None,))[0] != fp]
+            if changed:
+                with open_workbook(file, self.engine) as book:
+                    for name in changed:
+                        with stage('lecture_onglet') as measured:
+                            df = book.read(name)
+                            measured.rows = 0 if df is None else len(df)
+                        self._sheets[name] = (fingerprints[name], *clean_sheet(name, df))
+            self._sheets = {name: self._sheets[name] for name in fingerprints}
+            self.reparsed = changed
+
+            return assemble_portfolio((fonds, positions) for _, fonds, positions in self._sheets.values())
+
+    def compute(self, portfolio, actif_net_dict, issuer_table, params, isin_index=None):
+        """(positions enrichies, ratios, règle 45%) en ne recalculant que les fonds modifiés"""
+        with self._lock:
+            settings = (issuer_table_hash(issuer_table),
+                        None if isin_index is None else isin_index.fingerprint, params['plafond_etat'],
+                        params['plafond_action_eligible'], params['plafond_standard'],
+                        tuple(params['actions_eligibles_15pct']), params['seuil_45'],
+                        params['seuil_emetteur_45'])
+
+            keys = {fonds: (fingerprint, settings)
+                    for fonds, fingerprint in fund_fingerprints(portfolio, actif_net_dict).items()}
+            changed = [fonds for fonds, key in keys.items() if self._funds.get(fonds, (None,))[0] != key]
+
+            if changed:
+                subset = portfolio[portfolio['Fonds'].isin(changed)]
+                subset_nav = {fonds: actif_net_dict[fonds] for fonds in changed}
+                labeled = add_issuers(subset, issuer_table, cache=self.issuer_cache, isin_index=isin_index)
+                ratios_df = calculate_issuer_ratios(labeled, subset_nav, params)
+                rule_45_df = check_45_percent_rule(ratios_df, labeled, subset_nav, params['seuil_45'],
+                                                   seuil_emetteur=params['seuil_emetteur_45'])
+                labeled_by_fund = dict(tuple(labeled.groupby('Fonds', sort=False)))
+                ratios_by_fund = _split(ratios_df)
+                rule_by_fund = _split(rule_45_df)
+                for fonds in changed:
+                    self._funds[fonds] = (keys[fonds], labeled_by_fund[fonds],
+                                          ratios_by_fund.get(fonds), rule_by_fund.get(fonds))
+
+            self._funds = {fonds: self._funds[fonds] for fonds in keys}
+            self.recomputed = changed
+            self.reused = [fonds for fonds in keys if fonds not in set(changed)]
+
+            funds = list(keys)
+            labeled = compact_positions(pd.concat([self._funds[f][1] for f in funds], ignore_index=True))
+            ratios = [self._funds[f][2] for f in funds if self._funds[f][2] is not None]
+            rules = [self._funds[f][3] for f in funds if self._funds[f][3] is not None]
+            ratios_df = pd.concat(ratios, ignore_index=True) if ratios else pd.DataFrame()
+            rule_45_df = pd.concat(rules, ignore_index=True) if rules else pd.DataFrame()
+            return labeled, ratios_df, rule_45_df
+
+
+def _split(df):
+    """{fonds: lignes du fonds} d'un tableau de résultats (vide -> {})"""
+    if df is None or len(df) == 0 or 'Fonds' not in df.columns:
+        return {}
+    return dict(tuple(df.groupby('Fonds', sort=False)))
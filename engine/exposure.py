@@ -0,0 +1,184 @@
+"""
+Matrice creuse fonds x émetteurs : vues société de gestion (tous OPCVM confondus)
+
+Les expositions agrégées par (Fonds, Emetteur) sont rangées au format CSR
+(compressed sparse row) : pour le fonds i, les colonnes indices[indptr[i]:
+indptr[i + 1]] (émetteurs, triés) et les montants data[...] correspondants.
+Avec l'actif net en vecteur, les ratios, les totaux par émetteur sur
+l'ensemble des fonds et les classements inter-fonds sont des opérations
+sur trois tableaux numpy : quelques milliers de fonds x dizaines de
+milliers d'émetteurs tiennent en 12 octets par couple détenu, là où une
+matrice dense en demanderait 8 par case.
+
+scipy n'est pas requis ; s'il est installé, to_scipy() renvoie la même
+matrice en scipy.sparse.csr_matrix, sans copie.
+"""
+
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from engine.ratios import aggregate_exposures, format_pct
+
+
+TOP_ISSUER_COLUMNS = ['Emetteur', 'Montant_MAD', 'Part_Encours', 'Part_Encours_%', 'Nb_Fonds',
+                      'Ratio_Max', 'Ratio_Max_%', 'Fonds_Ratio_Max']
+
+
+def scipy_available():
+    """scipy.sparse est-il installé (export to_scipy) ?"""
+    return importlib.util.find_spec('scipy') is not None
+
+
+class ExposureMatrix:
+    """Expositions fonds x émetteurs en CSR, actif net par fonds en vecteur
+
+    `funds` et `issuers` (pd.Index) nomment les lignes et les colonnes ;
+    les émetteurs sont triés, et triés aussi dans chaque ligne. Construite
+    par from_ratios (ratios ou expositions déjà agrégés) ou from_positions.
+    """
+
+    def __init__(self, indptr, indices, data, funds, issuers, actif_net):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.funds = funds
+        self.issuers = issuers
+        self.actif_net = actif_net
+
+    @classmethod
+    def from_ratios(cls, ratios_df):
+        """Matrice à partir de Fonds, Emetteur, Montant_MAD et Actif_Net_MAD (un couple par ligne ou plus)
+
+        Les couples répétés sont additionnés ; l'ordre des lignes est
+        indifférent (ratios d'un contrôle différentiel compris).
+        """
+        fund_codes, funds = pd.factorize(np.asarray(ratios_df['Fonds'], dtype=object))
+        issuer_codes, issuers = pd.factorize(np.asarray(ratios_df['Emetteur'], dtype=object), sort=True)
+        amounts = ratios_df['Montant_MAD'].to_numpy(dtype=float)
+        actif_net = np.zeros(len(funds))
+        actif_net[fund_codes] = ratios_df['Actif_Net_MAD'].to_numpy(dtype=float)
+
+        order = np.lexsort((issuer_codes, fund_codes))
+        rows, cols = fund_codes[order], issuer_codes[order]
+        new_pair = np.ones(len(order), dtype=bool)
+        new_pair[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        starts = np.flatnonzero(new_pair)
+        data = np.add.reduceat(amounts[order], starts) if len(starts) else amounts[:0]
+        rows, cols = rows[starts], cols[starts]
+
+        indptr = np.zeros(len(funds) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(funds)), out=indptr[1:])
+        index_dtype = np.int32 if len(issuers) < 2 ** 31 else np.int64
+        return cls(indptr, cols.astype(index_dtype), data,
+                   pd.Index(funds, dtype=object), pd.Index(issuers, dtype=object), actif_net)
+
+    @classmethod
+    def from_positions(cls, df, actif_net_dict):
+        """Matrice à partir des positions étiquetées (colonne Emetteur) des fonds d'actif net > 0"""
+        return cls.from_ratios(aggregate_exposures(df, actif_net_dict))
+
+    @property
+    def shape(self):
+        return len(self.funds), len(self.issuers)
+
+    @property
+    def nnz(self):
+        """Nombre de couples (fonds, émetteur) détenus"""
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes + self.actif_net.nbytes
+
+    def _rows(self):
+        """Numéro de fonds de chaque valeur stockée"""
+        return np.repeat(np.arange(len(self.funds)), np.diff(self.indptr))
+
+    # -------------------------------------------------------------------------
+    # Opérations matricielles
+    # -------------------------------------------------------------------------
+
+    def ratios(self):
+        """Ratios montant / actif net, alignés sur data (même structure creuse)"""
+        return self.data / self.actif_net[self._rows()]
+
+    def fund_totals(self):
+        """Montant détenu par fonds (somme de chaque ligne)"""
+        return np.bincount(self._rows(), weights=self.data, minlength=len(self.funds))
+
+    def issuer_totals(self):
+        """Exposition de la société de gestion à chaque émetteur, tous fonds confondus (somme des colonnes)"""
+        return np.bincount(self.indices, weights=self.data, minlength=len(self.issuers))
+
+    def issuer_funds(self):
+        """Nombre de fonds exposés à chaque émetteur"""
+        return np.bincount(self.indices, minlength=len(self.issuers))
+
+    def dot(self, vector):
+        """Produit matrice x vecteur (une valeur par émetteur -> une valeur par fonds)"""
+        products = self.data * np.asarray(vector, dtype=float)[self.indices]
+        return np.bincount(self._rows(), weights=products, minlength=len(self.funds))
+
+    def grouped(self, groups):
+        """Matrice fonds x têtes de groupe : colonnes des émetteurs d'un même groupe additionnées"""
+        return ExposureMatrix.from_ratios(pd.DataFrame({
+            'Fonds': self.funds.take(self._rows()),
+            'Emetteur': groups.group_of(self.issuers.to_numpy())[self.indices],
+            'Montant_MAD': self.data,
+            'Actif_Net_MAD': self.actif_net[self._rows()],
+        }))
+
+    # -------------------------------------------------------------------------
+    # Vues société de gestion
+    # -------------------------------------------------------------------------
+
+    def issuer_exposure(self, emetteur):
+        """Montant et ratio de chaque fonds exposé à `emetteur` (colonne de la matrice)"""
+        code = self.issuers.get_indexer([emetteur])[0]
+        held = np.flatnonzero(self.indices == code) if code >= 0 else np.empty(0, dtype=np.intp)
+        rows = np.searchsorted(self.indptr, held, side='right') - 1
+        return pd.DataFrame({
+            'Fonds': self.funds.take(rows),
+            'Montant_MAD': self.data[held],
+            'Actif_Net_MAD': self.actif_net[rows],
+            'Ratio': self.data[held] / self.actif_net[rows],
+        })
+
+    def top_issuers(self, n=20, by='Montant_MAD'):
+        """Classement inter-fonds des émetteurs par exposition totale (ou Nb_Fonds, Ratio_Max)
+
+        Part_Encours : exposition totale rapportée à la somme des actifs
+        nets ; Ratio_Max : ratio le plus élevé parmi les fonds exposés.
+        """
+        if self.nnz == 0:
+            return pd.DataFrame(columns=TOP_ISSUER_COLUMNS)
+        totals = self.issuer_totals()
+        ratios = self.ratios()
+        rows = self._rows()
+        # ratio maximal par colonne, puis premier fonds (dans l'ordre des lignes) qui l'atteint
+        ratio_max = np.zeros(len(self.issuers))
+        np.maximum.at(ratio_max, self.indices, ratios)
+        at_max = np.flatnonzero(ratios == ratio_max[self.indices])[::-1]
+        fund_max = np.zeros(len(self.issuers), dtype=np.intp)
+        fund_max[self.indices[at_max]] = rows[at_max]
+
+        share = totals / self.actif_net.sum() if self.actif_net.sum() > 0 else np.zeros(len(totals))
+        table = pd.DataFrame({
+            'Emetteur': self.issuers,
+            'Montant_MAD': totals,
+            'Part_Encours': share,
+            'Nb_Fonds': self.issuer_funds(),
+            'Ratio_Max': ratio_max,
+            'Fonds_Ratio_Max': self.funds.take(fund_max),
+        })
+        table = table[table['Nb_Fonds'] > 0].sort_values(by, ascending=False, kind='stable').head(n)
+        table['Part_Encours_%'] = format_pct(table['Part_Encours'], 2)
+        table['Ratio_Max_%'] = format_pct(table['Ratio_Max'], 2)
+        return table[TOP_ISSUER_COLUMNS].reset_index(drop=True)
+
+    def to_scipy(self):
+        """scipy.sparse.csr_matrix partageant les tableaux (ImportError sans scipy)"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
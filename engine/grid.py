@@ -0,0 +1,54 @@
+"""
+Consultation des ratios par pages, filtrée côté serveur
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _group_index(values):
+    """{valeur: positions des lignes (triées)} via un seul tri stable"""
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))])
+    order = order[np.count_nonzero(codes < 0):]
+    return {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)}
+
+
+class RatioGrid:
+    """Index des ratios par Fonds, Emetteur et Conformite
+
+    Les positions de lignes de chaque valeur sont calculées une fois : un
+    filtre ne parcourt que les lignes des valeurs choisies, et seule la page
+    affichée est extraite du tableau.
+    """
+
+    FILTERS = ('Fonds', 'Emetteur', 'Conformite')
+
+    def __init__(self, ratios_df):
+        self.df = ratios_df
+        self._index = {column: _group_index(ratios_df[column]) for column in self.FILTERS}
+
+    def options(self, column):
+        """Valeurs filtrables d'une colonne, dans l'ordre d'apparition"""
+        return list(self._index[column])
+
+    def rows(self, **filters):
+        """Positions des lignes retenues ; un filtre vide ou absent ne restreint rien
+
+        Exemple : grid.rows(Fonds=['CLB'], Conformite=['❌'])
+        """
+        selected = None
+        for column, values in filters.items():
+            if not values:
+                continue
+            index = self._index[column]
+            positions = [index[v] for v in values if v in index]
+            positions = np.sort(np.concatenate(positions)) if positions else np.empty(0, dtype=np.intp)
+            selected = positions if selected is None else np.intersect1d(selected, positions, assume_unique=True)
+        return np.arange(len(self.df)) if selected is None else selected
+
+    def page(self, rows, page, page_size):
+        """Lignes de la page `page` (à partir de 0) parmi `rows`"""
+        start = page * page_size
+        return self.df.iloc[rows[start:start + page_size]]
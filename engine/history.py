@@ -0,0 +1,188 @@
+"""
+Historique des contrôles : ratios et règle 45% de chaque contrôle exécuté (SQLite, en ajout seul)
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from engine.nav import iso_date
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS controles (
+    run INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_controle TEXT NOT NULL,
+    enregistre_le TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ratios (
+    fonds TEXT NOT NULL,
+    emetteur TEXT NOT NULL,
+    date_controle TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    type TEXT,
+    montant REAL NOT NULL,
+    actif_net REAL NOT NULL,
+    ratio REAL NOT NULL,
+    plafond REAL NOT NULL,
+    conforme INTEGER NOT NULL,
+    PRIMARY KEY (fonds, emetteur, date_controle, run)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ratios_date ON ratios (date_controle, fonds, run);
+CREATE TABLE IF NOT EXISTS regle_45 (
+    fonds TEXT NOT NULL,
+    date_controle TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    total REAL NOT NULL,
+    actif_net REAL NOT NULL,
+    ratio REAL NOT NULL,
+    seuil REAL NOT NULL,
+    conforme INTEGER NOT NULL,
+    nb_emetteurs INTEGER NOT NULL,
+    PRIMARY KEY (fonds, date_controle, run)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS courant (
+    date_controle TEXT NOT NULL,
+    fonds TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    PRIMARY KEY (date_controle, fonds)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """Résultats de tous les contrôles exécutés, indexés par (Fonds, Emetteur, date)
+
+    L'historique est en ajout seul : chaque appel à record() est un contrôle
+    numéroté (table controles, avec son horodatage) dont les lignes ne sont
+    jamais modifiées ni supprimées. Relancer un contrôle à une date déjà
+    enregistrée ajoute un nouveau contrôle ; la table courant désigne, pour
+    chaque (date, fonds), le dernier contrôle, celui que lisent series(),
+    cross_section() et rule_45_series(). Les contrôles antérieurs restent
+    consultables par runs() et cross_section(run=...).
+    La clé primaire (fonds, emetteur, date_controle, run) sert les séries
+    d'un couple, l'index (date_controle, fonds, run) les vues transversales.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connexion le temps d'un bloc : transaction validée (ou annulée) puis connexion fermée"""
+        con = sqlite3.connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def record(self, control_date, ratios_df, rule_45_df=None):
+        """Enregistre un nouveau contrôle (sans toucher aux précédents) ; renvoie le nombre de ratios écrits"""
+        day = iso_date(control_date)
+        with self._connect() as con:
+            run = con.execute(
+                "INSERT INTO controles (date_controle, enregistre_le) VALUES (?, ?)",
+                (day, datetime.now().isoformat(timespec='seconds'))
+            ).lastrowid
+            ratios = [] if ratios_df is None or len(ratios_df) == 0 else list(zip(
+                ratios_df['Fonds'].astype(str), ratios_df['Emetteur'].astype(str),
+                [day] * len(ratios_df), [run] * len(ratios_df),
+                ratios_df['Type'].astype(object).where(ratios_df['Type'].notna(), None),
+                ratios_df['Montant_MAD'].astype(float), ratios_df['Actif_Net_MAD'].astype(float),
+                ratios_df['Ratio'].astype(float), ratios_df['Plafond'].astype(float),
+                (ratios_df['Conformite'] == '✅').astype(int),
+            ))
+            rule_45 = [] if rule_45_df is None or len(rule_45_df) == 0 else list(zip(
+                rule_45_df['Fonds'].astype(str), [day] * len(rule_45_df), [run] * len(rule_45_df),
+                rule_45_df['Total_>10%_MAD'].astype(float), rule_45_df['Actif_Net_MAD'].astype(float),
+                rule_45_df['Ratio_45%'].astype(float), rule_45_df['Seuil'].astype(float),
+                (rule_45_df['Conformite'] == '✅').astype(int), rule_45_df['Nb_Emetteurs'].astype(int),
+            ))
+            funds = {fonds for fonds, *_ in ratios} | {fonds for fonds, *_ in rule_45}
+            con.executemany("INSERT INTO ratios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", ratios)
+            con.executemany("INSERT INTO regle_45 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rule_45)
+            con.executemany("INSERT OR REPLACE INTO courant VALUES (?, ?, ?)",
+                            [(day, fonds, run) for fonds in funds])
+        return len(ratios)
+
+    def _query(self, sql, params):
+        with self._connect() as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        if 'date_controle' in df.columns:
+            df['date_controle'] = pd.to_datetime(df['date_controle'])
+        return df
+
+    def series(self, fonds, emetteur, start=None, end=None):
+        """Historique du ratio d'un émetteur dans un fonds (dernier contrôle de chaque date), par date croissante"""
+        return self._query(
+            "SELECT r.date_controle, r.montant, r.actif_net, r.ratio, r.plafond, r.conforme FROM ratios r "
+            "JOIN courant c ON c.date_controle = r.date_controle AND c.fonds = r.fonds AND c.run = r.run "
+            "WHERE r.fonds = ? AND r.emetteur = ? AND r.date_controle BETWEEN ? AND ? ORDER BY r.date_controle",
+            (fonds, emetteur, iso_date(start or '1900-01-01'), iso_date(end or '2999-12-31'))
+        )
+
+    def cross_section(self, control_date, fonds=None, run=None):
+        """Tous les ratios d'une date (d'un seul fonds si précisé)
+
+        Dernier contrôle de la date par défaut ; `run` (voir runs()) lit un
+        contrôle antérieur.
+        """
+        if run is None:
+            sql = ("SELECT r.fonds, r.emetteur, r.type, r.montant, r.actif_net, r.ratio, r.plafond, r.conforme "
+                   "FROM courant c JOIN ratios r "
+                   "ON r.date_controle = c.date_controle AND r.fonds = c.fonds AND r.run = c.run "
+                   "WHERE c.date_controle = ?")
+            params = (iso_date(control_date),)
+        else:
+            sql = ("SELECT r.fonds, r.emetteur, r.type, r.montant, r.actif_net, r.ratio, r.plafond, r.conforme "
+                   "FROM ratios r WHERE r.date_controle = ? AND r.run = ?")
+            params = (iso_date(control_date), run)
+        if fonds is not None:
+            sql += " AND r.fonds = ?"
+            params += (fonds,)
+        return self._query(sql + " ORDER BY r.fonds, r.emetteur", params)
+
+    def rule_45_series(self, fonds, start=None, end=None):
+        """Historique de la règle des 45% d'un fonds (dernier contrôle de chaque date)"""
+        return self._query(
+            "SELECT r.date_controle, r.total, r.actif_net, r.ratio, r.seuil, r.conforme, r.nb_emetteurs "
+            "FROM regle_45 r "
+            "JOIN courant c ON c.date_controle = r.date_controle AND c.fonds = r.fonds AND c.run = r.run "
+            "WHERE r.fonds = ? AND r.date_controle BETWEEN ? AND ? ORDER BY r.date_controle",
+            (fonds, iso_date(start or '1900-01-01'), iso_date(end or '2999-12-31'))
+        )
+
+    def runs(self, control_date=None):
+        """Contrôles enregistrés (numéro, date de contrôle, horodatage), du plus récent au plus ancien"""
+        sql = "SELECT run, date_controle, enregistre_le FROM controles"
+        params = ()
+        if control_date is not None:
+            sql += " WHERE date_controle = ?"
+            params = (iso_date(control_date),)
+        return self._query(sql + " ORDER BY run DESC", params)
+
+    def dates(self):
+        """Dates de contrôle enregistrées, de la plus récente à la plus ancienne"""
+        with self._connect() as con:
+            rows = con.execute("SELECT DISTINCT date_controle FROM courant ORDER BY date_controle DESC")
+            return [pd.Timestamp(day).date() for (day,) in rows]
+
+    def funds(self):
+        """Fonds présents dans l'historique"""
+        with self._connect() as con:
+            return [fonds for (fonds,) in con.execute("SELECT DISTINCT fonds FROM courant ORDER BY fonds")]
+
+    def issuers(self, fonds):
+        """Émetteurs déjà détenus par un fonds (parcours de la clé primaire)"""
+        with self._connect() as con:
+            return [emetteur for (emetteur,) in con.execute(
+                "SELECT DISTINCT emetteur FROM ratios WHERE fonds = ? ORDER BY emetteur", (fonds,)
+            )]
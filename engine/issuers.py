@@ -0,0 +1,410 @@
+"""
+Table des émetteurs et identification des émetteurs à partir des descriptions
+"""
+
+import hashlib
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from engine.perf import timed
+
+
+# =============================================================================
+# TABLE DES ÉMETTEURS
+# =============================================================================
+
+def default_issuer_table():
+    """Table de correspondance émetteurs"""
+    data = {
+        'mot_cle': [
+            'ATW', 'ATTIJARI', 'OBLATW', 'CD ATW',
+            'ARADEI', 'OBLARADEI',
+            'BCP', 'OBLBCP',
+            'IAM', 'ITISSALAT',
+            'BOA', 'BANK OF AFRICA',
+            'CDM', 'CIH', 'MUTANDIS',
+            'LBV', 'LABEL VIE',
+            'COSUMAR', 'CSR',
+            'ONCF', 'OBLONCF',
+            'CAM', 'OBLCAM',
+            'RCI', 'BSFRCI',
+            'BDT', 'CFG', 'IRGAM',
+            'PRS', 'INSTICASH', 'TWIN'
+        ],
+        'emetteur': [
+            'ATW', 'ATW', 'ATW', 'ATW',
+            'ARADEI', 'ARADEI',
+            'BCP', 'BCP',
+            'IAM', 'IAM',
+            'BOA', 'BOA',
+            'CDM', 'CIH', 'MUTANDIS',
+            'LBV', 'LBV',
+            'COSUMAR', 'COSUMAR',
+            'ONCF', 'ONCF',
+            'CAM', 'CAM',
+            'RCI', 'RCI',
+            'État marocain', 'CFG', 'IRGAM',
+            'CFG', 'CFG', 'TWIN'
+        ],
+        'type': [
+            'privé', 'privé', 'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'privé', 'privé',
+            'public', 'privé', 'privé',
+            'privé', 'privé', 'privé'
+        ]
+    }
+    return pd.DataFrame(data)
+
+# =============================================================================
+# RÉFÉRENTIEL ISIN
+# =============================================================================
+
+def read_isin_referential(file):
+    """Référentiel ISIN (CSV ou Excel) : colonnes isin, emetteur et, facultative, type
+
+    Les intitulés sont comparés sans tenir compte de la casse ('ISIN',
+    'Emetteur'...) ; sans colonne type, les émetteurs sont privés.
+    """
+    name = file if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', '')
+    if str(name).lower().endswith(('.xlsx', '.xls')):
+        referential = pd.read_excel(file, dtype=str)
+    else:
+        referential = pd.read_csv(file, dtype=str)
+    referential.columns = [str(col).strip().lower().replace('é', 'e') for col in referential.columns]
+    if 'type' not in referential.columns:
+        referential['type'] = AUTRE[1]
+    return referential[['isin', 'emetteur', 'type']]
+
+
+class IsinIndex:
+    """Index ISIN -> (émetteur, type) construit une fois (table de hachage)
+
+    Les ISIN sont normalisés (espaces retirés, majuscules) ; en cas de
+    doublon, la première ligne du référentiel l'emporte. lookup() résout
+    une colonne entière par une jointure vectorisée sur les ISIN distincts.
+    """
+
+    def __init__(self, referential):
+        referential = referential.dropna(subset=['isin', 'emetteur'])
+        isins = _normalize_isins(referential['isin'].to_numpy(dtype=object))
+        keep = ~pd.Index(isins).duplicated() & (isins != '')
+        self._index = pd.Index(isins[keep])
+        self.emetteurs = referential['emetteur'].to_numpy(dtype=object)[keep]
+        self.types = referential['type'].fillna(AUTRE[1]).to_numpy(dtype=object)[keep]
+        table = pd.DataFrame({'isin': self._index, 'emetteur': self.emetteurs, 'type': self.types})
+        hashed = pd.util.hash_pandas_object(table.astype(str), index=False).to_numpy()
+        self.fingerprint = hashlib.sha256(hashed.tobytes()).hexdigest()
+
+    def __len__(self):
+        return len(self._index)
+
+    def lookup(self, isins):
+        """Ligne du référentiel pour chaque ISIN de la colonne (-1 si inconnu ou manquant)"""
+        if isinstance(isins, pd.Series) and isinstance(isins.dtype, pd.CategoricalDtype):
+            codes, uniques = isins.cat.codes.to_numpy(), isins.cat.categories.to_numpy(dtype=object)
+        else:
+            codes, uniques = pd.factorize(pd.Series(isins, dtype=object))
+        found = self._index.get_indexer(uniques)
+        # ISIN déjà normalisés (cas courant) trouvés directement ; seuls les autres sont renormalisés
+        missing = np.flatnonzero(found < 0)
+        if len(missing):
+            found[missing] = self._index.get_indexer(_normalize_isins(uniques[missing]))
+        return np.append(found, -1)[codes]
+
+
+def _normalize_isins(values):
+    return np.array([str(v).replace(' ', '').replace('\xa0', '').upper() for v in values], dtype=object)
+
+# =============================================================================
+# GROUPES D'ÉMETTEURS
+# =============================================================================
+
+def read_issuer_groups(file):
+    """Hiérarchie des émetteurs (CSV ou Excel) : colonnes emetteur et parent
+
+    Une ligne par lien de détention directe ; parent vide pour une tête de
+    groupe. Les intitulés sont comparés sans tenir compte de la casse.
+    """
+    name = file if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', '')
+    if str(name).lower().endswith(('.xlsx', '.xls')):
+        hierarchy = pd.read_excel(file, dtype=str)
+    else:
+        hierarchy = pd.read_csv(file, dtype=str)
+    hierarchy.columns = [str(col).strip().lower().replace('é', 'e') for col in hierarchy.columns]
+    return hierarchy[['emetteur', 'parent']]
+
+
+class IssuerGroups:
+    """Hiérarchie émetteur -> parent aplatie une fois en index émetteur -> tête de groupe
+
+    L'aplatissement se fait par sauts de pointeurs vectorisés (parent du
+    parent, en log2(profondeur) passes) : des milliers d'entités et des
+    chaînes de détention à plusieurs niveaux, sans parcours ligne à ligne.
+    Un émetteur absent de la hiérarchie est son propre groupe. En cas de
+    doublon, le premier lien l'emporte ; une détention circulaire lève
+    ValueError.
+    """
+
+    def __init__(self, hierarchy):
+        hierarchy = hierarchy.dropna(subset=['emetteur'])
+        children = hierarchy['emetteur'].astype(str).str.strip().to_numpy(dtype=object)
+        parents = hierarchy['parent'].fillna('').astype(str).str.strip().to_numpy(dtype=object)
+        names = pd.Index(pd.unique(np.concatenate([children, parents[parents != '']])))
+
+        # pointeur vers le parent direct ; une tête de groupe pointe sur elle-même
+        direct = np.arange(len(names))
+        child_codes = names.get_indexer(children)
+        first = ~pd.Index(child_codes).duplicated()
+        linked = first & (parents != '')
+        direct[child_codes[linked]] = names.get_indexer(parents[linked])
+
+        ultimate = direct
+        for _ in range(max(1, len(names)).bit_length() + 1):
+            jumped = ultimate[ultimate]
+            if np.array_equal(jumped, ultimate):
+                break
+            ultimate = jumped
+        # une tête de groupe doit pointer sur elle-même dans la hiérarchie d'origine
+        cyclic = direct[ultimate] != ultimate
+        if cyclic.any():
+            raise ValueError(f"Détention circulaire : {', '.join(names[cyclic][:5])}")
+
+        self._index = names
+        self.groups = names.to_numpy(dtype=object)[ultimate]
+        table = pd.DataFrame({'emetteur': names, 'groupe': self.groups})
+        hashed = pd.util.hash_pandas_object(table, index=False).to_numpy()
+        self.fingerprint = hashlib.sha256(hashed.tobytes()).hexdigest()
+
+    def __len__(self):
+        return len(self._index)
+
+    def group_of(self, issuers):
+        """Tête de groupe de chaque émetteur (l'émetteur lui-même s'il est hors hiérarchie)"""
+        codes, uniques = pd.factorize(pd.Series(issuers, dtype=object))
+        found = self._index.get_indexer(uniques)
+        groups = np.where(found >= 0, self.groups[found], uniques)
+        return np.append(groups, None)[codes]
+
+# =============================================================================
+# IDENTIFICATION DES ÉMETTEURS
+# =============================================================================
+
+ETAT_KEYWORD = 'BDT'
+ETAT = ('État marocain', 'public')
+AUTRE = ('Autre', 'privé')
+INCONNU = ('Inconnu', 'inconnu')
+
+
+def identify_issuer(description, issuer_table):
+    """Identifie l'émetteur à partir de la description"""
+    if pd.isna(description):
+        return INCONNU
+
+    desc = str(description).upper()
+
+    if ETAT_KEYWORD in desc:
+        return ETAT
+
+    for _, row in issuer_table.iterrows():
+        mot_cle = str(row['mot_cle']).upper()
+        if mot_cle in desc:
+            return row['emetteur'], row['type']
+
+    return AUTRE
+
+
+class IssuerMatcher:
+    """Automate Aho-Corasick compilé une fois à partir de la table émetteurs
+
+    Chaque mot-clé reçoit un rang : 0 pour 'BDT' (État marocain, prioritaire),
+    puis l'ordre de la table. Une description est parcourue une seule fois ;
+    parmi tous les mots-clés qu'elle contient on retient celui de plus petit
+    rang, ce qui reproduit exactement le premier match de identify_issuer.
+    """
+
+    def __init__(self, issuer_table):
+        keywords = [ETAT_KEYWORD] + [str(k).upper() for k in issuer_table['mot_cle']]
+        n = len(keywords)
+
+        # Résultats indexés par rang ; n = aucun mot-clé, n + 1 = description vide
+        self.emetteurs = np.array(
+            [ETAT[0]] + list(issuer_table['emetteur']) + [AUTRE[0], INCONNU[0]], dtype=object
+        )
+        self.types = np.array(
+            [ETAT[1]] + list(issuer_table['type']) + [AUTRE[1], INCONNU[1]], dtype=object
+        )
+        self._no_match = n
+        self._missing = n + 1
+
+        self._goto = [{}]
+        self._best = [n]
+        for rank, keyword in enumerate(keywords):
+            node = 0
+            for ch in keyword:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][ch] = child
+                    self._goto.append({})
+                    self._best.append(n)
+                node = child
+            self._best[node] = min(self._best[node], rank)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        for child in queue:
+            self._best[child] = min(self._best[child], self._best[0])
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._best[child] = min(self._best[child], self._best[self._fail[child]])
+                queue.append(child)
+
+    def _rank(self, text):
+        """Plus petit rang de mot-clé contenu dans le texte (déjà en majuscules)"""
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        found = best[0]
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best[node] < found:
+                found = best[node]
+                if found == 0:
+                    break
+        return found
+
+    def match(self, description):
+        """Équivalent scalaire de identify_issuer"""
+        if pd.isna(description):
+            rank = self._missing
+        else:
+            rank = self._rank(str(description).upper())
+        return self.emetteurs[rank], self.types[rank]
+
+    @timed('identification_emetteurs', rows=lambda labels: len(labels[0]))
+    def label(self, descriptions, categorical=False):
+        """Étiquette une colonne Description : (émetteurs, types) en tableaux
+
+        Les descriptions identiques ne sont analysées qu'une fois. Avec
+        `categorical`, les étiquettes sont des pd.Categorical (codes entiers
+        par ligne, libellés stockés une fois).
+        """
+        codes, uniques = factorize_descriptions(descriptions)
+        ranks = np.fromiter(
+            (self._rank(str(u).upper()) for u in uniques), dtype=np.intp, count=len(uniques)
+        )
+        ranks = np.append(ranks, self._missing)
+        return expand_labels(codes, self.emetteurs[ranks], self.types[ranks], categorical)
+
+
+def factorize_descriptions(descriptions):
+    """(codes par ligne, descriptions distinctes) ; code -1 pour une description manquante
+
+    Une colonne catégorielle fournit directement ses codes : aucune chaîne
+    n'est relue ligne à ligne.
+    """
+    if isinstance(descriptions, pd.Series) and isinstance(descriptions.dtype, pd.CategoricalDtype):
+        return descriptions.cat.codes.to_numpy(), descriptions.cat.categories.to_numpy(dtype=object)
+    return pd.factorize(pd.Series(descriptions, dtype=object))
+
+
+def expand_labels(codes, emetteurs, types, categorical=False):
+    """Étiquettes par ligne à partir des étiquettes par description distincte
+
+    `emetteurs` et `types` ont une entrée de plus que les descriptions
+    distinctes : la dernière, pour le code -1 (description manquante).
+    """
+    if not categorical:
+        return emetteurs[codes], types[codes]
+    labels = []
+    for values in (emetteurs, types):
+        value_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+        labels.append(pd.Categorical.from_codes(value_codes[codes], categories=pd.Index(categories)))
+    return tuple(labels)
+
+
+# Chemin par lequel l'émetteur d'une position a été résolu (colonne Source_Emetteur)
+SOURCE_ISIN = 'ISIN'
+SOURCE_MOTS_CLES = 'mots-clés'
+
+
+def add_issuers(df, issuer_table, cache=None, isin_index=None):
+    """Ajoute les colonnes émetteur, type et source de l'identification
+
+    issuer_table peut être la table émetteurs ou un IssuerMatcher déjà compilé.
+    Avec un IssuerCache (et la table émetteurs), les descriptions déjà vues
+    ne sont pas ré-analysées. Avec un IsinIndex, les positions dont le
+    Code_ISIN figure au référentiel sont résolues par jointure ; les
+    mots-clés ne sont cherchés que dans les descriptions des autres.
+    Source_Emetteur indique le chemin retenu pour chaque ligne (issuer_sources).
+    """
+    if df is None or len(df) == 0:
+        return df
+
+    found = None
+    if isin_index is not None and 'Code_ISIN' in df.columns:
+        found = isin_index.lookup(df['Code_ISIN'])
+
+    if found is None or not (found >= 0).any():
+        emetteurs, types = _label_descriptions(df['Description'], issuer_table, cache)
+        sources = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8),
+                                            categories=pd.Index([SOURCE_MOTS_CLES]))
+    else:
+        # codes communs : lignes du référentiel, puis descriptions distinctes, puis description manquante
+        resolved = found >= 0
+        desc_codes, uniques = factorize_descriptions(df['Description'])
+        needed = np.unique(desc_codes[~resolved])
+        needed = needed[needed >= 0]
+        desc_emetteurs = np.empty(len(uniques) + 1, dtype=object)
+        desc_types = np.empty(len(uniques) + 1, dtype=object)
+        desc_emetteurs[-1], desc_types[-1] = INCONNU
+        if len(needed):
+            desc_emetteurs[needed], desc_types[needed] = _label_descriptions(
+                pd.Series(uniques[needed], dtype=object), issuer_table, cache, categorical=False)
+        desc_codes = np.where(desc_codes < 0, len(uniques), desc_codes)
+        codes = np.where(resolved, found, len(isin_index) + desc_codes)
+        emetteurs, types = expand_labels(
+            codes,
+            np.concatenate([isin_index.emetteurs, desc_emetteurs]),
+            np.concatenate([isin_index.types, desc_types]),
+            categorical=True,
+        )
+        sources = pd.Categorical.from_codes((~resolved).astype(np.int8),
+                                            categories=pd.Index([SOURCE_ISIN, SOURCE_MOTS_CLES]))
+    # assign ne copie pas les colonnes existantes (copy-on-write)
+    result = df.assign(Emetteur=emetteurs, Type_Emetteur=types, Source_Emetteur=sources)
+
+    return result
+
+
+def _label_descriptions(descriptions, issuer_table, cache, categorical=True):
+    if cache is not None:
+        return cache.label(descriptions, issuer_table, categorical=categorical)
+    matcher = issuer_table if isinstance(issuer_table, IssuerMatcher) else IssuerMatcher(issuer_table)
+    return matcher.label(descriptions, categorical=categorical)
+
+
+def issuer_sources(labeled):
+    """Part des positions résolues par chaque chemin : {'ISIN': 0.93, 'mots-clés': 0.07}"""
+    if labeled is None or len(labeled) == 0 or 'Source_Emetteur' not in labeled.columns:
+        return {}
+    counts = labeled['Source_Emetteur'].value_counts(normalize=True, sort=False)
+    return {source: round(float(share), 4) for source, share in counts.items()}
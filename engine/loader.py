@@ -0,0 +1,419 @@
+"""
+Chargement des classeurs FOND.xlsx (un onglet par fonds)
+"""
+
+import importlib.util
+import os
+import re
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from engine.cleaning import clean_numeric_series
+from engine.perf import stage, timed
+from engine.xlsx import UnsupportedSheet, XlsxReader, source as _source
+
+
+# =============================================================================
+# RÉFÉRENTIEL FONDS
+# =============================================================================
+
+FONDS_MAPPING = {
+    'Action': 'CFP',
+    'Diversifie': 'TIJ',
+    'OMLT': 'PRV',
+    'OCT': 'CLB',
+    'Monetaire': 'CCS'
+}
+
+ACTIF_NET_VALUES = {
+    'CFP': 276403573.05,
+    'CCS': 356674412.16,
+    'TIJ': 478502756.69,
+    'CLB': 1704711189.03,
+    'PRV': 708721589.76
+}
+
+POSITION_COLUMNS = ['Code_ISIN', 'Type', 'Description', 'Quantite',
+                    'Prix_revient', 'Valo_j', 'Prix_revient_global',
+                    'Valo_globale', 'Plus_moins_value']
+
+NUMERIC_COLUMNS = ['Quantite', 'Prix_revient', 'Valo_j', 'Prix_revient_global',
+                   'Valo_globale', 'Plus_moins_value']
+
+# Colonnes texte très répétitives : stockées en catégories (dictionnaire + codes entiers)
+CATEGORY_COLUMNS = ['Code_ISIN', 'Type', 'Description', 'Fonds', 'Emetteur', 'Type_Emetteur',
+                    'Source_Emetteur']
+
+# =============================================================================
+# LECTURE DU CLASSEUR
+# =============================================================================
+
+# Intitulés d'en-tête reconnus pour chaque rôle de colonne, après normalisation
+# (sans accents, minuscules, lettres, chiffres et '+'/'-' seulement) : les
+# extractions des dépositaires nomment et ordonnent leurs colonnes différemment.
+# Par rôle, des niveaux du plus précis au plus générique : 'Valorisation
+# globale' l'emporte sur 'Valorisation' (cours unitaire chez certains
+# dépositaires) quand les deux colonnes sont présentes.
+COLUMN_ALIASES = {
+    'Code_ISIN': [['isin', 'codeisin', 'isincode'], ['codevaleur']],
+    'Type': [['type', 'typeinstrument', 'typedinstrument', 'typevaleur'], ['categorie', 'classeactif']],
+    'Description': [['description', 'libelle', 'libellevaleur', 'designation'], ['valeur', 'instrument']],
+    'Quantite': [['quantite', 'qte'], ['nombre', 'nominal']],
+    'Prix_revient': [['prixrevient', 'prixderevient', 'pru'], ['coutunitaire']],
+    'Valo_j': [['valoj', 'coursj'], ['cours', 'prixdumarche', 'prixmarche']],
+    'Prix_revient_global': [['prixrevientglobal', 'prixderevientglobal'], ['coutglobal', 'couttotal']],
+    'Valo_globale': [['valoglobale', 'valorisationglobale'], ['valeurdemarche'],
+                     ['valorisation', 'montant', 'encours']],
+    'Plus_moins_value': [['+-value', '+-values', 'plusmoinsvalue', 'plusoumoinsvalue', 'pmv',
+                          '+-valuelatente', 'plusvaluelatente']],
+}
+REQUIRED_ROLES = ['Type', 'Description', 'Valo_globale']
+
+# Lignes examinées pour trouver l'en-tête (titres, dates d'arrêté au-dessus)
+HEAD_ROWS = 10
+
+# intitulé normalisé -> (rôle, niveau) ; niveau 0 = le plus précis
+_ALIAS_ROLES = {alias: (role, rank) for role, tiers in COLUMN_ALIASES.items()
+                for rank, aliases in enumerate(tiers) for alias in aliases}
+_NOT_HEADER_CHAR = re.compile(r'[^a-z0-9+-]')
+
+
+def available_engine():
+    """Moteur de lecture le plus rapide disponible (calamine si installé)"""
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return 'openpyxl'
+
+
+def normalize_header(value):
+    """Intitulé de colonne comparable : 'Prix de revient' -> 'prixderevient'"""
+    if not isinstance(value, str):
+        return ''
+    text = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode()
+    return _NOT_HEADER_CHAR.sub('', text.lower())
+
+
+def detect_layout(rows):
+    """(ligne d'en-tête, {rôle: colonne}) à partir des premières lignes d'un onglet
+
+    L'en-tête est la première ligne où Type, Description et Valo globale
+    sont reconnus (COLUMN_ALIASES), quelle que soit leur position. Chaque
+    rôle revient à la colonne de l'intitulé le plus précis ; deux colonnes
+    au même niveau pour un rôle lèvent ValueError plutôt que d'en retenir
+    une au hasard. À défaut d'en-tête, un onglet d'au moins 9 colonnes suit
+    la disposition historique (en-tête en première ligne, colonnes
+    POSITION_COLUMNS dans l'ordre). Renvoie None pour un onglet qui n'est
+    pas un portefeuille.
+    """
+    for number, row in enumerate(rows):
+        best, ties = {}, {}
+        for index, value in enumerate(row):
+            match = _ALIAS_ROLES.get(normalize_header(value))
+            if match is None:
+                continue
+            role, rank = match
+            if role not in best or rank < best[role][0]:
+                best[role] = (rank, index)
+                ties.pop(role, None)
+            elif rank == best[role][0]:
+                ties.setdefault(role, [best[role][1]]).append(index)
+        if all(role in best for role in REQUIRED_ROLES):
+            if ties:
+                raise ValueError('; '.join(
+                    f"colonnes {', '.join(repr(row[i]) for i in indices)} reconnues toutes comme {role}"
+                    for role, indices in ties.items()
+                ))
+            return number, {role: index for role, (_, index) in best.items()}
+    if max((len(row) for row in rows), default=0) >= len(POSITION_COLUMNS):
+        return 0, {role: index for index, role in enumerate(POSITION_COLUMNS)}
+    return None
+
+
+class _PandasBook:
+    """Même interface que XlsxReader, via pandas.read_excel (xls, ods, repli)"""
+
+    def __init__(self, file, engine):
+        self._xl = pd.ExcelFile(_source(file), engine=engine)
+        self.sheet_names = self._xl.sheet_names
+
+    def close(self):
+        self._xl.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def head(self, name, n_rows):
+        df = self._xl.parse(name, header=None, nrows=n_rows)
+        return [[None if pd.isna(v) else v for v in row] for row in df.itertuples(index=False)]
+
+    def columns(self, name, first_row, indices):
+        df = self._xl.parse(name, header=None, skiprows=first_row,
+                            usecols=lambda index: index in indices)
+        return {index: df[index].tolist() if index in df.columns else [None] * len(df)
+                for index in indices}
+
+
+class _Book:
+    """Lecture projetée d'un .xlsx, repli feuille par feuille sur pandas si besoin"""
+
+    def __init__(self, file, engine=None):
+        self._file = file
+        self._engine = engine or available_engine()
+        self._fallback = None
+        self._reader = None
+        if engine is None:
+            try:
+                self._reader = XlsxReader(file)
+            except (zipfile.BadZipFile, KeyError):
+                pass
+        if self._reader is None:
+            self._reader = self._pandas()
+        self.sheet_names = self._reader.sheet_names
+
+    def _pandas(self):
+        if self._fallback is None:
+            self._fallback = _PandasBook(self._file, self._engine)
+        return self._fallback
+
+    def close(self):
+        self._reader.close()
+        if self._fallback is not None and self._fallback is not self._reader:
+            self._fallback.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def read(self, name):
+        """Colonnes utiles de l'onglet renommées par rôle, ou None si ce n'est pas un portefeuille"""
+        try:
+            return _read_sheet(self._reader, name)
+        except UnsupportedSheet:
+            return _read_sheet(self._pandas(), name)
+
+
+def _read_sheet(book, name):
+    head = book.head(name, HEAD_ROWS)
+    try:
+        layout = detect_layout(head)
+    except ValueError as e:
+        raise ValueError(f"Onglet {name} : en-tête ambigu : {e}") from e
+    if layout is None:
+        return None
+    header, roles = layout
+    wanted = {role: roles[role] for role in POSITION_COLUMNS if role in roles}
+    values = book.columns(name, header + 1, sorted(set(wanted.values())))
+    n_rows = len(next(iter(values.values())))
+    return pd.DataFrame({
+        role: values[wanted[role]] if role in wanted else [None] * n_rows
+        for role in POSITION_COLUMNS
+    })
+
+
+def open_workbook(file, engine=None):
+    """Classeur ouvert une fois ; .read(onglet) renvoie les colonnes utiles de l'onglet
+
+    Sans `engine`, un .xlsx est lu par projection (engine.xlsx) : seules
+    les premières lignes de chaque onglet sont décodées pour trouver
+    l'en-tête et le rôle des colonnes (detect_layout), puis seules les
+    colonnes utiles du corps sont converties. Un onglet non reconnu est
+    écarté sans lire son corps. Avec `engine` ('openpyxl', 'calamine') ou
+    pour un autre format, pandas lit les mêmes colonnes.
+    """
+    return _Book(file, engine)
+
+
+def iter_sheets(file, engine=None):
+    """Ouvre le classeur une seule fois et produit (onglet, colonnes utiles ou None)
+
+    Toutes les feuilles sont lues depuis le même handle. Chaque feuille est
+    produite puis libérée avant la suivante ; les colonnes sont renommées
+    par rôle (POSITION_COLUMNS) et les lignes
+    commencent après l'en-tête.
+    """
+    with open_workbook(file, engine) as book:
+        for sheet_name in book.sheet_names:
+            with stage('lecture_onglet') as measured:
+                df = book.read(sheet_name)
+                measured.rows = 0 if df is None else len(df)
+            yield sheet_name, df
+
+
+def _positions_count(cleaned):
+    return 0 if cleaned[1] is None else len(cleaned[1])
+
+
+@timed('nettoyage', rows=_positions_count)
+def clean_sheet(sheet_name, df):
+    """Positions exploitables d'un onglet lu par iter_sheets : (fonds, positions ou None)"""
+    fonds_name = FONDS_MAPPING.get(sheet_name, sheet_name)
+    if df is None:
+        return fonds_name, None
+
+    df_clean = df.dropna(how='all')
+
+    if len(df_clean) > 0:
+        with stage('nettoyage_montants', rows=len(df_clean)):
+            for col in NUMERIC_COLUMNS:
+                df_clean[col] = clean_numeric_series(df_clean[col])
+        df_clean = df_clean[df_clean['Valo_globale'] > 0]
+
+        if len(df_clean) > 0:
+            return fonds_name, df_clean
+    return fonds_name, None
+
+
+def compact_positions(df):
+    """Colonnes texte de CATEGORY_COLUMNS en catégories ; les autres colonnes ne sont pas copiées"""
+    return df.assign(**{
+        col: df[col].astype('category') for col in CATEGORY_COLUMNS
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype)
+    })
+
+
+def assemble_portfolio(sheets):
+    """Concatène les (fonds, positions) dans l'ordre : (positions, actif_net_dict)
+
+    Les positions portent le fonds (catégorie) mais pas son actif net,
+    conservé une seule fois par fonds dans actif_net_dict.
+    """
+    all_data = []
+    fund_names = []
+    actif_net_dict = {}
+
+    for fonds_name, df_clean in sheets:
+        if df_clean is None:
+            continue
+        all_data.append(df_clean)
+        fund_names.append(fonds_name)
+        actif_net_dict[fonds_name] = ACTIF_NET_VALUES.get(fonds_name, 0)
+
+    if not all_data:
+        return None, None
+
+    portfolio = pd.concat(all_data, ignore_index=True)
+    # deux onglets peuvent désigner le même fonds (FONDS_MAPPING) : une catégorie par fonds
+    sheet_funds, funds = pd.factorize(pd.Index(fund_names))
+    codes = np.repeat(sheet_funds, [len(df) for df in all_data])
+    portfolio['Fonds'] = pd.Categorical.from_codes(codes, categories=funds)
+    return compact_positions(portfolio), actif_net_dict
+
+
+def apply_nav(portfolio, actif_net_values):
+    """Actifs nets d'une date de contrôle pour les fonds des positions : (positions, actif_net_dict)
+
+    Permet d'appliquer les actifs nets d'une date de contrôle à des positions
+    déjà chargées (ou relues du cache) sans relire le classeur : seul le
+    dictionnaire par fonds change, les positions sont renvoyées telles quelles.
+    """
+    if portfolio is None:
+        return None, None
+    actif_net_dict = {fonds: actif_net_values.get(fonds, 0) for fonds in portfolio['Fonds'].unique()}
+    return portfolio, actif_net_dict
+
+
+def read_portfolio(file, engine=None, workers=1):
+    """Charge le fichier Excel avec correction des noms de fonds
+
+    Retourne (positions, actif_net_dict) ou (None, None) si aucun onglet
+    exploitable. Les erreurs de lecture sont propagées à l'appelant.
+    Avec workers > 1, les onglets sont répartis entre plusieurs processus.
+    """
+    if workers and workers > 1:
+        return read_portfolios([file], workers=workers, engine=engine)
+    return assemble_portfolio(clean_sheet(name, df) for name, df in iter_sheets(file, engine))
+
+# =============================================================================
+# CHARGEMENT PARALLÈLE
+# =============================================================================
+
+def _pack(df):
+    """Positions -> colonnes compactes (codes entiers + dictionnaire pour le texte)"""
+    packed = {}
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS:
+            packed[col] = df[col].to_numpy(dtype=np.float64)
+        else:
+            codes, uniques = pd.factorize(df[col])
+            packed[col] = (codes.astype(np.int32), np.asarray(uniques, dtype=object))
+    return packed
+
+
+def _unpack(packed):
+    columns = {}
+    for col, values in packed.items():
+        if isinstance(values, tuple):
+            codes, uniques = values
+            # code -1 (valeur manquante) pointe sur le NaN ajouté en fin
+            values = np.append(uniques, np.nan)[codes]
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def _load_sheets(task):
+    """Tâche d'un processus : ouvre le classeur une fois, nettoie ses onglets"""
+    source, sheet_names, engine = task
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    results = []
+    with open_workbook(source, engine) as book:
+        for sheet_name in sheet_names:
+            fonds_name, df_clean = clean_sheet(sheet_name, book.read(sheet_name))
+            results.append((fonds_name, None if df_clean is None else _pack(df_clean)))
+    return results
+
+
+def read_portfolios(files, workers=None, engine=None):
+    """Charge plusieurs classeurs en répartissant les onglets sur un pool de processus
+
+    Chaque processus reçoit un lot d'onglets d'un même classeur, qu'il ouvre
+    une seule fois, et renvoie des colonnes compactes (float64, codes int32).
+    Les résultats sont assemblés dans l'ordre classeurs puis onglets : même
+    sortie que read_portfolio appliqué à la suite des classeurs.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    tasks = []
+    for file in files:
+        source = file if isinstance(file, (str, os.PathLike)) else _read_bytes(file)
+        with open_workbook(source, engine) as book:
+            sheet_names = book.sheet_names
+        batch = max(1, -(-len(sheet_names) // workers))
+        for start in range(0, len(sheet_names), batch):
+            tasks.append((source, sheet_names[start:start + batch], engine))
+
+    if workers == 1 or len(tasks) <= 1:
+        results = map(_load_sheets, tasks)
+        return _assemble_packed(results)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return _assemble_packed(pool.map(_load_sheets, tasks))
+
+
+def _read_bytes(file):
+    if isinstance(file, bytes):
+        return file
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+def _assemble_packed(results):
+    return assemble_portfolio(
+        (fonds_name, None if packed is None else _unpack(packed))
+        for batch in results
+        for fonds_name, packed in batch
+    )
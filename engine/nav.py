@@ -0,0 +1,151 @@
+"""
+Actifs nets des fonds par date de valorisation (base SQLite locale)
+"""
+
+import os
+import sqlite3
+import unicodedata
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+from engine.cleaning import clean_numeric_series
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS actif_net (
+    fonds TEXT NOT NULL,
+    date_valo TEXT NOT NULL,
+    actif_net REAL NOT NULL,
+    PRIMARY KEY (fonds, date_valo)
+) WITHOUT ROWID
+"""
+
+# Dernière valorisation à la date ou avant : parcours de l'index (fonds, date_valo)
+_LATEST = (
+    "SELECT actif_net FROM actif_net WHERE fonds = ? AND date_valo <= ? "
+    "ORDER BY date_valo DESC LIMIT 1"
+)
+
+# Noms de colonnes acceptés à l'import (après normalisation)
+_COLUMN_ALIASES = {
+    'fonds': 'fonds', 'fond': 'fonds', 'code_fonds': 'fonds', 'opcvm': 'fonds',
+    'date': 'date_valo', 'date_valo': 'date_valo', 'date_valorisation': 'date_valo',
+    'actif_net': 'actif_net', 'an': 'actif_net', 'actif_net_mad': 'actif_net',
+}
+
+
+def _normalize_column(name):
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode()
+    return '_'.join(name.strip().lower().replace('-', ' ').split())
+
+
+def _parse_dates(values):
+    """Dates d'import : cellules date Excel, texte ISO (AAAA-MM-JJ) ou texte jour en premier (JJ/MM/AAAA)
+
+    dayfirst ne s'applique qu'au texte non ISO : appliqué à '2026-01-05',
+    il lirait le 1er mai.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values)
+    text = values.astype(str).str.strip()
+    iso = text.str.match(r'\d{4}-').to_numpy(dtype=bool)
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    if iso.any():
+        dates[iso] = pd.to_datetime(text[iso], format='ISO8601')
+    if not iso.all():
+        dates[~iso] = pd.to_datetime(text[~iso], format='mixed', dayfirst=True)
+    return dates
+
+
+def iso_date(value):
+    """Date (date, datetime, Timestamp ou texte) au format AAAA-MM-JJ"""
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, date):
+        return value.isoformat()
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+class NavStore:
+    """Actifs nets indexés par (fonds, date de valorisation)
+
+    La clé primaire (fonds, date_valo) sert d'index : l'actif net d'un fonds
+    à une date est une recherche en O(log n), quelle que soit la profondeur
+    d'historique. À une date de contrôle donnée, on retient la dernière
+    valorisation connue à cette date ou avant.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as con:
+            con.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connexion le temps d'un bloc : transaction validée (ou annulée) puis connexion fermée"""
+        con = sqlite3.connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def upsert(self, rows):
+        """Insère ou remplace des (fonds, date, actif_net) ; renvoie le nombre de lignes"""
+        records = [(str(f), iso_date(d), float(v)) for f, d, v in rows]
+        with self._connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO actif_net (fonds, date_valo, actif_net) VALUES (?, ?, ?)",
+                records
+            )
+        return len(records)
+
+    def import_frame(self, df):
+        """Import en masse d'un tableau Fonds / Date / Actif net"""
+        df = df.rename(columns=lambda c: _COLUMN_ALIASES.get(_normalize_column(c), c))
+        missing = {'fonds', 'date_valo', 'actif_net'} - set(df.columns)
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {', '.join(sorted(missing))}")
+
+        df = df.dropna(subset=['fonds', 'date_valo'])
+        dates = _parse_dates(df['date_valo'])
+        values = clean_numeric_series(df['actif_net'])
+        return self.upsert(zip(df['fonds'].astype(str).str.strip(), dates, values))
+
+    def import_file(self, file):
+        """Import depuis un CSV ou un classeur Excel (premier onglet)"""
+        name = getattr(file, 'name', str(file)).lower()
+        if name.endswith(('.xlsx', '.xlsm', '.xls')):
+            df = pd.read_excel(file)
+        else:
+            df = pd.read_csv(file, sep=None, engine='python')
+        return self.import_frame(df)
+
+    def get(self, fonds, control_date):
+        """Dernier actif net de `fonds` à `control_date` ou avant (None si aucun)"""
+        with self._connect() as con:
+            row = con.execute(_LATEST, (fonds, iso_date(control_date))).fetchone()
+        return None if row is None else row[0]
+
+    def lookup(self, funds, control_date, fallback=None):
+        """{fonds: actif net} à la date de contrôle, fallback puis 0 si inconnu"""
+        fallback = fallback or {}
+        day = iso_date(control_date)
+        result = {}
+        with self._connect() as con:
+            for fonds in funds:
+                row = con.execute(_LATEST, (fonds, day)).fetchone()
+                result[fonds] = row[0] if row is not None else fallback.get(fonds, 0)
+        return result
+
+    def funds(self):
+        """Fonds présents et date de dernière valorisation"""
+        with self._connect() as con:
+            return pd.read_sql_query(
+                "SELECT fonds, MAX(date_valo) AS derniere_valo, COUNT(*) AS nb_valos "
+                "FROM actif_net GROUP BY fonds ORDER BY fonds", con
+            )
@@ -0,0 +1,198 @@
+"""
+Instrumentation : durée, lignes traitées et mémoire de chaque étape du contrôle
+
+Les étapes sont mesurées par un Profiler ; chaque mesure est conservée
+(tableau de performance) et émise en JSON sur le logger 'engine.perf'.
+Les points de mesure internes au moteur (lecture, nettoyage, émetteurs...)
+s'enregistrent dans le profileur de l'étape englobante : sans profileur
+actif, ils ne coûtent qu'une lecture de variable locale au thread.
+OPCVM_PERF=0 dans l'environnement désactive l'instrumentation à l'import :
+les fonctions décorées par timed() sont alors laissées telles quelles.
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+
+ENABLED = os.environ.get('OPCVM_PERF', '1').strip().lower() not in ('0', 'false', 'non', 'off')
+
+logger = logging.getLogger('engine.perf')
+
+_state = threading.local()
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss():
+    """Mémoire résidente du processus en octets (None si indisponible)
+
+    Lue dans /proc (Linux) : quelques microsecondes, sans le surcoût de
+    tracemalloc. Ailleurs, repli sur le pic ru_maxrss du module resource.
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# =============================================================================
+# PROFILEUR
+# =============================================================================
+
+class Profiler:
+    """Mesures par étape d'une exécution, dans l'ordre de fin d'étape
+
+    `enabled=False` : stage() renvoie un contexte vide partagé, rien n'est
+    mesuré. `memory` : variation de mémoire résidente par étape. `log` :
+    une ligne JSON par étape sur le logger 'engine.perf'. `context` : champs
+    ajoutés à chaque mesure (classeur, session...).
+    """
+
+    def __init__(self, enabled=True, memory=True, log=True, context=None):
+        self.enabled = enabled and ENABLED
+        self.memory = memory
+        self.log = log
+        self.context = dict(context or {})
+        self.records = []
+        self._depth = 0
+
+    def stage(self, name, rows=None):
+        """Contexte mesurant un bloc ; `rows` (ou `.rows` dans le bloc) : lignes traitées"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    @property
+    def timings(self):
+        """Durées des étapes de premier niveau, en secondes, dans l'ordre d'exécution"""
+        timings = {}
+        for record in self.records:
+            if record['niveau'] == 0:
+                timings[record['etape']] = timings.get(record['etape'], 0.0) + record['secondes']
+        return timings
+
+    def summary(self):
+        """Mesures regroupées par étape : appels, durée, lignes et mémoire cumulées"""
+        rows = {}
+        for record in self.records:
+            key = (record['niveau'], record['etape'])
+            row = rows.setdefault(key, {
+                'etape': record['etape'], 'niveau': record['niveau'], 'appels': 0,
+                'secondes': 0.0, 'lignes': None, 'memoire_mo': None,
+            })
+            row['appels'] += 1
+            row['secondes'] += record['secondes']
+            for field in ('lignes', 'memoire_mo'):
+                if record[field] is not None:
+                    row[field] = (row[field] or 0) + record[field]
+        # étapes englobantes avant leurs sous-étapes (une étape se termine après ses enfants)
+        order = {}
+        for record in self.records:
+            order.setdefault((record['niveau'], record['etape']), record['debut'])
+        return [rows[key] for key in sorted(rows, key=lambda k: (order[k], k[0]))]
+
+    def _record(self, record):
+        record.update(self.context)
+        self.records.append(record)
+        if self.log and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class _Stage:
+    """Bloc mesuré ; active son profileur pour le thread le temps du bloc"""
+
+    __slots__ = ('profiler', 'name', 'rows', 'start', 'wall', 'rss', 'depth', 'previous')
+
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.previous = getattr(_state, 'profiler', None)
+        _state.profiler = profiler
+        self.depth = profiler._depth
+        profiler._depth += 1
+        self.rss = rss() if profiler.memory else None
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler._depth -= 1
+        _state.profiler = self.previous
+        after = rss() if self.rss is not None else None
+        profiler._record({
+            'etape': self.name,
+            'niveau': self.depth,
+            'debut': self.wall,
+            'secondes': round(seconds, 6),
+            'lignes': None if self.rows is None else int(self.rows),
+            'memoire_mo': None if after is None else round((after - self.rss) / 2**20, 3),
+            'statut': 'ok' if exc_type is None else 'erreur',
+        })
+        return False
+
+
+class _NullStage:
+    """Contexte sans effet (instrumentation désactivée) ; `.rows` est ignoré"""
+
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+# =============================================================================
+# POINTS DE MESURE DU MOTEUR
+# =============================================================================
+
+def stage(name, rows=None):
+    """Étape mesurée par le profileur actif du thread (contexte vide sans profileur)"""
+    profiler = getattr(_state, 'profiler', None)
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name, rows)
+
+
+def timed(name, rows=None):
+    """Décorateur : chaque appel est une étape `name` du profileur actif
+
+    `rows` : fonction du résultat donnant le nombre de lignes traitées.
+    Avec OPCVM_PERF=0, la fonction est renvoyée sans enveloppe.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = getattr(_state, 'profiler', None)
+            if profiler is None or not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.stage(name) as measured:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    measured.rows = rows(result)
+                return result
+        return wrapper
+    return decorate
@@ -0,0 +1,239 @@
+"""
+Chaîne de contrôle complète : chargement -> émetteurs -> ratios -> règle 45% -> rapport
+"""
+
+from datetime import date
+
+import pandas as pd
+
+from engine.cache import issuer_table_hash
+from engine.exposure import ExposureMatrix
+from engine.issuers import add_issuers, default_issuer_table, issuer_sources
+from engine.loader import ACTIF_NET_VALUES, apply_nav, read_portfolio
+from engine.perf import Profiler, stage
+from engine.ratios import (
+    aggregate_exposures,
+    apply_ceilings,
+    assign_groups,
+    calculate_group_ratios,
+    calculate_issuer_ratios,
+    check_45_percent_rule,
+)
+from engine.report import build_report_sheets, compute_kpis, write_report
+
+
+DEFAULT_PARAMS = {
+    'plafond_etat': 1.0,
+    'plafond_action_eligible': 0.15,
+    'plafond_standard': 0.10,
+    'actions_eligibles_15pct': ['ATW', 'IAM', 'BCP', 'BOA'],
+    'seuil_45': 0.45,
+    'seuil_emetteur_45': 0.10,
+    'plafond_groupe': 0.20,
+}
+
+# Émetteurs de l'onglet Societe du rapport (classement par exposition totale)
+REPORT_TOP_ISSUERS = 50
+
+
+class StagedControl:
+    """Contrôle recalculé par étapes, chacune indexée sur ses propres entrées
+
+    positions -> émetteurs -> agrégats (Fonds, Emetteur) -> plafonds -> règle 45%,
+    et groupes (Fonds, Groupe) avec une hiérarchie d'émetteurs ; la matrice
+    fonds x émetteurs (vues société de gestion) suit les agrégats.
+    Une étape n'est recalculée que si sa clé change : modifier un plafond ou
+    la liste des actions éligibles ne réévalue que les colonnes vectorisées
+    de conformité, sans ré-identifier les émetteurs ni regrouper les positions.
+    Un seul résultat est conservé par étape (un objet par session).
+    """
+
+    STAGES = ('emetteurs', 'agregats', 'societe', 'plafonds', 'regle_45', 'groupes')
+
+    def __init__(self, issuer_cache=None):
+        self.issuer_cache = issuer_cache
+        self.recomputed = []
+        self.group_ratios = None
+        self.exposure = None
+        self._slots = {}
+
+    def _stage(self, name, key, compute):
+        slot = self._slots.get(name)
+        if slot is not None and slot[0] == key:
+            return slot[1]
+        with stage(name) as measured:
+            value = compute()
+            measured.rows = _count(value)
+        self._slots[name] = (key, value)
+        self.recomputed.append(name)
+        return value
+
+    def clear(self):
+        self._slots.clear()
+
+    def run(self, portfolio_key, portfolio, actif_net_dict, issuer_table, params, isin_index=None,
+            groups=None):
+        """(portefeuille enrichi, ratios, règle 45%) ; self.recomputed liste les étapes refaites
+
+        `portfolio_key` identifie les positions (empreinte du classeur par
+        exemple) : c'est lui, et non le contenu du DataFrame, qui sert de clé.
+        `isin_index` : IsinIndex consulté avant les mots-clés (add_issuers).
+        `groups` : IssuerGroups ; les ratios portent alors la colonne Groupe
+        et self.group_ratios les ratios par groupe (None sans hiérarchie).
+        self.exposure : ExposureMatrix des agrégats (None sans position).
+        """
+        params = {**DEFAULT_PARAMS, **(params or {})}
+        self.recomputed = []
+
+        labels_key = (portfolio_key, issuer_table_hash(issuer_table),
+                      None if isin_index is None else isin_index.fingerprint)
+        labeled = self._stage('emetteurs', labels_key, lambda: add_issuers(
+            portfolio, issuer_table, cache=self.issuer_cache, isin_index=isin_index))
+
+        exposures_key = (labels_key, tuple(sorted(actif_net_dict.items())))
+        exposures = self._stage('agregats', exposures_key, lambda: aggregate_exposures(
+            labeled, actif_net_dict) if len(labeled) and actif_net_dict else None)
+        self.exposure = self._stage('societe', exposures_key, lambda: ExposureMatrix.from_ratios(
+            exposures) if exposures is not None and len(exposures) else None)
+
+        ceilings_key = (exposures_key, params['plafond_etat'], params['plafond_action_eligible'],
+                        params['plafond_standard'], tuple(params['actions_eligibles_15pct']),
+                        None if groups is None else groups.fingerprint)
+        ratios_df = self._stage('plafonds', ceilings_key, lambda: _grouped(apply_ceilings(
+            exposures, params), groups) if exposures is not None and len(exposures) else pd.DataFrame())
+
+        rule_45_key = (ceilings_key, params['seuil_45'], params['seuil_emetteur_45'])
+        rule_45_df = self._stage('regle_45', rule_45_key, lambda: check_45_percent_rule(
+            ratios_df, labeled, actif_net_dict, params['seuil_45'],
+            seuil_emetteur=params['seuil_emetteur_45']))
+
+        self.group_ratios = None if groups is None else self._stage(
+            'groupes', (ceilings_key, params['plafond_groupe']),
+            lambda: calculate_group_ratios(ratios_df, params))
+
+        return labeled, ratios_df, rule_45_df
+
+
+def _grouped(ratios_df, groups):
+    return ratios_df if groups is None else assign_groups(ratios_df, groups)
+
+
+def _count(value):
+    """Lignes d'un résultat d'étape (None si ce n'est pas un tableau)"""
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+
+def run_control(file, issuer_table=None, params=None, control_date=None,
+                issuer_cache=None, report=None, workers=1, portfolio_cache=None,
+                nav_store=None, history=None, delta=None, profiler=None, isin_index=None,
+                groups=None):
+    """Exécute le contrôle sur un classeur FOND.xlsx
+
+    `report` : chemin ou buffer où écrire le rapport Excel (aucun si None).
+    `workers` : nombre de processus pour la lecture des onglets.
+    `portfolio_cache` : PortfolioCache évitant de re-parser un classeur connu.
+    `nav_store` : NavStore fournissant les actifs nets à la date de contrôle
+    (à défaut, ou pour un fonds absent, les valeurs par défaut du chargeur).
+    `history` : HistoryStore où enregistrer les ratios et la règle 45%.
+    `delta` : DeltaControl ; seuls les onglets et fonds modifiés depuis son
+    contrôle précédent sont retraités (l'état est sauvegardé en fin de run).
+    `profiler` : Profiler recevant les mesures de chaque étape et sous-étape
+    (par défaut, durées seules, sans mémoire ni log).
+    `isin_index` : IsinIndex ; les positions dont l'ISIN y figure sont
+    résolues par jointure, les autres par mots-clés.
+    `groups` : IssuerGroups ; les ratios portent la tête de groupe de chaque
+    émetteur et group_ratios donne les ratios par (Fonds, Groupe).
+    Renvoie un dict : portfolio, actif_net_dict, ratios, rule_45, kpis,
+    group_ratios, exposure (ExposureMatrix fonds x émetteurs), report, sources (part des positions résolues par ISIN et par mots-clés),
+    timings, perf (mesures regroupées par étape) et, avec delta, le
+    détail fonds réutilisés / recalculés.
+    portfolio vaut None si aucun onglet exploitable.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    issuer_table = default_issuer_table() if issuer_table is None else issuer_table
+    control_date = control_date or date.today()
+    profiler = profiler or Profiler(memory=False, log=False)
+
+    with profiler.stage('chargement') as measured:
+        if delta is not None:
+            portfolio, actif_net_dict = delta.load(file)
+        elif portfolio_cache is not None:
+            portfolio, actif_net_dict = portfolio_cache.load(file, read_portfolio, workers=workers)
+        else:
+            portfolio, actif_net_dict = read_portfolio(file, workers=workers)
+        measured.rows = _count(portfolio)
+
+    if nav_store is not None and portfolio is not None:
+        with profiler.stage('actifs_nets', rows=len(portfolio)):
+            nav = nav_store.lookup(portfolio['Fonds'].unique(), control_date, fallback=ACTIF_NET_VALUES)
+            portfolio, actif_net_dict = apply_nav(portfolio, nav)
+
+    result = {
+        'portfolio': portfolio,
+        'actif_net_dict': actif_net_dict,
+        'ratios': None,
+        'rule_45': None,
+        'kpis': None,
+        'group_ratios': None,
+        'exposure': None,
+        'report': None,
+        'sources': {},
+    }
+    if portfolio is None:
+        return _finish(result, profiler)
+
+    if delta is not None:
+        with profiler.stage('delta', rows=len(portfolio)):
+            portfolio, ratios_df, rule_45_df = delta.compute(portfolio, actif_net_dict, issuer_table, params,
+                                                                isin_index=isin_index)
+            ratios_df = _grouped(ratios_df, groups)
+            delta.save()
+        result['delta'] = delta.summary()
+    else:
+        with profiler.stage('emetteurs', rows=len(portfolio)):
+            portfolio = add_issuers(portfolio, issuer_table, cache=issuer_cache, isin_index=isin_index)
+
+        with profiler.stage('ratios') as measured:
+            ratios_df = calculate_issuer_ratios(portfolio, actif_net_dict, params, groups=groups)
+            measured.rows = len(ratios_df)
+
+        with profiler.stage('regle_45') as measured:
+            rule_45_df = check_45_percent_rule(ratios_df, portfolio, actif_net_dict, params['seuil_45'],
+                                               seuil_emetteur=params['seuil_emetteur_45'])
+            measured.rows = len(rule_45_df)
+
+    result.update(portfolio=portfolio, ratios=ratios_df, rule_45=rule_45_df,
+                  sources=issuer_sources(portfolio))
+    if len(ratios_df) == 0:
+        return _finish(result, profiler)
+
+    result['kpis'] = compute_kpis(ratios_df)
+
+    if groups is not None:
+        with profiler.stage('groupes') as measured:
+            result['group_ratios'] = calculate_group_ratios(ratios_df, params)
+            measured.rows = len(result['group_ratios'])
+
+    with profiler.stage('societe') as measured:
+        result['exposure'] = ExposureMatrix.from_ratios(ratios_df)
+        measured.rows = result['exposure'].nnz
+
+    if history is not None:
+        with profiler.stage('historique', rows=len(ratios_df)):
+            history.record(control_date, ratios_df, rule_45_df)
+
+    if report is not None:
+        with profiler.stage('export', rows=len(ratios_df)):
+            sheets = build_report_sheets(ratios_df, rule_45_df, actif_net_dict,
+                                         control_date, result['kpis'], delta=result.get('delta'),
+                                         group_ratios=result['group_ratios'],
+                                         top_issuers=result['exposure'].top_issuers(REPORT_TOP_ISSUERS))
+            result['report'] = write_report(sheets, report)
+
+    return _finish(result, profiler)
+
+
+def _finish(result, profiler):
+    """Ajoute au résultat les durées par étape et les mesures regroupées"""
+    result.update(timings=profiler.timings, perf=profiler.summary())
+    return result
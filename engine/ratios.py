@@ -0,0 +1,231 @@
+"""
+Calcul des ratios émetteurs par fonds (CDVM Circulaire n°01-09 - Article 6)
+"""
+
+import numpy as np
+import pandas as pd
+
+from engine.perf import timed
+
+
+ETAT_MAROCAIN = 'État marocain'
+TOLERANCE = 0.0001
+
+RATIO_COLUMNS = ['Fonds', 'Emetteur', 'Type', 'Montant_MAD', 'Actif_Net_MAD',
+                 'Ratio', 'Ratio_%', 'Plafond', 'Plafond_%', 'Conformite', 'Ecart_%']
+
+
+def format_pct(values, decimals):
+    """f"{x:.{decimals}%}" sur tout un tableau (libellés d'affichage)"""
+    spec = f'.{decimals}%'
+    return np.array([format(v, spec) for v in np.asarray(values, dtype=float).tolist()], dtype=object)
+
+
+def within_limit(ratio, plafond):
+    """Ratio au plus égal à plafond + TOLERANCE
+
+    Comparaison de l'écart, avec une marge d'arrondi binaire : en flottants,
+    0.1501 > 0.15 + 0.0001 alors que l'écart vaut bien la tolérance.
+    """
+    return np.asarray(ratio) - np.asarray(plafond) <= TOLERANCE + 1e-12
+
+
+def conformity(ratio, plafond):
+    """'✅' si le ratio respecte le plafond (à la tolérance près), sinon '❌'"""
+    return np.where(within_limit(ratio, plafond), '✅', '❌').astype(object)
+
+# =============================================================================
+# CALCUL DES RATIOS
+# =============================================================================
+
+@timed('agregation', rows=len)
+def aggregate_exposures(df, actif_net_dict):
+    """Agrège les positions par (Fonds, Emetteur) pour les fonds d'actif net > 0
+
+    Une ligne par couple, fonds dans l'ordre d'apparition et émetteurs triés :
+    Montant_MAD, Type (premier type émetteur), Is_Action (au moins une ligne
+    dont le Type contient 'ACTION') et Actif_Net_MAD.
+    """
+    # Actif net lu une fois par fonds (colonnes texte éventuellement catégorielles)
+    fund_codes, funds = pd.factorize(df['Fonds'])
+    funds = pd.Index(np.asarray(funds, dtype=object))
+    fund_nav = np.append([actif_net_dict.get(fonds, 0) for fonds in funds], 0).astype(float)
+    keep = fund_nav[fund_codes] > 0
+    data = df.loc[keep, ['Emetteur', 'Type_Emetteur', 'Type', 'Valo_globale']]
+
+    # Clés entières : ordre d'apparition des fonds, ordre alphabétique des émetteurs
+    fund_codes, funds = pd.factorize(funds.take(fund_codes[keep]))
+    issuer_codes, issuers = pd.factorize(np.asarray(data['Emetteur'], dtype=object), sort=True)
+    type_codes, types = pd.factorize(data['Type'], use_na_sentinel=False)
+    action_types = pd.Series(types).astype(str).str.upper().str.contains('ACTION', regex=False, na=False)
+
+    grouped = pd.DataFrame({
+        'Fonds': fund_codes,
+        'Emetteur': issuer_codes,
+        'Valo_globale': data['Valo_globale'].to_numpy(),
+        'Type_Emetteur': data['Type_Emetteur'].to_numpy(),
+        'Is_Action': action_types.to_numpy(dtype=bool)[type_codes],
+    })
+    grouped = grouped[grouped['Emetteur'] >= 0].groupby(['Fonds', 'Emetteur'], sort=True).agg(
+        Montant_MAD=('Valo_globale', 'sum'),
+        Type=('Type_Emetteur', 'first'),
+        Is_Action=('Is_Action', 'any'),
+    ).reset_index()
+
+    grouped['Fonds'] = funds.take(grouped['Fonds'])
+    grouped['Emetteur'] = issuers.take(grouped['Emetteur'])
+    grouped['Actif_Net_MAD'] = grouped['Fonds'].map(actif_net_dict)
+    return grouped[['Fonds', 'Emetteur', 'Type', 'Montant_MAD', 'Actif_Net_MAD', 'Is_Action']]
+
+
+def apply_ceilings(exposures, params):
+    """Plafond, conformité et écart pour chaque (Fonds, Emetteur) agrégé"""
+    emetteur = exposures['Emetteur']
+    ratio = exposures['Montant_MAD'] / exposures['Actif_Net_MAD']
+
+    is_public = (emetteur == ETAT_MAROCAIN) | (exposures['Type'] == 'public')
+    is_eligible = exposures['Is_Action'] & emetteur.isin(params.get('actions_eligibles_15pct', []))
+    plafond = np.select(
+        [is_public.to_numpy(dtype=bool), is_eligible.to_numpy(dtype=bool)],
+        [params.get('plafond_etat', 1.0), params.get('plafond_action_eligible', 0.15)],
+        default=params.get('plafond_standard', 0.10),
+    )
+
+    return pd.DataFrame({
+        'Fonds': exposures['Fonds'],
+        'Emetteur': emetteur,
+        'Type': exposures['Type'],
+        'Montant_MAD': exposures['Montant_MAD'],
+        'Actif_Net_MAD': exposures['Actif_Net_MAD'],
+        'Ratio': ratio,
+        'Ratio_%': format_pct(ratio, 2),
+        'Plafond': plafond,
+        'Plafond_%': format_pct(plafond, 0),
+        'Conformite': conformity(ratio, plafond),
+        'Ecart_%': (ratio - plafond) * 100,
+    }, columns=RATIO_COLUMNS)
+
+
+def calculate_issuer_ratios(df, actif_net_dict, params, groups=None):
+    """Calcule les ratios par fonds et émetteur
+
+    Avec `groups` (IssuerGroups), une colonne Groupe donne la tête de
+    groupe de chaque émetteur : calculate_group_ratios en déduit les
+    ratios par groupe.
+    """
+    if df is None or len(df) == 0 or not actif_net_dict:
+        return pd.DataFrame()
+
+    exposures = aggregate_exposures(df, actif_net_dict)
+    if len(exposures) == 0:
+        return pd.DataFrame()
+
+    ratios_df = apply_ceilings(exposures, params)
+    return ratios_df if groups is None else assign_groups(ratios_df, groups)
+
+# =============================================================================
+# RATIOS PAR GROUPE
+# =============================================================================
+
+GROUP_RATIO_COLUMNS = ['Fonds', 'Groupe', 'Type', 'Montant_MAD', 'Actif_Net_MAD', 'Ratio', 'Ratio_%',
+                       'Plafond', 'Plafond_%', 'Conformite', 'Ecart_%', 'Nb_Emetteurs']
+
+
+def assign_groups(ratios_df, groups):
+    """Ratios émetteurs avec la colonne Groupe (tête de groupe de chaque émetteur)"""
+    if ratios_df is None or len(ratios_df) == 0:
+        return ratios_df
+    position = ratios_df.columns.get_loc('Emetteur') + 1
+    ratios_df = ratios_df.drop(columns='Groupe', errors='ignore')
+    ratios_df.insert(position, 'Groupe', groups.group_of(ratios_df['Emetteur']))
+    return ratios_df
+
+
+@timed('agregation_groupes', rows=len)
+def calculate_group_ratios(ratios_df, params):
+    """Ratios par (Fonds, Groupe) à partir des ratios émetteurs portant la colonne Groupe
+
+    Un seul regroupement vectorisé des montants déjà agrégés par émetteur.
+    Plafond : celui de l'État pour un groupe dont tous les émetteurs sont
+    publics, plafond_groupe sinon ; une entité publique ne relève pas le
+    plafond de ses filiales privées.
+    """
+    if ratios_df is None or len(ratios_df) == 0 or 'Groupe' not in ratios_df.columns:
+        return pd.DataFrame(columns=GROUP_RATIO_COLUMNS)
+
+    # clés entières (ordre d'apparition) : regroupement sans comparaison de chaînes
+    fund_codes, funds = pd.factorize(ratios_df['Fonds'])
+    group_codes, group_names = pd.factorize(ratios_df['Groupe'])
+    grouped = pd.DataFrame({
+        'Fonds': fund_codes,
+        'Groupe': group_codes,
+        'Montant_MAD': ratios_df['Montant_MAD'].to_numpy(),
+        'Actif_Net_MAD': ratios_df['Actif_Net_MAD'].to_numpy(),
+        'Public': ((ratios_df['Emetteur'] == ETAT_MAROCAIN) | (ratios_df['Type'] == 'public')).to_numpy(),
+    }).groupby(['Fonds', 'Groupe'], sort=False).agg(
+        Montant_MAD=('Montant_MAD', 'sum'),
+        Actif_Net_MAD=('Actif_Net_MAD', 'first'),
+        Public=('Public', 'all'),
+        Nb_Emetteurs=('Montant_MAD', 'size'),
+    ).reset_index()
+    grouped['Fonds'] = np.asarray(funds, dtype=object)[grouped['Fonds']]
+    grouped['Groupe'] = np.asarray(group_names, dtype=object)[grouped['Groupe']]
+
+    ratio = grouped['Montant_MAD'] / grouped['Actif_Net_MAD']
+    plafond = np.where(grouped['Public'], params.get('plafond_etat', 1.0), params.get('plafond_groupe', 0.20))
+    return pd.DataFrame({
+        'Fonds': grouped['Fonds'],
+        'Groupe': grouped['Groupe'],
+        'Type': np.where(grouped['Public'], 'public', 'privé').astype(object),
+        'Montant_MAD': grouped['Montant_MAD'],
+        'Actif_Net_MAD': grouped['Actif_Net_MAD'],
+        'Ratio': ratio,
+        'Ratio_%': format_pct(ratio, 2),
+        'Plafond': plafond,
+        'Plafond_%': format_pct(plafond, 0),
+        'Conformite': conformity(ratio, plafond),
+        'Ecart_%': (ratio - plafond) * 100,
+        'Nb_Emetteurs': grouped['Nb_Emetteurs'],
+    }, columns=GROUP_RATIO_COLUMNS)
+
+# =============================================================================
+# RÈGLE DES 45%
+# =============================================================================
+
+RULE_45_COLUMNS = ['Fonds', 'Total_>10%_MAD', 'Actif_Net_MAD', 'Ratio_45%', 'Ratio_%',
+                   'Seuil', 'Seuil_%', 'Conformite', 'Nb_Emetteurs']
+
+
+def check_45_percent_rule(ratios_df, portfolio_df, actif_net_dict, seuil=0.45,
+                          seuil_emetteur=0.10, exclus=(ETAT_MAROCAIN,)):
+    """Vérifie la règle des 45% pour les actions
+
+    Somme, par fonds, des montants des émetteurs dont le ratio dépasse
+    seuil_emetteur (hors émetteurs de `exclus`), rapportée à l'actif net.
+    """
+    if ratios_df is None or len(ratios_df) == 0 or 'Fonds' not in ratios_df.columns:
+        return pd.DataFrame()
+
+    fund_codes, funds = pd.factorize(ratios_df['Fonds'])
+    actif_net = pd.Series(funds).map(actif_net_dict).fillna(0).to_numpy()
+
+    above = ((ratios_df['Ratio'] > seuil_emetteur) & ~ratios_df['Emetteur'].isin(list(exclus))).to_numpy()
+    total = np.bincount(fund_codes[above], weights=ratios_df['Montant_MAD'].to_numpy()[above],
+                        minlength=len(funds))
+    count = np.bincount(fund_codes[above], minlength=len(funds))
+
+    keep = actif_net > 0
+    total, count, actif_net = total[keep], count[keep], actif_net[keep]
+    ratio_45 = total / actif_net
+
+    return pd.DataFrame({
+        'Fonds': funds[keep],
+        'Total_>10%_MAD': total,
+        'Actif_Net_MAD': actif_net,
+        'Ratio_45%': ratio_45,
+        'Ratio_%': format_pct(ratio_45, 2),
+        'Seuil': seuil,
+        'Seuil_%': f"{seuil:.0%}",
+        'Conformite': conformity(ratio_45, seuil),
+        'Nb_Emetteurs': count,
+    }, columns=RULE_45_COLUMNS)
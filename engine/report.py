@@ -0,0 +1,164 @@
+"""
+Indicateurs de synthèse et rapport Excel du contrôle
+"""
+
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+
+from engine.perf import timed
+from engine.ratios import ETAT_MAROCAIN
+
+
+# =============================================================================
+# INDICATEURS
+# =============================================================================
+
+def compute_kpis(ratios_df):
+    """Indicateurs du tableau de bord à partir des ratios"""
+    total = len(ratios_df)
+    conformes = int((ratios_df['Conformite'] == '✅').sum())
+    non_conformes = int((ratios_df['Conformite'] == '❌').sum())
+    return {
+        'total': total,
+        'conformes': conformes,
+        'non_conformes': non_conformes,
+        'taux_conformite': conformes / total * 100 if total > 0 else 0,
+        'nb_etat': int((ratios_df['Emetteur'] == ETAT_MAROCAIN).sum()),
+        'nb_prive': int((ratios_df['Type'] == 'privé').sum()),
+    }
+
+
+def summarize_breaches(ratios_df, by='Fonds'):
+    """Dépassements regroupés par fonds (ou par émetteur avec by='Emetteur')
+
+    Une ligne par groupe : nombre de dépassements, montant concerné, pire
+    écart et contrepartie (émetteur ou fonds) de ce pire écart ; groupes
+    classés du pire écart au moindre.
+    """
+    other = 'Emetteur' if by == 'Fonds' else 'Fonds'
+    breaches = ratios_df[ratios_df['Conformite'] == '❌']
+    summary = breaches.groupby(by, sort=False).agg(**{
+        'Nb_Depassements': (other, 'size'),
+        'Montant_MAD': ('Montant_MAD', 'sum'),
+        'Ecart_max_%': ('Ecart_%', 'max'),
+    })
+    worst = breaches.sort_values('Ecart_%', ascending=False, kind='stable').drop_duplicates(by)
+    summary[f'Pire_{other}'] = worst.set_index(by)[other]
+    return summary.sort_values('Ecart_max_%', ascending=False, kind='stable').reset_index()
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+# Style d'en-tête de pandas.to_excel
+_HEADER_FONT = Font(bold=True)
+_HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+
+def build_report_sheets(ratios_df, rule_45_df, actif_net_dict, control_date, kpis=None, delta=None,
+                        group_ratios=None, top_issuers=None):
+    """Onglets du rapport : Ratios, Regle_45, Alertes (si besoin), Synthese
+
+    Avec `delta` (DeltaControl.summary()), un onglet Delta indique pour
+    chaque fonds si son résultat a été recalculé ou repris du contrôle
+    précédent. Avec `group_ratios` (calculate_group_ratios), un onglet
+    Groupes donne les ratios des groupes de plusieurs émetteurs. Avec
+    `top_issuers` (ExposureMatrix.top_issuers), un onglet Societe classe les
+    émetteurs par exposition totale, tous fonds confondus.
+    """
+    kpis = kpis or compute_kpis(ratios_df)
+    non_conformes = ratios_df[ratios_df['Conformite'] == '❌']
+
+    export_dict = {
+        'Ratios': ratios_df,
+        'Regle_45': rule_45_df
+    }
+
+    if len(non_conformes) > 0:
+        export_dict['Alertes'] = non_conformes
+
+    if group_ratios is not None:
+        export_dict['Groupes'] = group_ratios[group_ratios['Nb_Emetteurs'] > 1]
+
+    if top_issuers is not None:
+        export_dict['Societe'] = top_issuers
+
+    summary_data = {
+        'Indicateur': [
+            'Date du contrôle',
+            'Ratios analysés',
+            'Conformes',
+            'Non-conformes',
+            'Taux conformité',
+            'Positions État',
+            'Positions privées',
+            'Fonds'
+        ],
+        'Valeur': [
+            control_date.strftime('%d/%m/%Y'),
+            kpis['total'],
+            kpis['conformes'],
+            kpis['non_conformes'],
+            f"{kpis['taux_conformite']:.1f}%",
+            kpis['nb_etat'],
+            kpis['nb_prive'],
+            len(actif_net_dict)
+        ]
+    }
+    export_dict['Synthese'] = pd.DataFrame(summary_data)
+
+    if delta is not None:
+        export_dict['Delta'] = pd.DataFrame({
+            'Fonds': delta['fonds_recalcules'] + delta['fonds_reutilises'],
+            'Statut': ['recalculé'] * len(delta['fonds_recalcules'])
+                      + ['réutilisé'] * len(delta['fonds_reutilises']),
+        })
+    return export_dict
+
+
+REPORT_BLOCK_ROWS = 10_000
+
+
+def _header_cell(ws, value):
+    cell = WriteOnlyCell(ws, value=str(value))
+    cell.font = _HEADER_FONT
+    cell.alignment = _HEADER_ALIGNMENT
+    return cell
+
+
+def _rows(df, block_rows=REPORT_BLOCK_ROWS):
+    """Lignes du tableau par blocs : seules block_rows lignes sont converties à la fois"""
+    for start in range(0, len(df), block_rows):
+        block = df.iloc[start:start + block_rows]
+        columns = []
+        for _, values in block.items():
+            values = values.to_numpy(dtype=object, copy=True)
+            values[pd.isna(values)] = None
+            columns.append(values.tolist())
+        yield from zip(*columns)
+
+
+@timed('ecriture_xlsx')
+def write_report(export_dict, output=None):
+    """Écrit les onglets dans un classeur (chemin ou buffer) ; renvoie la sortie
+
+    Classeur openpyxl en écriture seule : les lignes partent sur disque au
+    fil de l'eau, la mémoire reste constante quelle que soit la taille des
+    onglets.
+    """
+    if output is None:
+        output = BytesIO()
+    wb = Workbook(write_only=True)
+    for sheet_name, df in export_dict.items():
+        ws = wb.create_sheet(title=sheet_name[:31])
+        ws.append([_header_cell(ws, column) for column in df.columns])
+        for row in _rows(df):
+            ws.append(row)
+    wb.save(output)
+    if isinstance(output, BytesIO):
+        output.seek(0)
+    return output
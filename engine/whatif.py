@@ -0,0 +1,127 @@
+"""
+Simulation pré-trade : effet d'ordres hypothétiques sur les plafonds émetteurs et la règle des 45%
+"""
+
+import numpy as np
+import pandas as pd
+
+from engine.ratios import ETAT_MAROCAIN, within_limit
+
+
+ORDER_COLUMNS = ['Fonds', 'Emetteur', 'Montant_MAD', 'Est_Action']
+
+
+class ExposureState:
+    """Expositions par (fonds, émetteur) et somme des émetteurs au-delà du seuil, par fonds
+
+    Construit une fois à partir des ratios calculés ; un ordre ne touche que
+    l'exposition de son couple et l'agrégat 45% de son fonds (O(1)).
+    check() évalue un ordre sans le comptabiliser, apply() l'enregistre,
+    check_batch() évalue des milliers d'ordres indépendants en une passe.
+    """
+
+    def __init__(self, ratios_df, actif_net_dict, params, exclus=(ETAT_MAROCAIN,)):
+        self.params = params
+        self.seuil_45 = params.get('seuil_45', 0.45)
+        self.seuil_emetteur = params.get('seuil_emetteur_45', 0.10)
+        self.exclus = set(exclus)
+        self.actif_net = {fonds: float(actif) for fonds, actif in actif_net_dict.items() if actif > 0}
+
+        self._montant = dict(zip(zip(ratios_df['Fonds'], ratios_df['Emetteur']),
+                                 ratios_df['Montant_MAD'].astype(float)))
+        self._plafond = dict(zip(zip(ratios_df['Fonds'], ratios_df['Emetteur']),
+                                 ratios_df['Plafond'].astype(float)))
+        self._public = set(ratios_df.loc[ratios_df['Type'] == 'public', 'Emetteur'])
+        self._above = dict.fromkeys(self.actif_net, 0.0)
+        for (fonds, emetteur), montant in self._montant.items():
+            if self._counts(fonds, emetteur, montant):
+                self._above[fonds] += montant
+
+    def _counts(self, fonds, emetteur, montant):
+        """Le couple entre-t-il dans l'agrégat 45% du fonds ?"""
+        return emetteur not in self.exclus and montant / self.actif_net[fonds] > self.seuil_emetteur
+
+    def _ceiling(self, fonds, emetteur, est_action):
+        """Plafond du couple ; un achat d'actions d'un émetteur éligible relève le plafond"""
+        if emetteur == ETAT_MAROCAIN or emetteur in self._public:
+            return self.params.get('plafond_etat', 1.0)
+        plafond = self._plafond.get((fonds, emetteur), self.params.get('plafond_standard', 0.10))
+        if est_action and emetteur in self.params.get('actions_eligibles_15pct', []):
+            plafond = max(plafond, self.params.get('plafond_action_eligible', 0.15))
+        return plafond
+
+    def check(self, fonds, emetteur, montant, est_action=False):
+        """Ratios avant/après un ordre de `montant` MAD (négatif pour une vente)"""
+        if fonds not in self.actif_net:
+            raise KeyError(f"Fonds sans actif net : {fonds}")
+        actif_net = self.actif_net[fonds]
+        avant = self._montant.get((fonds, emetteur), 0.0)
+        apres = avant + montant
+        plafond = self._ceiling(fonds, emetteur, est_action)
+
+        above = self._above[fonds]
+        above += (apres if self._counts(fonds, emetteur, apres) else 0.0) \
+            - (avant if self._counts(fonds, emetteur, avant) else 0.0)
+
+        return {
+            'Fonds': fonds,
+            'Emetteur': emetteur,
+            'Montant_MAD': montant,
+            'Ratio_avant': avant / actif_net,
+            'Ratio_apres': apres / actif_net,
+            'Plafond': plafond,
+            'Conforme_plafond': bool(within_limit(apres / actif_net, plafond)),
+            'Ratio_45_avant': self._above[fonds] / actif_net,
+            'Ratio_45_apres': above / actif_net,
+            'Conforme_45': bool(within_limit(above / actif_net, self.seuil_45)),
+        }
+
+    def apply(self, fonds, emetteur, montant, est_action=False):
+        """Comptabilise l'ordre dans l'état ; renvoie le même résultat que check()"""
+        result = self.check(fonds, emetteur, montant, est_action)
+        key = (fonds, emetteur)
+        avant = self._montant.get(key, 0.0)
+        apres = avant + montant
+        self._above[fonds] += (apres if self._counts(fonds, emetteur, apres) else 0.0) \
+            - (avant if self._counts(fonds, emetteur, avant) else 0.0)
+        self._montant[key] = apres
+        self._plafond[key] = result['Plafond']
+        return result
+
+    def check_batch(self, orders):
+        """Évalue des ordres indépendants (chacun par rapport à l'état courant)
+
+        `orders` : DataFrame Fonds, Emetteur, Montant_MAD et, en option,
+        Est_Action. Les ordres sur un fonds sans actif net sont ignorés.
+        """
+        orders = orders[orders['Fonds'].isin(list(self.actif_net))]
+        fonds = orders['Fonds'].tolist()
+        emetteurs = orders['Emetteur'].tolist()
+        est_action = (orders['Est_Action'].fillna(False).astype(bool).tolist()
+                      if 'Est_Action' in orders.columns else [False] * len(orders))
+        montant = orders['Montant_MAD'].to_numpy(dtype=float)
+
+        actif_net = np.array([self.actif_net[f] for f in fonds], dtype=float)
+        avant = np.array([self._montant.get(k, 0.0) for k in zip(fonds, emetteurs)], dtype=float)
+        plafond = np.array([self._ceiling(f, e, a) for f, e, a in zip(fonds, emetteurs, est_action)],
+                           dtype=float)
+        above = np.array([self._above[f] for f in fonds], dtype=float)
+        eligible = ~np.isin(np.array(emetteurs, dtype=object), list(self.exclus))
+
+        apres = avant + montant
+        ratio_avant, ratio_apres = avant / actif_net, apres / actif_net
+        above_apres = (above + np.where(eligible & (ratio_apres > self.seuil_emetteur), apres, 0.0)
+                       - np.where(eligible & (ratio_avant > self.seuil_emetteur), avant, 0.0))
+
+        return pd.DataFrame({
+            'Fonds': fonds,
+            'Emetteur': emetteurs,
+            'Montant_MAD': montant,
+            'Ratio_avant': ratio_avant,
+            'Ratio_apres': ratio_apres,
+            'Plafond': plafond,
+            'Conforme_plafond': within_limit(ratio_apres, plafond),
+            'Ratio_45_avant': above / actif_net,
+            'Ratio_45_apres': above_apres / actif_net,
+            'Conforme_45': within_limit(above_apres / actif_net, self.seuil_45),
+        }, index=orders.index)
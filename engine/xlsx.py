@@ -0,0 +1,275 @@
+"""
+Lecture projetée des classeurs .xlsx : seules les colonnes demandées sont décodées
+
+openpyxl (et donc pandas) construit une cellule Python pour chaque
+cellule de la feuille, même si l'on ne garde que quelques colonnes : sur
+les extractions dépositaires larges (30 colonnes et plus), l'essentiel du
+temps de lecture part dans des colonnes jetées. Ce module lit directement
+le XML des feuilles : une expression régulière compilée ne retient, côté
+C, que les cellules des colonnes demandées ; seules celles-ci sont
+converties en valeurs Python. Le XML est lu en flux, par blocs coupés sur
+une fin de ligne, et les premières lignes d'une feuille peuvent être lues
+sans décompresser le reste.
+
+Les valeurs suivent les conventions de pandas.read_excel : nombres
+entiers renvoyés en int, chaînes reconnues comme manquantes ('#N/A',
+'NA'...) en None. Les styles ne sont pas lus : une date est renvoyée
+comme son numéro de série (aucune colonne de position n'est une date).
+Une feuille dont une ligne ou une cellule ne porte pas sa référence
+(attribut r, facultatif dans la norme mais toujours écrit par Excel et
+openpyxl) est signalée par UnsupportedSheet, quel que soit le bloc où
+elle apparaît : l'appelant se replie alors sur pandas plutôt que de
+perdre des positions en silence.
+"""
+
+import html
+import os
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+from xml.etree import ElementTree
+
+
+_NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+_R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_MAIN = '{%s}' % _NS['main']
+
+# Valeurs texte lues comme manquantes par pandas.read_excel (na_values par défaut)
+_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+_BLOCK = 1 << 22
+_HEAD_BLOCK = 1 << 16
+
+_ROW_END = b'</row>'
+_ROW = re.compile(rb'<row\b[^>]*?\sr="(\d+)"[^>]*?(?:/>|>(.*?)</row>)', re.S)
+_ANY_ROW = re.compile(rb'<row[\s/>]')
+_REF_ROW = re.compile(rb'<row\b[^>]*?\sr="\d+"')
+_ANY_CELL = re.compile(rb'<c[\s/>]')
+_REF_CELL = re.compile(rb'<c\b[^>]*?\sr="[A-Z]+\d+"')
+_LEADING_REF_CELL = re.compile(rb'<c r="')
+_TYPE = re.compile(rb'\bt="(\w+)"')
+_VALUE = re.compile(rb'<v>(.*?)</v>', re.S)
+_TEXT = re.compile(rb'<t\b[^>]*>(.*?)</t>', re.S)
+
+
+class UnsupportedSheet(ValueError):
+    """Feuille que la lecture projetée ne sait pas interpréter (repli sur pandas)"""
+
+
+def source(file):
+    """Chemin ou flux relisable depuis le début, quel que soit le type de `file`"""
+    if isinstance(file, bytes):
+        return BytesIO(file)
+    if isinstance(file, (str, os.PathLike)):
+        return file
+    if hasattr(file, 'getvalue'):
+        return BytesIO(file.getvalue())
+    file.seek(0)
+    return BytesIO(file.read())
+
+
+def sheet_parts(z):
+    """{onglet: chemin de son XML dans le zip}, dans l'ordre du classeur"""
+    rels = ElementTree.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for rel in rels.findall('rel:Relationship', _NS):
+        target = rel.get('Target')
+        targets[rel.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                  else posixpath.normpath(posixpath.join('xl', target)))
+    workbook = ElementTree.fromstring(z.read('xl/workbook.xml'))
+    return {sheet.get('name'): targets[sheet.get(_R_ID)]
+            for sheet in workbook.findall('main:sheets/main:sheet', _NS)}
+
+
+def column_letters(index):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'"""
+    letters = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def column_index(letters):
+    """'A' -> 0, 'AA' -> 26"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+class XlsxReader:
+    """Classeur .xlsx ouvert une fois ; lecture des premières lignes ou de colonnes choisies
+
+    Lève zipfile.BadZipFile ou KeyError si le fichier n'est pas un .xlsx.
+    """
+
+    def __init__(self, file):
+        self._zip = zipfile.ZipFile(source(file))
+        try:
+            self._parts = sheet_parts(self._zip)
+        except Exception:
+            self._zip.close()
+            raise
+        self.sheet_names = list(self._parts)
+        self._shared = None
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def shared_strings(self):
+        """Table des chaînes partagées, lue à la première cellule qui y renvoie"""
+        if self._shared is None:
+            self._shared = []
+            if 'xl/sharedStrings.xml' in self._zip.namelist():
+                with self._zip.open('xl/sharedStrings.xml') as f:
+                    for _, element in ElementTree.iterparse(f):
+                        if element.tag == _MAIN + 'si':
+                            # texte simple ou suite de runs mis en forme ; la phonétique (rPh) est ignorée
+                            runs = [element.find(_MAIN + 't')] + element.findall(f'{_MAIN}r/{_MAIN}t')
+                            self._shared.append(''.join(t.text or '' for t in runs if t is not None))
+                            element.clear()
+        return self._shared
+
+    def _blocks(self, name, size=_BLOCK):
+        """XML de la feuille, par blocs d'environ `size` octets coupés après une fin de ligne"""
+        with self._zip.open(self._parts[name]) as f:
+            pending = b''
+            while True:
+                block = f.read(size)
+                if not block:
+                    if pending:
+                        yield pending
+                    return
+                pending += block
+                cut = pending.rfind(_ROW_END)
+                if cut >= 0:
+                    cut += len(_ROW_END)
+                    yield pending[:cut]
+                    pending = pending[cut:]
+
+    def _check(self, block):
+        """Le bloc a-t-il toutes ses références r=\"...\" en tête d'attributs (forme Excel/openpyxl) ?
+
+        UnsupportedSheet si une ligne ou une cellule n'a pas de référence.
+        """
+        if len(_ANY_ROW.findall(block)) != len(_REF_ROW.findall(block)):
+            raise UnsupportedSheet("lignes sans référence r=\"...\"")
+        n_cells = len(_ANY_CELL.findall(block))
+        if n_cells == len(_LEADING_REF_CELL.findall(block)):
+            return True
+        if n_cells != len(_REF_CELL.findall(block)):
+            raise UnsupportedSheet("cellules sans référence r=\"...\"")
+        return False
+
+    def head(self, name, n_rows):
+        """Les n_rows premières lignes de la feuille : listes de valeurs par colonne
+
+        Les lignes vides sont renvoyées comme listes vides, comme le
+        ferait pandas.read_excel(header=None). Seul le début du XML est
+        décompressé.
+        """
+        rows = []
+        for block in self._blocks(name, _HEAD_BLOCK):
+            leading = self._check(block)
+            for match in _ROW.finditer(block):
+                number = int(match.group(1))
+                if number > n_rows:
+                    return rows
+                rows.extend([] for _ in range(number - 1 - len(rows)))
+                row = {}
+                for letter, number, attrs, content in _cells(match.group(2) or b'', rb'[A-Z]+', leading):
+                    row[column_index(letter.decode())] = self._value(number, attrs, content)
+                rows.append([row.get(i) for i in range(max(row) + 1)] if row else [])
+        return rows
+
+    def columns(self, name, first_row, indices):
+        """{index: valeurs} des colonnes `indices`, à partir de la ligne `first_row` (0 = première)
+
+        Les valeurs des différentes colonnes sont alignées ligne à ligne ;
+        une ligne sans aucune cellule dans ces colonnes n'est pas produite.
+        """
+        letters = {column_letters(i).encode(): i for i in indices}
+        alternatives = b'|'.join(sorted(letters, key=len, reverse=True))
+        values = {i: [] for i in indices}
+        for block in self._blocks(name):
+            leading = self._check(block)
+            row, current = None, {}
+            for letter, number, attrs, content in _cells(block, alternatives, leading):
+                if number != row:
+                    if current:
+                        _append_row(values, current)
+                    row, current = number, {}
+                if int(number) > first_row:
+                    current[letters[letter]] = self._value(number, attrs, content)
+            if current:
+                _append_row(values, current)
+        return values
+
+    def _value(self, number, attrs, content):
+        """Valeur Python d'une cellule (None si vide ou lue comme manquante)"""
+        if not content:
+            return None
+        kind = _TYPE.search(attrs)
+        kind = kind.group(1) if kind else b'n'
+        if kind == b'inlineStr':
+            text = html.unescape(b''.join(_TEXT.findall(content)).decode('utf-8'))
+            return None if text in _NA_VALUES else text
+        value = _VALUE.search(content)
+        if value is None:
+            return None
+        value = value.group(1)
+        if kind == b'n':
+            number = float(value)
+            return int(number) if number.is_integer() else number
+        if kind == b's':
+            text = self.shared_strings[int(value)]
+        elif kind == b'b':
+            return bool(int(value))
+        else:
+            # 'str' (résultat de formule) et 'e' (erreur : '#N/A'...)
+            text = html.unescape(value.decode('utf-8'))
+        return None if text in _NA_VALUES else text
+
+
+def _cells(xml, letters, leading=True):
+    """(lettres, numéro de ligne, attributs, contenu) des cellules dont la colonne correspond à `letters`
+
+    Avec leading=False, l'attribut r peut occuper n'importe quelle position
+    dans la balise (expression plus lente, réservée aux blocs qui l'exigent).
+    """
+    pattern = _CELL_PATTERNS.get((letters, leading))
+    if pattern is None:
+        if leading:
+            source = rb'<c r="(' + letters + rb')(\d+)"([^>]*?)(?:/>|>(.*?)</c>)'
+        else:
+            source = rb'<c\b([^>]*?)\sr="(' + letters + rb')(\d+)"([^>]*?)(?:/>|>(.*?)</c>)'
+        pattern = _CELL_PATTERNS[letters, leading] = re.compile(source, re.S)
+    if leading:
+        return pattern.findall(xml)
+    return [(letter, number, before + after, content)
+            for before, letter, number, after, content in pattern.findall(xml)]
+
+
+_CELL_PATTERNS = {}
+
+
+def _append_row(values, current):
+    for i, column in values.items():
+        column.append(current.get(i))
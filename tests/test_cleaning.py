@@ -0,0 +1,74 @@
+"""
+Nettoyage des montants : clean_numeric_series doit rester identique à clean_number
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.cleaning import clean_number, clean_numeric_series
+
+
+# (cellule, valeur attendue) : comportement historique de clean_number
+CASES = [
+    ('1 234 567.89', 1234567.89),        # milliers séparés par des espaces
+    ('1,234,567.89', 1234567.89),        # milliers séparés par des virgules
+    ('1\xa0234,50', 123450.0),           # NBSP ; la virgule est un séparateur de milliers
+    ('1\u202f234.5', 1234.5),           # espace fine insécable
+    ('\t42\n', 42.0),
+    ('(1 234.50)', 1234.5),              # parenthèses retirées, signe non appliqué
+    ('-1 234.5', -1234.5),
+    ('12.5%', 12.5),                     # % retiré, pas de division par 100
+    ('12,5%', 125.0),
+    ('MAD 1 000', 1000.0),
+    ('1e3', 1000.0),
+    ('', 0.0),
+    ('-', 0.0),
+    (' - ', 0.0),
+    ('nan', 0.0),
+    ('NaN', np.nan),                     # float('NaN') accepté tel quel
+    ('1.2.3', 0.0),
+    ('abc', 0.0),
+    (None, 0.0),
+    (np.nan, 0.0),
+    (3, 3.0),
+    (2.5, 2.5),
+    (True, 1.0),
+]
+
+
+@pytest.mark.parametrize('value, expected', CASES)
+def test_clean_number(value, expected):
+    np.testing.assert_equal(clean_number(value), expected)
+
+
+@pytest.mark.parametrize('value, expected', CASES)
+def test_single_cell_column(value, expected):
+    np.testing.assert_equal(clean_numeric_series(pd.Series([value], dtype=object)).iloc[0], expected)
+
+
+def test_mixed_column_matches_clean_number():
+    """Colonne mêlant chaînes, nombres et manquants : mêmes valeurs, même index et même nom"""
+    values = [value for value, _ in CASES] * 3
+    series = pd.Series(values, index=range(100, 100 + len(values)), name='Valo_globale', dtype=object)
+    result = clean_numeric_series(series)
+    np.testing.assert_array_equal(result.to_numpy(), [clean_number(v) for v in values])
+    assert result.index.equals(series.index) and result.name == 'Valo_globale'
+
+
+def test_text_only_column_matches_clean_number():
+    """Chemin en bloc (chaînes seules), y compris jetons '-' et vides consécutifs"""
+    values = [value for value, _ in CASES if isinstance(value, str)] + ['-', '-', '', '', '1 000']
+    result = clean_numeric_series(pd.Series(values, dtype=object))
+    np.testing.assert_array_equal(result.to_numpy(), [clean_number(v) for v in values])
+
+
+@pytest.mark.parametrize('series', [
+    pd.Series([1, 2, 3]),
+    pd.Series([1.5, np.nan, -2.0]),
+    pd.Series([True, False]),
+    pd.Series(['1 000', None, '2,5'], dtype='str'),
+])
+def test_typed_columns(series):
+    np.testing.assert_array_equal(clean_numeric_series(series).to_numpy(),
+                                  [clean_number(v) for v in series.astype(object)])
@@ -0,0 +1,115 @@
+"""
+Contrôle différentiel (DeltaControl) : onglets et fonds réutilisés ou recalculés, résultats d'un contrôle complet
+"""
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from engine.delta import DeltaControl
+from engine.issuers import add_issuers, default_issuer_table
+from engine.loader import read_portfolio
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+
+
+FUNDS = ['FA', 'FB', 'FC']
+DESCRIPTIONS = ['ATW', 'BCP', 'OBLONCF 4%', 'BDT 52S', 'CIH', 'TITRE NON REFERENCE']
+
+
+def write_book(path, bump=None):
+    """Un onglet par fonds ; `bump` : onglet dont les valorisations sont majorées de 5%"""
+    wb = Workbook(write_only=True)
+    for s, name in enumerate(FUNDS):
+        ws = wb.create_sheet(name)
+        ws.append(['ISIN', 'Type', 'Description', 'Quantité', 'Prix revient',
+                   'Valo J', 'Prix revient global', 'Valo globale', '+/- value'])
+        factor = 1.05 if name == bump else 1.0
+        for i, description in enumerate(DESCRIPTIONS):
+            ws.append([f'MA{i:010d}', 'ACTION' if i % 2 == 0 else 'OBLIGATION', description,
+                       10, 100.0, 101.0, 1000.0, round((1000 + 300 * s + 150 * i) * factor, 2), 10.0])
+    wb.save(path)
+
+
+def full_control(path, nav, params):
+    portfolio, _ = read_portfolio(path)
+    labeled = add_issuers(portfolio, default_issuer_table())
+    ratios = calculate_issuer_ratios(labeled, nav, params)
+    return ratios, check_45_percent_rule(ratios, labeled, nav, params['seuil_45'],
+                                         seuil_emetteur=params['seuil_emetteur_45'])
+
+
+def delta_control(delta, path, nav, params):
+    portfolio, _ = delta.load(path)
+    _, ratios, rule_45 = delta.compute(portfolio, nav, default_issuer_table(), params)
+    return ratios, rule_45
+
+
+def assert_same(actual, expected):
+    for got, want in zip(actual, expected):
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), want.reset_index(drop=True))
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / 'FOND.xlsx'
+    write_book(path)
+    return path
+
+
+@pytest.fixture
+def nav():
+    return {'FA': 20_000.0, 'FB': 25_000.0, 'FC': 30_000.0}
+
+
+def test_first_run_matches_full_control(book, nav):
+    delta = DeltaControl()
+    expected = full_control(book, nav, DEFAULT_PARAMS)
+    assert len(expected[0]) == 18 and len(expected[1]) == 3
+    assert_same(delta_control(delta, book, nav, DEFAULT_PARAMS), expected)
+    assert delta.reparsed == FUNDS and delta.recomputed == FUNDS and delta.reused == []
+
+
+def test_unchanged_book_reuses_everything(book, nav):
+    delta = DeltaControl()
+    first = delta_control(delta, book, nav, DEFAULT_PARAMS)
+    assert_same(delta_control(delta, book, nav, DEFAULT_PARAMS), first)
+    assert delta.reparsed == [] and delta.recomputed == [] and delta.reused == FUNDS
+
+
+def test_changed_sheet_is_the_only_one_reprocessed(book, nav):
+    delta = DeltaControl()
+    delta_control(delta, book, nav, DEFAULT_PARAMS)
+
+    write_book(book, bump='FB')
+    result = delta_control(delta, book, nav, DEFAULT_PARAMS)
+    assert delta.reparsed == ['FB']
+    assert delta.recomputed == ['FB'] and delta.reused == ['FA', 'FC']
+    assert_same(result, full_control(book, nav, DEFAULT_PARAMS))
+
+
+def test_nav_and_params_invalidate(book, nav):
+    delta = DeltaControl()
+    delta_control(delta, book, nav, DEFAULT_PARAMS)
+
+    nav = {**nav, 'FC': 12_000.0}
+    result = delta_control(delta, book, nav, DEFAULT_PARAMS)
+    assert delta.reparsed == [] and delta.recomputed == ['FC']
+    assert_same(result, full_control(book, nav, DEFAULT_PARAMS))
+
+    params = {**DEFAULT_PARAMS, 'plafond_standard': 0.08}
+    result = delta_control(delta, book, nav, params)
+    assert delta.recomputed == FUNDS
+    assert_same(result, full_control(book, nav, params))
+
+
+def test_state_persists_between_runs(book, nav, tmp_path):
+    delta = DeltaControl(path=str(tmp_path / 'delta'))
+    delta_control(delta, book, nav, DEFAULT_PARAMS)
+    delta.save()
+
+    write_book(book, bump='FA')
+    restored = DeltaControl(path=str(tmp_path / 'delta'))
+    result = delta_control(restored, book, nav, DEFAULT_PARAMS)
+    assert restored.reparsed == ['FA'] and restored.recomputed == ['FA']
+    assert_same(result, full_control(book, nav, DEFAULT_PARAMS))
@@ -0,0 +1,116 @@
+"""
+Matrice fonds x émetteurs (ExposureMatrix) : mêmes ratios que calculate_issuer_ratios, vues société de gestion
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.exposure import TOP_ISSUER_COLUMNS, ExposureMatrix
+from engine.issuers import AUTRE, ETAT, IssuerGroups
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_group_ratios, calculate_issuer_ratios
+
+
+BOOK = pd.DataFrame([
+    ('F2', 'IAM', AUTRE[1], 'ACTION', 2000.0),
+    ('F2', 'ATW', AUTRE[1], 'ACTION', 3000.0),
+    ('F2', 'ATW', AUTRE[1], 'OBLIGATION', 1000.0),
+    ('F1', 'CIH', AUTRE[1], 'OBLIGATION', 500.0),
+    ('F1', 'ATW', AUTRE[1], 'ACTION', 2000.0),
+    ('F1', ETAT[0], ETAT[1], 'BDT', 4000.0),
+    ('F3', 'CIH', AUTRE[1], 'ACTION', 1500.0),
+    ('F3', 'IAM', AUTRE[1], 'ACTION', 1000.0),
+    ('F0', 'ATW', AUTRE[1], 'ACTION', 9000.0),           # actif net nul : hors matrice
+], columns=['Fonds', 'Emetteur', 'Type_Emetteur', 'Type', 'Valo_globale'])
+
+NAV = {'F0': 0.0, 'F1': 10_000.0, 'F2': 40_000.0, 'F3': 10_000.0}
+
+
+@pytest.fixture
+def ratios():
+    return calculate_issuer_ratios(BOOK, NAV, DEFAULT_PARAMS)
+
+
+@pytest.fixture
+def matrix():
+    return ExposureMatrix.from_positions(BOOK, NAV)
+
+
+def test_ratios_match_calculate_issuer_ratios(matrix, ratios):
+    assert matrix.shape == (3, 4) and matrix.nnz == len(ratios)
+    assert list(matrix.funds.take(matrix._rows())) == list(ratios['Fonds'])
+    assert list(matrix.issuers.take(matrix.indices)) == list(ratios['Emetteur'])
+    np.testing.assert_array_equal(matrix.data, ratios['Montant_MAD'].to_numpy())
+    np.testing.assert_array_equal(matrix.ratios(), ratios['Ratio'].to_numpy())
+
+
+def test_from_ratios_sums_repeated_pairs_in_any_order(matrix, ratios):
+    """Ratios concaténés fonds par fonds, dans le désordre et avec couples répétés (contrôle différentiel)"""
+    halves = pd.concat([ratios.assign(Montant_MAD=ratios['Montant_MAD'] / 2)] * 2).sample(frac=1, random_state=0)
+    shuffled = ExposureMatrix.from_ratios(halves)
+    by_pair = dict(zip(zip(shuffled.funds.take(shuffled._rows()), shuffled.issuers.take(shuffled.indices)),
+                       shuffled.data))
+    assert by_pair == pytest.approx(dict(zip(zip(ratios['Fonds'], ratios['Emetteur']), ratios['Montant_MAD'])))
+    np.testing.assert_array_equal(shuffled.issuers, matrix.issuers)
+
+
+def test_totals(matrix, ratios):
+    totals = ratios.groupby('Emetteur')['Montant_MAD'].sum()
+    np.testing.assert_allclose(matrix.issuer_totals(), totals.reindex(matrix.issuers).to_numpy())
+    fund_totals = ratios.groupby('Fonds')['Montant_MAD'].sum()
+    np.testing.assert_allclose(matrix.fund_totals(), fund_totals.reindex(matrix.funds).to_numpy())
+    counts = ratios.groupby('Emetteur').size()
+    np.testing.assert_array_equal(matrix.issuer_funds(), counts.reindex(matrix.issuers).to_numpy())
+
+    # vecteur indicateur des émetteurs privés : montant privé par fonds
+    private = (matrix.issuers != ETAT[0]).astype(float)
+    expected = ratios[ratios['Emetteur'] != ETAT[0]].groupby('Fonds')['Montant_MAD'].sum()
+    np.testing.assert_allclose(matrix.dot(private), expected.reindex(matrix.funds).to_numpy())
+
+
+def test_top_issuers(matrix, ratios):
+    top = matrix.top_issuers(3)
+    assert list(top.columns) == TOP_ISSUER_COLUMNS
+    assert top['Emetteur'].tolist() == ['ATW', ETAT[0], 'IAM']
+    atw = top.iloc[0]
+    assert atw['Montant_MAD'] == 6000.0 and atw['Nb_Fonds'] == 2
+    assert atw['Part_Encours'] == pytest.approx(6000.0 / 60_000.0)
+    assert atw['Ratio_Max'] == pytest.approx(0.20) and atw['Fonds_Ratio_Max'] == 'F1'
+
+    # CIH : 5% dans F1, 15% dans F3 ; IAM : 5% dans F2, 10% dans F3
+    by_ratio = matrix.top_issuers(10, by='Ratio_Max').set_index('Emetteur')
+    assert by_ratio.loc['CIH', 'Fonds_Ratio_Max'] == 'F3'
+    assert by_ratio.loc['IAM', 'Ratio_Max'] == pytest.approx(0.10)
+    worst = ratios.loc[ratios.groupby('Emetteur')['Ratio'].idxmax()].set_index('Emetteur')
+    np.testing.assert_array_equal(by_ratio['Ratio_Max'], worst.loc[by_ratio.index, 'Ratio'])
+
+
+def test_issuer_exposure(matrix, ratios):
+    column = matrix.issuer_exposure('ATW')
+    expected = ratios[ratios['Emetteur'] == 'ATW']
+    assert column['Fonds'].tolist() == expected['Fonds'].tolist()
+    np.testing.assert_array_equal(column['Ratio'], expected['Ratio'])
+    assert len(matrix.issuer_exposure('INCONNU')) == 0
+
+
+def test_grouped_matches_group_ratios():
+    groups = IssuerGroups(pd.DataFrame({'emetteur': ['IAM', 'CIH'], 'parent': ['ATW', 'ATW']}))
+    matrix = ExposureMatrix.from_positions(BOOK, NAV).grouped(groups)
+    group_ratios = calculate_group_ratios(calculate_issuer_ratios(BOOK, NAV, DEFAULT_PARAMS, groups=groups),
+                                          DEFAULT_PARAMS).set_index(['Fonds', 'Groupe'])
+    pairs = list(zip(matrix.funds.take(matrix._rows()), matrix.issuers.take(matrix.indices)))
+    assert sorted(pairs) == sorted(group_ratios.index)
+    np.testing.assert_allclose(matrix.data, group_ratios.loc[pairs, 'Montant_MAD'].to_numpy())
+
+
+def test_empty():
+    matrix = ExposureMatrix.from_positions(BOOK, {'F0': 0.0})
+    assert matrix.shape == (0, 0) and matrix.nnz == 0
+    assert len(matrix.top_issuers()) == 0
+    assert len(matrix.issuer_exposure('ATW')) == 0
+
+
+def test_to_scipy(matrix):
+    pytest.importorskip('scipy')
+    np.testing.assert_allclose(np.asarray(matrix.to_scipy().sum(axis=0)).ravel(), matrix.issuer_totals())
@@ -0,0 +1,81 @@
+"""
+Ratios par groupe d'émetteurs : têtes de groupe, sommes par (fonds, groupe), plafond des groupes publics
+"""
+
+import pandas as pd
+import pytest
+
+from engine.issuers import AUTRE, ETAT, IssuerGroups
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_group_ratios, calculate_issuer_ratios
+
+
+NAV = 10_000.0
+PARAMS = {**DEFAULT_PARAMS, 'plafond_etat': 1.0, 'plafond_groupe': 0.20}
+
+
+def positions(rows):
+    return pd.DataFrame(rows, columns=['Fonds', 'Emetteur', 'Type_Emetteur', 'Type', 'Valo_globale'])
+
+
+def group_ratios(df, hierarchy, nav=None):
+    groups = IssuerGroups(pd.DataFrame(hierarchy, columns=['emetteur', 'parent']))
+    ratios = calculate_issuer_ratios(df, nav or {'F1': NAV}, PARAMS, groups=groups)
+    return calculate_group_ratios(ratios, PARAMS).set_index(['Fonds', 'Groupe'])
+
+
+def test_private_group_sums_members_over_levels():
+    df = positions([
+        ('F1', 'HOLDING', AUTRE[1], 'ACTION', 900.0),
+        ('F1', 'FILIALE', AUTRE[1], 'OBLIGATION', 800.0),
+        ('F1', 'SOUS-FILIALE', AUTRE[1], 'ACTION', 700.0),
+        ('F1', 'CIH', AUTRE[1], 'ACTION', 500.0),
+    ])
+    result = group_ratios(df, [('FILIALE', 'HOLDING'), ('SOUS-FILIALE', 'FILIALE'), ('HOLDING', None)])
+
+    holding = result.loc[('F1', 'HOLDING')]
+    assert holding['Montant_MAD'] == 2400.0 and holding['Nb_Emetteurs'] == 3
+    assert holding['Plafond'] == 0.20 and holding['Conformite'] == '❌'
+    assert result.loc[('F1', 'CIH'), 'Nb_Emetteurs'] == 1      # hors hiérarchie : son propre groupe
+
+
+def test_mixed_public_private_group_keeps_group_ceiling():
+    """Une entité publique dans le groupe ne donne pas le plafond de l'État aux filiales privées"""
+    df = positions([
+        ('F1', 'OFFICE', ETAT[1], 'OBLIGATION', 1500.0),
+        ('F1', 'FILIALE A', AUTRE[1], 'ACTION', 900.0),
+        ('F1', 'FILIALE B', AUTRE[1], 'ACTION', 900.0),
+    ])
+    result = group_ratios(df, [('FILIALE A', 'OFFICE'), ('FILIALE B', 'OFFICE')])
+
+    office = result.loc[('F1', 'OFFICE')]
+    assert office['Ratio'] == pytest.approx(0.33)
+    assert office['Type'] == 'privé'
+    assert office['Plafond'] == 0.20
+    assert office['Conformite'] == '❌'
+
+
+def test_all_public_group_gets_state_ceiling():
+    df = positions([
+        ('F1', ETAT[0], ETAT[1], 'BDT', 5000.0),
+        ('F1', 'OFFICE', ETAT[1], 'OBLIGATION', 1500.0),
+    ])
+    result = group_ratios(df, [('OFFICE', ETAT[0])])
+
+    etat = result.loc[('F1', ETAT[0])]
+    assert etat['Montant_MAD'] == 6500.0
+    assert etat['Type'] == 'public'
+    assert etat['Plafond'] == 1.0 and etat['Conformite'] == '✅'
+
+
+def test_groups_are_per_fund():
+    df = positions([
+        ('F1', 'FILIALE', AUTRE[1], 'ACTION', 1000.0),
+        ('F2', 'FILIALE', AUTRE[1], 'ACTION', 3000.0),
+        ('F2', 'HOLDING', AUTRE[1], 'ACTION', 1000.0),
+    ])
+    result = group_ratios(df, [('FILIALE', 'HOLDING')], nav={'F1': NAV, 'F2': 2 * NAV})
+
+    assert result.loc[('F1', 'HOLDING'), 'Ratio'] == pytest.approx(0.10)
+    assert result.loc[('F2', 'HOLDING'), 'Ratio'] == pytest.approx(0.20)
+    assert result.loc[('F2', 'HOLDING'), 'Conformite'] == '✅'
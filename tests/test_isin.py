@@ -0,0 +1,91 @@
+"""
+Référentiel ISIN (IsinIndex) : jointure sur le Code_ISIN, mots-clés pour les seuls ISIN inconnus
+"""
+
+import pandas as pd
+import pytest
+
+from engine.issuers import (AUTRE, ETAT, SOURCE_ISIN, SOURCE_MOTS_CLES, IsinIndex, add_issuers,
+                            default_issuer_table, issuer_sources, read_isin_referential)
+from engine.loader import compact_positions
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import calculate_issuer_ratios
+
+
+REFERENTIAL = pd.DataFrame({
+    'isin': ['MA0000012445', ' ma0000011488 ', 'MA0000010803', 'MA0000012445', 'MA0000099999'],
+    'emetteur': ['ATW', 'IAM', ETAT[0], 'BCP', 'HOLDING X'],
+    'type': [AUTRE[1], AUTRE[1], ETAT[1], AUTRE[1], None],
+})
+
+BOOK = pd.DataFrame({
+    'Fonds': ['F1', 'F1', 'F1', 'F1', 'F2', 'F2', 'F2'],
+    'Code_ISIN': ['MA0000012445', 'MA0000011488', 'MA 0000 0108 03', 'MA0000055555', 'MA0000099999',
+                  None, 'MA0000012445'],
+    'Type': ['ACTION', 'ACTION', 'BDT', 'OBLIGATION', 'ACTION', 'OBLIGATION', 'ACTION'],
+    # descriptions trompeuses sur les lignes du référentiel : l'ISIN l'emporte
+    'Description': ['BCP', 'ITISSALAT', 'BON DU TRESOR', 'OBLONCF 4%', 'ATW', 'CIH 5%', 'TITRE'],
+    'Valo_globale': [1500.0, 900.0, 4000.0, 700.0, 2500.0, 600.0, 1800.0],
+})
+
+# (émetteur, type, source) attendus ligne à ligne
+EXPECTED = [
+    ('ATW', AUTRE[1], SOURCE_ISIN),
+    ('IAM', AUTRE[1], SOURCE_ISIN),
+    (ETAT[0], ETAT[1], SOURCE_ISIN),
+    ('ONCF', AUTRE[1], SOURCE_MOTS_CLES),
+    ('HOLDING X', AUTRE[1], SOURCE_ISIN),
+    ('CIH', AUTRE[1], SOURCE_MOTS_CLES),
+    ('ATW', AUTRE[1], SOURCE_ISIN),
+]
+
+NAV = {'F1': 10_000.0, 'F2': 20_000.0}
+
+
+@pytest.fixture
+def index():
+    return IsinIndex(REFERENTIAL)
+
+
+def test_lookup_normalizes_and_keeps_first_duplicate(index):
+    assert len(index) == 4
+    rows = index.lookup(pd.Series(['MA0000012445', 'ma0000011488', 'MA 0000\xa0010803', 'XX', None]))
+    assert rows[-2:].tolist() == [-1, -1]
+    assert index.emetteurs[rows[:3]].tolist() == ['ATW', 'IAM', ETAT[0]]
+
+
+def test_lookup_on_categorical_column(index):
+    isins = BOOK['Code_ISIN']
+    assert index.lookup(isins.astype('category')).tolist() == index.lookup(isins).tolist()
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_add_issuers_prefers_isin(index, compact):
+    book = compact_positions(BOOK) if compact else BOOK
+    labeled = add_issuers(book, default_issuer_table(), isin_index=index)
+    actual = list(zip(labeled['Emetteur'].astype(object), labeled['Type_Emetteur'].astype(object),
+                      labeled['Source_Emetteur'].astype(object)))
+    assert actual == EXPECTED
+    assert issuer_sources(labeled) == {SOURCE_ISIN: round(5 / 7, 4), SOURCE_MOTS_CLES: round(2 / 7, 4)}
+
+
+def test_without_match_falls_back_to_keywords():
+    index = IsinIndex(REFERENTIAL.iloc[:0])
+    labeled = add_issuers(BOOK, default_issuer_table(), isin_index=index)
+    expected = add_issuers(BOOK, default_issuer_table())
+    assert labeled['Emetteur'].astype(object).tolist() == expected['Emetteur'].astype(object).tolist()
+    assert labeled['Emetteur'].astype(object).tolist()[-1] == AUTRE[0]     # aucun mot-clé
+
+
+def test_ratios_match_hand_labeled_book(index):
+    labeled = add_issuers(BOOK, default_issuer_table(), isin_index=index)
+    hand = BOOK.assign(Emetteur=[e for e, _, _ in EXPECTED], Type_Emetteur=[t for _, t, _ in EXPECTED])
+    pd.testing.assert_frame_equal(calculate_issuer_ratios(labeled, NAV, DEFAULT_PARAMS),
+                                  calculate_issuer_ratios(hand, NAV, DEFAULT_PARAMS))
+
+
+def test_read_referential(tmp_path):
+    path = tmp_path / 'isin.csv'
+    path.write_text("ISIN,Émetteur\nMA0000012445,ATW\n", encoding='utf-8')
+    referential = read_isin_referential(str(path))
+    assert referential[['isin', 'emetteur', 'type']].values.tolist() == [['MA0000012445', 'ATW', AUTRE[1]]]
@@ -0,0 +1,64 @@
+"""
+Import des actifs nets (engine.nav) : dates ISO, texte jour en premier et cellules date Excel
+"""
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from engine.nav import NavStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NavStore(str(tmp_path / 'nav.sqlite'))
+
+
+def stored(store):
+    with store._connect() as con:
+        return con.execute("SELECT fonds, date_valo, actif_net FROM actif_net ORDER BY fonds, date_valo").fetchall()
+
+
+def test_iso_dates(store, tmp_path):
+    path = tmp_path / 'actifs.csv'
+    path.write_text("Fonds;Date;Actif net\nF1;2026-01-05;1 000\nF1;2026-01-31;2 000\n", encoding='utf-8')
+    assert store.import_file(str(path)) == 2
+    assert stored(store) == [('F1', '2026-01-05', 1000.0), ('F1', '2026-01-31', 2000.0)]
+    assert store.get('F1', '2026-01-30') == 1000.0
+
+
+def test_day_first_dates(store, tmp_path):
+    path = tmp_path / 'actifs.csv'
+    path.write_text("Fonds;Date;Actif net\nF1;05/01/2026;1 000\nF1;31/01/2026;2 000\nF2;1.2.2026;3 000\n",
+                    encoding='utf-8')
+    assert store.import_file(str(path)) == 3
+    assert stored(store) == [('F1', '2026-01-05', 1000.0), ('F1', '2026-01-31', 2000.0),
+                             ('F2', '2026-02-01', 3000.0)]
+
+
+def test_mixed_text_dates(store):
+    df = pd.DataFrame({'Fonds': ['F1', 'F1'], 'Date': ['2026-01-05', '06/01/2026'], 'Actif net': [1.0, 2.0]})
+    store.import_frame(df)
+    assert [day for _, day, _ in stored(store)] == ['2026-01-05', '2026-01-06']
+
+
+@pytest.mark.parametrize('extra', [None, '07/01/2026'])
+def test_excel_date_cells(store, tmp_path, extra):
+    """Cellules date Excel, seules (colonne datetime) ou mêlées à du texte (colonne objet)"""
+    path = tmp_path / 'actifs.xlsx'
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Fonds', 'Date valorisation', 'Actif net'])
+    ws.append(['F1', datetime(2026, 1, 5), 1000.0])
+    ws.append(['F1', datetime(2026, 1, 31), 2000.0])
+    if extra:
+        ws.append(['F2', extra, 3000.0])
+    wb.save(path)
+
+    store.import_file(str(path))
+    expected = [('F1', '2026-01-05', 1000.0), ('F1', '2026-01-31', 2000.0)]
+    if extra:
+        expected.append(('F2', '2026-01-07', 3000.0))
+    assert stored(store) == expected
@@ -0,0 +1,56 @@
+"""
+Contrôle par étapes (StagedControl) : chaque étape n'est refaite que si ses propres entrées changent
+"""
+
+import pandas as pd
+import pytest
+
+from engine.issuers import add_issuers, default_issuer_table
+from engine.pipeline import DEFAULT_PARAMS, StagedControl
+from engine.ratios import calculate_issuer_ratios, check_45_percent_rule
+
+
+@pytest.fixture
+def book():
+    df = pd.DataFrame({
+        'Fonds': ['F1', 'F1', 'F1', 'F2', 'F2'],
+        'Code_ISIN': ['MA0000012445', 'MA0000011488', 'MA0000011884', 'MA0000012445', 'MA0000010803'],
+        'Type': ['ACTION', 'ACTION', 'OBLIGATION', 'ACTION', 'BDT'],
+        'Description': ['ATTIJARIWAFA BANK', 'ITISSALAT AL-MAGHRIB', 'CIH BANK 5%', 'ATTIJARIWAFA BANK',
+                        'BDT 52S 2030'],
+        'Valo_globale': [1500.0, 900.0, 1200.0, 3000.0, 6000.0],
+    })
+    return df, {'F1': 10_000.0, 'F2': 20_000.0}
+
+
+def test_stage_keys(book):
+    df, nav = book
+    table = default_issuer_table()
+    staged = StagedControl()
+
+    staged.run('book', df, nav, table, DEFAULT_PARAMS)
+    assert staged.recomputed == ['emetteurs', 'agregats', 'societe', 'plafonds', 'regle_45']
+
+    staged.run('book', df, nav, table, DEFAULT_PARAMS)
+    assert staged.recomputed == []
+
+    params = {**DEFAULT_PARAMS, 'plafond_standard': 0.08}
+    staged.run('book', df, nav, table, params)
+    assert staged.recomputed == ['plafonds', 'regle_45']
+
+    params = {**params, 'seuil_45': 0.40}
+    staged.run('book', df, nav, table, params)
+    assert staged.recomputed == ['regle_45']
+
+    # nouvelle date de contrôle ou actifs nets importés : émetteurs conservés
+    nav = {'F1': 12_000.0, 'F2': 20_000.0}
+    labeled, ratios, rule_45 = staged.run('book', df, nav, table, params)
+    assert staged.recomputed == ['agregats', 'societe', 'plafonds', 'regle_45']
+
+    expected = calculate_issuer_ratios(add_issuers(df, table), nav, params)
+    pd.testing.assert_frame_equal(ratios, expected)
+    pd.testing.assert_frame_equal(rule_45, check_45_percent_rule(
+        expected, labeled, nav, params['seuil_45'], seuil_emetteur=params['seuil_emetteur_45']))
+
+    staged.run('autre classeur', df, nav, table, params)
+    assert staged.recomputed[0] == 'emetteurs'
@@ -0,0 +1,274 @@
+"""
+Ratios émetteurs et règle des 45% : tolérance, actifs nets absents, émetteurs inconnus, État marocain
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.issuers import AUTRE, ETAT, INCONNU
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import (ETAT_MAROCAIN, TOLERANCE, aggregate_exposures, apply_ceilings,
+                           calculate_issuer_ratios, check_45_percent_rule)
+
+
+NAV = 10_000.0
+
+
+def positions(rows):
+    """Positions étiquetées : (Fonds, Emetteur, Type_Emetteur, Type, Valo_globale)"""
+    return pd.DataFrame(rows, columns=['Fonds', 'Emetteur', 'Type_Emetteur', 'Type', 'Valo_globale'])
+
+
+def ratio_of(ratios, fonds, emetteur):
+    return ratios.set_index(['Fonds', 'Emetteur']).loc[(fonds, emetteur)]
+
+
+def random_book(n_funds, n_issuers, lines, seed):
+    """Positions étiquetées aléatoires : types manquants, État, inconnus, fonds sans actif net"""
+    rng = np.random.default_rng(seed)
+    n = n_funds * n_issuers * lines
+    names = np.array(['ATW', 'IAM', 'BCP'] + [f'E{i:03d}' for i in range(n_issuers - 3)]
+                     + [ETAT[0], INCONNU[0]], dtype=object)
+    kinds = np.array([AUTRE[1]] * n_issuers + [ETAT[1], INCONNU[1]], dtype=object)
+    issuer = rng.integers(0, len(names), n)
+    df = pd.DataFrame({
+        'Fonds': rng.choice([f'F{i}' for i in range(n_funds)], n),
+        'Emetteur': names[issuer],
+        'Type_Emetteur': kinds[issuer],
+        'Type': rng.choice(np.array(['ACTION', 'Action cotée', 'OBLIGATION', 'TCN', np.nan], dtype=object), n),
+        'Valo_globale': rng.lognormal(8, 1.5, n),
+    })
+    nav = (df.groupby('Fonds')['Valo_globale'].sum() * rng.uniform(1.5, 6.0, n_funds)).to_dict()
+    nav['F0'] = 0.0                        # actif net nul
+    del nav['F1']                          # actif net absent
+    return df, nav
+
+
+# =============================================================================
+# IMPLÉMENTATIONS D'ORIGINE (RÉFÉRENCE DE NON-RÉGRESSION, TEMPS DES BENCHMARKS)
+# =============================================================================
+
+def legacy_issuer_ratios(df, actif_net_dict, params):
+    """Implémentation d'origine (boucles par fonds puis par émetteur)"""
+    if df is None or len(df) == 0 or not actif_net_dict:
+        return pd.DataFrame()
+
+    results = []
+
+    for fonds in df['Fonds'].unique():
+        actif_net = actif_net_dict.get(fonds, 0)
+
+        if actif_net <= 0:
+            continue
+
+        fonds_data = df[df['Fonds'] == fonds]
+
+        grouped = fonds_data.groupby('Emetteur').agg({
+            'Valo_globale': 'sum',
+            'Type_Emetteur': 'first'
+        }).reset_index()
+
+        for _, row in grouped.iterrows():
+            total = row['Valo_globale']
+            ratio = total / actif_net
+
+            if row['Emetteur'] == 'État marocain' or row['Type_Emetteur'] == 'public':
+                plafond = params.get('plafond_etat', 1.0)
+            else:
+                emetteur_data = fonds_data[fonds_data['Emetteur'] == row['Emetteur']]
+                is_action = any('ACTION' in str(t).upper() for t in emetteur_data['Type'])
+
+                if is_action and row['Emetteur'] in params.get('actions_eligibles_15pct', []):
+                    plafond = params.get('plafond_action_eligible', 0.15)
+                else:
+                    plafond = params.get('plafond_standard', 0.10)
+
+            conformite = '✅' if ratio <= plafond + 0.0001 else '❌'
+            ecart = (ratio - plafond) * 100
+
+            results.append({
+                'Fonds': fonds,
+                'Emetteur': row['Emetteur'],
+                'Type': row['Type_Emetteur'],
+                'Montant_MAD': total,
+                'Actif_Net_MAD': actif_net,
+                'Ratio': ratio,
+                'Ratio_%': f"{ratio:.2%}",
+                'Plafond': plafond,
+                'Plafond_%': f"{plafond:.0%}",
+                'Conformite': conformite,
+                'Ecart_%': ecart
+            })
+
+    return pd.DataFrame(results)
+
+
+def legacy_45_percent_rule(ratios_df, portfolio_df, actif_net_dict, seuil=0.45):
+    """Implémentation d'origine (filtrage du tableau complet pour chaque fonds)"""
+    if ratios_df is None or len(ratios_df) == 0 or 'Fonds' not in ratios_df.columns:
+        return pd.DataFrame()
+
+    results = []
+
+    for fonds in ratios_df['Fonds'].unique():
+        actif_net = actif_net_dict.get(fonds, 0)
+
+        if actif_net <= 0:
+            continue
+
+        fonds_ratios = ratios_df[ratios_df['Fonds'] == fonds]
+
+        emetteurs_sup_10 = fonds_ratios[
+            (fonds_ratios['Ratio'] > 0.10) &
+            (fonds_ratios['Emetteur'] != 'État marocain')
+        ]
+
+        total_sup_10 = emetteurs_sup_10['Montant_MAD'].sum()
+        ratio_45 = total_sup_10 / actif_net if actif_net > 0 else 0
+
+        results.append({
+            'Fonds': fonds,
+            'Total_>10%_MAD': total_sup_10,
+            'Actif_Net_MAD': actif_net,
+            'Ratio_45%': ratio_45,
+            'Ratio_%': f"{ratio_45:.2%}",
+            'Seuil': seuil,
+            'Seuil_%': f"{seuil:.0%}",
+            'Conformite': '✅' if ratio_45 <= seuil + 0.0001 else '❌',
+            'Nb_Emetteurs': len(emetteurs_sup_10)
+        })
+
+    return pd.DataFrame(results)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_issuer_ratios_match_legacy(seed):
+    df, nav = random_book(8, 12, 3, seed)
+    pd.testing.assert_frame_equal(calculate_issuer_ratios(df, nav, DEFAULT_PARAMS),
+                                  legacy_issuer_ratios(df, nav, DEFAULT_PARAMS))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_45_rule_matches_legacy(seed):
+    """Peu d'émetteurs par fonds : beaucoup de ratios > 10%"""
+    df, nav = random_book(8, 5, 2, seed)
+    ratios = calculate_issuer_ratios(df, nav, DEFAULT_PARAMS)
+    assert (ratios['Ratio'] > 0.10).any()
+    pd.testing.assert_frame_equal(check_45_percent_rule(ratios, df, nav), legacy_45_percent_rule(ratios, df, nav))
+
+
+@pytest.mark.parametrize('emetteur, type_titre, plafond', [
+    ('CIH', 'ACTION', 0.10),                 # plafond standard
+    ('ATW', 'ACTION', 0.15),                 # action éligible
+    ('ATW', 'OBLIGATION', 0.10),             # émetteur éligible mais pas une action
+])
+def test_ceiling_tolerance_boundary(emetteur, type_titre, plafond):
+    """Ratio = plafond + TOLERANCE : conforme ; un dirham de plus : non conforme"""
+    at_limit = (plafond + TOLERANCE) * NAV
+    df = positions([
+        ('F1', emetteur, AUTRE[1], type_titre, round(at_limit)),
+        ('F2', emetteur, AUTRE[1], type_titre, round(at_limit) + 1),
+    ])
+    ratios = calculate_issuer_ratios(df, {'F1': NAV, 'F2': NAV}, DEFAULT_PARAMS)
+
+    at, over = ratio_of(ratios, 'F1', emetteur), ratio_of(ratios, 'F2', emetteur)
+    assert at['Plafond'] == over['Plafond'] == plafond
+    assert at['Ratio'] == pytest.approx(plafond + TOLERANCE)
+    assert at['Conformite'] == '✅'
+    assert over['Conformite'] == '❌'
+
+
+def test_45_rule_tolerance_boundary():
+    df = positions([
+        ('F1', 'ATW', AUTRE[1], 'ACTION', 1500.0),
+        ('F1', 'BCP', AUTRE[1], 'ACTION', 1500.0),
+        ('F1', 'IAM', AUTRE[1], 'ACTION', 1501.0),
+        ('F2', 'ATW', AUTRE[1], 'ACTION', 1500.0),
+        ('F2', 'BCP', AUTRE[1], 'ACTION', 1500.0),
+        ('F2', 'IAM', AUTRE[1], 'ACTION', 1502.0),
+    ])
+    nav = {'F1': NAV, 'F2': NAV}
+    rule = check_45_percent_rule(calculate_issuer_ratios(df, nav, DEFAULT_PARAMS), df, nav).set_index('Fonds')
+
+    assert rule.loc['F1', 'Ratio_45%'] == pytest.approx(0.45 + TOLERANCE)
+    assert rule.loc['F1', 'Conformite'] == '✅'
+    assert rule.loc['F2', 'Conformite'] == '❌'
+    assert rule['Nb_Emetteurs'].tolist() == [3, 3]
+
+
+def test_zero_or_missing_nav_excluded():
+    df = positions([
+        ('F0', 'CIH', AUTRE[1], 'ACTION', 500.0),     # actif net nul
+        ('F1', 'CIH', AUTRE[1], 'ACTION', 500.0),     # actif net absent
+        ('F2', 'CIH', AUTRE[1], 'ACTION', 500.0),
+        ('F2', 'CIH', AUTRE[1], 'ACTION', 700.0),
+    ])
+    nav = {'F0': 0.0, 'F2': NAV}
+
+    exposures = aggregate_exposures(df, nav)
+    assert exposures['Fonds'].tolist() == ['F2']
+    assert exposures['Montant_MAD'].tolist() == [1200.0]
+    assert exposures['Actif_Net_MAD'].tolist() == [NAV]
+
+    ratios = calculate_issuer_ratios(df, nav, DEFAULT_PARAMS)
+    assert ratios['Fonds'].tolist() == ['F2']
+    assert np.isfinite(ratios['Ratio']).all()
+
+    # ratios d'un fonds dont l'actif net a disparu : écartés de la règle des 45%
+    rule = check_45_percent_rule(ratios, df, {'F2': 0.0})
+    assert len(rule) == 0
+
+    assert calculate_issuer_ratios(df, {'F0': 0.0}, DEFAULT_PARAMS).empty
+    assert calculate_issuer_ratios(df, {}, DEFAULT_PARAMS).empty
+
+
+def test_unknown_issuer_gets_standard_ceiling():
+    """Émetteur non identifié : plafond standard, même pour une action, et compté dans les 45%"""
+    df = positions([
+        ('F1', INCONNU[0], INCONNU[1], 'ACTION', 1200.0),
+        ('F1', INCONNU[0], INCONNU[1], 'OPCVM', 300.0),
+        ('F1', None, None, 'ACTION', 9000.0),          # sans émetteur : hors agrégation
+    ])
+    nav = {'F1': NAV}
+
+    exposures = aggregate_exposures(df, nav)
+    assert exposures['Emetteur'].tolist() == [INCONNU[0]]
+    assert exposures['Montant_MAD'].tolist() == [1500.0]
+    assert bool(exposures['Is_Action'].iloc[0])
+
+    params = {**DEFAULT_PARAMS, 'actions_eligibles_15pct': DEFAULT_PARAMS['actions_eligibles_15pct'] + [INCONNU[0]]}
+    ratios = apply_ceilings(exposures, params)
+    row = ratio_of(ratios, 'F1', INCONNU[0])
+    assert row['Type'] == INCONNU[1]
+    assert row['Plafond'] == 0.15                     # éligible seulement par la liste explicite
+    row = ratio_of(apply_ceilings(exposures, DEFAULT_PARAMS), 'F1', INCONNU[0])
+    assert row['Plafond'] == 0.10
+    assert row['Conformite'] == '❌'
+
+    rule = check_45_percent_rule(calculate_issuer_ratios(df, nav, DEFAULT_PARAMS), df, nav)
+    assert rule['Total_>10%_MAD'].tolist() == [1500.0]
+
+
+def test_etat_marocain_ceiling_and_45_exclusion():
+    df = positions([
+        ('F1', ETAT[0], ETAT[1], 'BDT', 6000.0),
+        ('F1', 'CIH', AUTRE[1], 'ACTION', 1200.0),
+        ('F1', 'ONCF', ETAT[1], 'OBLIGATION', 2000.0),  # public sans être l'État
+    ])
+    nav = {'F1': NAV}
+    params = {**DEFAULT_PARAMS, 'plafond_etat': 0.70}
+    ratios = calculate_issuer_ratios(df, nav, params)
+
+    etat = ratio_of(ratios, 'F1', ETAT_MAROCAIN)
+    assert etat['Plafond'] == 0.70 and etat['Conformite'] == '✅'
+    assert ratio_of(ratios, 'F1', 'ONCF')['Plafond'] == 0.70
+
+    # l'État est exclu de la somme des 45% ; un autre émetteur public y reste
+    rule = check_45_percent_rule(ratios, df, nav)
+    assert rule['Total_>10%_MAD'].tolist() == [3200.0]
+    assert rule['Nb_Emetteurs'].tolist() == [2]
+
+    rule = check_45_percent_rule(ratios, df, nav, exclus=())
+    assert rule['Total_>10%_MAD'].tolist() == [9200.0]
+    assert rule['Conformite'].tolist() == ['❌']
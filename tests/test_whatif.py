@@ -0,0 +1,107 @@
+"""
+Simulation pré-trade (ExposureState) : mêmes ratios, plafonds et règle 45% qu'un recalcul complet
+"""
+
+import pandas as pd
+import pytest
+
+from engine.issuers import AUTRE, ETAT
+from engine.pipeline import DEFAULT_PARAMS
+from engine.ratios import ETAT_MAROCAIN, calculate_issuer_ratios, check_45_percent_rule
+from engine.whatif import ExposureState
+
+
+NAV = {'F1': 10_000.0, 'F2': 20_000.0}
+
+BOOK = pd.DataFrame([
+    ('F1', 'ATW', AUTRE[1], 'ACTION', 1200.0),
+    ('F1', 'CIH', AUTRE[1], 'OBLIGATION', 900.0),
+    ('F1', 'COSUMAR', AUTRE[1], 'ACTION', 1100.0),
+    ('F1', ETAT[0], ETAT[1], 'BDT', 4000.0),
+    ('F2', 'IAM', AUTRE[1], 'OBLIGATION', 2500.0),
+    ('F2', 'CIH', AUTRE[1], 'ACTION', 1000.0),
+], columns=['Fonds', 'Emetteur', 'Type_Emetteur', 'Type', 'Valo_globale'])
+
+ORDERS = pd.DataFrame([
+    ('F1', 'CIH', 300.0, False),            # franchit 10% : entre dans les 45%
+    ('F1', 'COSUMAR', -200.0, False),       # repasse sous 10% : sort des 45%
+    ('F1', 'BCP', 1400.0, True),            # nouvel émetteur, action éligible
+    ('F1', 'BOA', 1400.0, False),           # nouvel émetteur éligible, hors actions
+    ('F1', ETAT_MAROCAIN, 3000.0, False),   # État : plafond propre, hors 45%
+    ('F2', 'IAM', 800.0, True),             # achat d'actions sur une exposition obligataire
+    ('F2', 'CIH', -1000.0, False),          # vente totale
+], columns=['Fonds', 'Emetteur', 'Montant_MAD', 'Est_Action'])
+
+
+def with_orders(book, orders):
+    lines = pd.DataFrame({
+        'Fonds': orders['Fonds'],
+        'Emetteur': orders['Emetteur'],
+        'Type_Emetteur': [ETAT[1] if e == ETAT_MAROCAIN else AUTRE[1] for e in orders['Emetteur']],
+        'Type': ['ACTION' if a else 'OBLIGATION' for a in orders['Est_Action']],
+        'Valo_globale': orders['Montant_MAD'],
+    })
+    return pd.concat([book, lines], ignore_index=True)
+
+
+def full_recompute(book, orders):
+    """(ratios indexés par (Fonds, Emetteur), ratio 45% par fonds) du portefeuille après les ordres"""
+    ratios = calculate_issuer_ratios(with_orders(book, orders), NAV, DEFAULT_PARAMS)
+    rule = check_45_percent_rule(ratios, None, NAV)
+    return ratios.set_index(['Fonds', 'Emetteur']), rule.set_index('Fonds')['Ratio_45%']
+
+
+@pytest.fixture
+def state():
+    return ExposureState(calculate_issuer_ratios(BOOK, NAV, DEFAULT_PARAMS), NAV, DEFAULT_PARAMS)
+
+
+@pytest.mark.parametrize('i', range(len(ORDERS)))
+def test_check_matches_full_recompute(state, i):
+    order = ORDERS.iloc[[i]]
+    fonds, emetteur, montant, est_action = order.iloc[0]
+    ratios, ratio_45 = full_recompute(BOOK, order)
+    result = state.check(fonds, emetteur, montant, est_action)
+
+    assert result['Ratio_apres'] == pytest.approx(ratios.loc[(fonds, emetteur), 'Ratio'])
+    assert result['Plafond'] == ratios.loc[(fonds, emetteur), 'Plafond']
+    assert result['Conforme_plafond'] == (ratios.loc[(fonds, emetteur), 'Conformite'] == '✅')
+    assert result['Ratio_45_apres'] == pytest.approx(ratio_45[fonds])
+
+
+def test_check_batch_matches_check(state):
+    batch = state.check_batch(ORDERS)
+    for i, (fonds, emetteur, montant, est_action) in ORDERS.iterrows():
+        single = state.check(fonds, emetteur, montant, est_action)
+        for column in ['Ratio_avant', 'Ratio_apres', 'Plafond', 'Ratio_45_avant', 'Ratio_45_apres']:
+            assert batch.loc[i, column] == pytest.approx(single[column])
+        assert bool(batch.loc[i, 'Conforme_plafond']) == single['Conforme_plafond']
+        assert bool(batch.loc[i, 'Conforme_45']) == single['Conforme_45']
+
+
+def test_check_does_not_change_state(state):
+    before = state.check('F1', 'CIH', 0.0)
+    state.check('F1', 'CIH', 5000.0)
+    assert state.check('F1', 'CIH', 0.0) == before
+
+
+def test_applied_orders_match_full_recompute(state):
+    """Ordres comptabilisés l'un après l'autre : état final = recalcul du portefeuille avec tous les ordres"""
+    for _, (fonds, emetteur, montant, est_action) in ORDERS.iterrows():
+        state.apply(fonds, emetteur, montant, est_action)
+    ratios, ratio_45 = full_recompute(BOOK, ORDERS)
+
+    for (fonds, emetteur), row in ratios.iterrows():
+        current = state.check(fonds, emetteur, 0.0)
+        assert current['Ratio_apres'] == pytest.approx(row['Ratio'])
+        assert current['Plafond'] == row['Plafond']
+    for fonds in NAV:
+        assert state.check(fonds, 'CIH', 0.0)['Ratio_45_apres'] == pytest.approx(ratio_45[fonds])
+
+
+def test_orders_on_funds_without_nav(state):
+    with pytest.raises(KeyError):
+        state.check('F9', 'ATW', 100.0)
+    orders = pd.DataFrame([('F9', 'ATW', 100.0, True), ('F1', 'ATW', 100.0, True)],
+                          columns=ORDERS.columns)
+    assert state.check_batch(orders).index.tolist() == [1]
@@ -0,0 +1,113 @@
+"""
+Lecture projetée (engine.xlsx) : références de cellules hors forme Excel/openpyxl
+"""
+
+import re
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from engine.loader import clean_sheet, iter_sheets
+from engine.xlsx import UnsupportedSheet, XlsxReader
+
+
+HEADER = ['Code ISIN', 'Type', 'Description', 'Quantité', 'Prix de revient', 'Valo J',
+          'Prix de revient global', 'Valo globale', '+/- value']
+
+
+def write_book(path, n_rows=50):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('FCP')
+    ws.append(HEADER)
+    for i in range(n_rows):
+        ws.append([f'MA{i:010d}', 'ACTION', f'ATW {i}', 10, 100.0, 110.0, 1000.0, 1100.0 + i, 100.0])
+    wb.save(path)
+
+
+def rewrite_sheets(src, dst, transform):
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename.startswith('xl/worksheets/sheet'):
+                data = transform(data)
+            zout.writestr(item, data)
+
+
+def positions(path):
+    return {name: clean_sheet(name, df)[1] for name, df in iter_sheets(path)}
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / 'fond.xlsx'
+    write_book(path)
+    return path
+
+
+def test_reference_after_other_attributes(book, tmp_path):
+    """<c s="1" r="A5"> : mêmes positions que la forme habituelle <c r="A5" ...>"""
+    moved = tmp_path / 'moved.xlsx'
+    rewrite_sheets(book, moved, lambda xml: re.sub(
+        rb'<c r="([A-Z]+\d+)"([^>]*?)(/?)>', rb'<c\2 r="\1"\3>', xml))
+    assert b'<c r="' not in zipfile.ZipFile(moved).read('xl/worksheets/sheet1.xml')
+
+    expected, actual = positions(book)['FCP'], positions(moved)['FCP']
+    assert len(actual) == 50
+    assert actual['Valo_globale'].tolist() == expected['Valo_globale'].tolist()
+    assert actual['Description'].astype(object).tolist() == expected['Description'].astype(object).tolist()
+
+
+@pytest.mark.parametrize('pattern, replacement', [
+    (rb'<c r="B40"', rb'<c'),                  # cellule sans référence
+    (rb'<row r="40"', rb'<row'),               # ligne sans référence
+])
+def test_missing_reference_is_unsupported(book, tmp_path, monkeypatch, pattern, replacement):
+    """Une référence absente, même hors du premier bloc lu, lève UnsupportedSheet (jamais de ligne perdue)"""
+    broken = tmp_path / 'broken.xlsx'
+    rewrite_sheets(book, broken, lambda xml: xml.replace(pattern, replacement, 1))
+
+    # petits blocs : la ligne 40 n'est pas dans le premier
+    blocks = XlsxReader._blocks
+    monkeypatch.setattr(XlsxReader, '_blocks', lambda self, name, size=None: blocks(self, name, 256))
+    with XlsxReader(broken) as reader:
+        assert len(list(reader._blocks('FCP'))) > 2
+        with pytest.raises(UnsupportedSheet):
+            reader.columns('FCP', 1, [1, 2, 7])
+    monkeypatch.undo()
+
+    # le chargeur se replie sur pandas : toutes les positions sont conservées
+    assert len(positions(broken)['FCP']) == 50
+
+
+def write_custodian_book(path, header):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('FCP')
+    ws.append(['Extraction dépositaire'])
+    ws.append(header)
+    for i, row in enumerate([('ACTION', 'ATW', 10, 100.0, 1000.0), ('ACTION', 'IAM', 20, 100.0, 2000.0)]):
+        ws.append([f'MA{i:010d}', *row])
+    wb.save(path)
+
+
+@pytest.mark.parametrize('engine', [None, 'openpyxl'])
+@pytest.mark.parametrize('header', [
+    ['ISIN', 'Type', 'Libellé', 'Quantité', 'Valorisation', 'Valorisation globale'],
+    ['ISIN', 'Type', 'Libellé', 'Quantité', 'Montant', 'Valo globale'],
+])
+def test_specific_alias_beats_generic(tmp_path, engine, header):
+    """'Valorisation' (cours unitaire) et 'Valorisation globale' : le montant vient de la seconde"""
+    path = tmp_path / 'depositaire.xlsx'
+    write_custodian_book(path, header)
+    sheets = {name: clean_sheet(name, df)[1] for name, df in iter_sheets(path, engine)}
+    assert sheets['FCP']['Valo_globale'].tolist() == [1000.0, 2000.0]
+    assert sheets['FCP']['Description'].astype(object).tolist() == ['ATW', 'IAM']
+
+
+@pytest.mark.parametrize('engine', [None, 'openpyxl'])
+def test_same_rank_aliases_are_rejected(tmp_path, engine):
+    path = tmp_path / 'depositaire.xlsx'
+    write_custodian_book(path, ['ISIN', 'Type', 'Libellé', 'Quantité', 'Valo globale',
+                                'Valorisation globale'])
+    with pytest.raises(ValueError, match='Valo_globale'):
+        list(iter_sheets(path, engine))